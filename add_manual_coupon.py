@@ -2,6 +2,8 @@ import os
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+from cupons import interpretar_validade
+
 # Carrega variáveis de ambiente
 load_dotenv()
 
@@ -28,19 +30,36 @@ def adicionar_cupom_manual():
             "link": "https://www.kabum.com.br"
         }
 
-        print(f"Tentando inserir cupom: {cupom['codigo']}...")
+        # Validade em data (fim do dia) para a API esconder o cupom quando vencer
+        cupom["valido_ate"] = interpretar_validade(cupom["validade"])
+
+        print(f"Tentando inserir cupom: {cupom['codigo']} (válido até {cupom['valido_ate'] or 'sem data'})...")
 
         with engine.connect() as conn:
-            # Query SQL de inserção
+            # Upsert como o do scraper (requer migrate_cupons_upsert.py e migrate_cupons_validade.py):
+            # rodar de novo com o mesmo código atualiza o cupom, e alterado_em só muda se o conteúdo
+            # mudou (ou o cupom volta a ficar ativo), para a mudança chegar ao delta de /api/coupons
             query = text("""
-                INSERT INTO cupons (codigo, descricao, validade, loja, link, timestamp)
-                VALUES (:codigo, :descricao, :validade, :loja, :link, NOW())
+                INSERT INTO cupons (codigo, descricao, validade, valido_ate, loja, link, timestamp, alterado_em)
+                VALUES (:codigo, :descricao, :validade, :valido_ate, :loja, :link, NOW(), NOW())
+                ON CONFLICT (loja, codigo) DO UPDATE SET
+                    descricao = excluded.descricao,
+                    validade = excluded.validade,
+                    valido_ate = excluded.valido_ate,
+                    link = excluded.link,
+                    timestamp = excluded.timestamp,
+                    alterado_em = CASE
+                        WHEN cupons.ativo AND COALESCE(cupons.descricao, '') = COALESCE(excluded.descricao, '')
+                             AND COALESCE(cupons.validade, '') = COALESCE(excluded.validade, '')
+                             AND COALESCE(cupons.link, '') = COALESCE(excluded.link, '')
+                        THEN cupons.alterado_em ELSE excluded.alterado_em END,
+                    ativo = TRUE
             """)
             
             conn.execute(query, cupom)
             conn.commit()
             
-        print("✅ SUCESSO! Cupom adicionado manualmente.")
+        print("✅ SUCESSO! Cupom adicionado/atualizado manualmente.")
         print("Agora atualize a página de Cupons no seu site.")
 
     except Exception as e:
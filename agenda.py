@@ -0,0 +1,153 @@
+# meu_comparador_backend/agenda.py (v1.1 - Agenda Adaptativa de Coleta + Carga Parcial)
+#
+# Estado por (produto, loja) em `agenda_coleta`: último preço, volatilidade (média móvel de
+# "o preço mudou nesta coleta?"), última queda de preço, falhas seguidas e a próxima coleta.
+# Cada rodada visita só o que está vencido, do mais atrasado para o menos, até o orçamento:
+#   - produto volátil volta em INTERVALO_MIN, estável em INTERVALO_MAX (interpolação
+#     geométrica pela volatilidade); recém-baixado de preço fica em INTERVALO_MIN por um tempo;
+#   - falha adia com backoff exponencial (BACKOFF_BASE, 2x, 4x, ... até BACKOFF_MAX).
+#
+# Variáveis de ambiente (em horas):
+#   SCRAPER_INTERVALO_MIN (1), SCRAPER_INTERVALO_MAX (24), SCRAPER_JANELA_PROMOCAO (48),
+#   SCRAPER_BACKOFF_BASE (0.5), SCRAPER_BACKOFF_MAX (24)
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, text
+
+from carga import executar_em_lote
+from config import env_float
+
+INTERVALO_MIN = timedelta(hours=env_float("SCRAPER_INTERVALO_MIN", 1))
+INTERVALO_MAX = timedelta(hours=env_float("SCRAPER_INTERVALO_MAX", 24))
+JANELA_PROMOCAO = timedelta(hours=env_float("SCRAPER_JANELA_PROMOCAO", 48))
+BACKOFF_BASE = timedelta(hours=env_float("SCRAPER_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = timedelta(hours=env_float("SCRAPER_BACKOFF_MAX", 24))
+ALFA_VOLATILIDADE = 0.3    # peso da coleta mais recente na média móvel
+VOLATILIDADE_INICIAL = 0.5
+TOLERANCIA_PRECO = 0.005   # diferença (R$) que conta como mudança de preço
+
+DDL_AGENDA = [
+    """
+    CREATE TABLE IF NOT EXISTS agenda_coleta (
+        produto_base VARCHAR(200) NOT NULL,
+        loja VARCHAR(50) NOT NULL,
+        ultimo_preco DOUBLE PRECISION,
+        volatilidade DOUBLE PRECISION NOT NULL DEFAULT 0.5,
+        coletas INTEGER NOT NULL DEFAULT 0,
+        ultima_coleta TIMESTAMP,
+        ultima_mudanca TIMESTAMP,
+        ultima_queda TIMESTAMP,
+        falhas_seguidas INTEGER NOT NULL DEFAULT 0,
+        ultima_falha TIMESTAMP,
+        proxima_coleta TIMESTAMP,
+        PRIMARY KEY (produto_base, loja)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_agenda_proxima ON agenda_coleta (proxima_coleta)",
+]
+
+COLUNAS_AGENDA = ["produto_base", "loja", "ultimo_preco", "volatilidade", "coletas", "ultima_coleta",
+                  "ultima_mudanca", "ultima_queda", "falhas_seguidas", "ultima_falha", "proxima_coleta"]
+
+COLUNAS_DATA = ("ultima_coleta", "ultima_mudanca", "ultima_queda", "ultima_falha", "proxima_coleta")
+
+SQL_UPSERT_AGENDA = f"""
+    INSERT INTO agenda_coleta ({", ".join(COLUNAS_AGENDA)}) VALUES %s
+    ON CONFLICT (produto_base, loja) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in COLUNAS_AGENDA[2:])}
+"""
+
+def estado_inicial(produto_base, loja):
+    return {"produto_base": produto_base, "loja": loja, "ultimo_preco": None, "volatilidade": VOLATILIDADE_INICIAL,
+            "coletas": 0, "ultima_coleta": None, "ultima_mudanca": None, "ultima_queda": None,
+            "falhas_seguidas": 0, "ultima_falha": None, "proxima_coleta": None}
+
+def intervalo_coleta(estado, agora):
+    """Tempo até a próxima coleta depois de um sucesso."""
+    if estado["ultima_queda"] and agora - estado["ultima_queda"] < JANELA_PROMOCAO: return INTERVALO_MIN
+    volatilidade = min(1.0, max(0.0, estado["volatilidade"]))
+    razao = INTERVALO_MIN / INTERVALO_MAX
+    return INTERVALO_MAX * (razao ** volatilidade)
+
+def atraso_backoff(falhas_seguidas):
+    """Espera depois da n-ésima falha seguida, com ±10% de variação para não sincronizar as tentativas."""
+    atraso = min(BACKOFF_BASE * (2 ** max(0, falhas_seguidas - 1)), BACKOFF_MAX)
+    return atraso * random.uniform(0.9, 1.1)
+
+class Agenda:
+    """Estados de `agenda_coleta` em memória; `observar` atualiza e `salvar` grava só os alterados."""
+
+    def __init__(self, estados=None):
+        self.estados = estados or {}
+        self._alterados = set()
+
+    @classmethod
+    def carregar(cls, conn, produtos=None):
+        """Agenda inteira, ou só as linhas dos `produtos` (workers da fila, que veem um lote por vez)."""
+        sql = f"SELECT {', '.join(COLUNAS_AGENDA)} FROM agenda_coleta"
+        if produtos is None:
+            linhas = conn.execute(text(sql)).mappings().all()
+        else:
+            consulta = text(sql + " WHERE produto_base IN :produtos").bindparams(bindparam('produtos', expanding=True))
+            linhas = conn.execute(consulta, {"produtos": list(produtos)}).mappings().all()
+        estados = {}
+        for linha in linhas:
+            estado = dict(linha)
+            # SQLite devolve TIMESTAMP como texto
+            for coluna in COLUNAS_DATA:
+                if isinstance(estado[coluna], str): estado[coluna] = datetime.fromisoformat(estado[coluna])
+            estados[(estado["produto_base"], estado["loja"])] = estado
+        return cls(estados)
+
+    def estado(self, produto_base, loja):
+        return self.estados.get((produto_base, loja)) or estado_inicial(produto_base, loja)
+
+    def escolher(self, tarefas, agora, orcamento=0):
+        """(lote, adiadas): as tarefas vencidas em ordem de prioridade, no máximo `orcamento` (0 = todas).
+
+        Nunca coletado vem primeiro; depois o maior atraso relativo ao próprio intervalo
+        (um produto volátil 1h atrasado passa na frente de um estável 3h atrasado).
+        """
+        vencidas = []
+        for tarefa in tarefas:
+            estado = self.estado(tarefa["produto_base"], tarefa["loja"])
+            proxima = estado["proxima_coleta"]
+            if proxima is None:
+                vencidas.append((float('inf'), tarefa))
+                continue
+            if proxima > agora: continue
+            base = intervalo_coleta(estado, agora) if not estado["falhas_seguidas"] else BACKOFF_BASE
+            vencidas.append(((agora - proxima) / base, tarefa))
+        vencidas.sort(key=lambda par: -par[0])
+        lote = [tarefa for _, tarefa in vencidas]
+        if orcamento > 0: lote = lote[:orcamento]
+        return lote, len(tarefas) - len(lote)
+
+    def observar(self, produto_base, loja, preco, agora):
+        """Registra uma coleta: `preco` None é falha (backoff), qualquer número é sucesso."""
+        estado = dict(self.estado(produto_base, loja))
+        if preco is None:
+            estado["falhas_seguidas"] += 1
+            estado["ultima_falha"] = agora
+            estado["proxima_coleta"] = agora + atraso_backoff(estado["falhas_seguidas"])
+        else:
+            anterior = estado["ultimo_preco"]
+            mudou = anterior is not None and abs(preco - anterior) > TOLERANCIA_PRECO
+            if estado["coletas"]:
+                estado["volatilidade"] = (1 - ALFA_VOLATILIDADE) * estado["volatilidade"] + ALFA_VOLATILIDADE * mudou
+            if mudou:
+                estado["ultima_mudanca"] = agora
+                if 0 < preco < anterior: estado["ultima_queda"] = agora
+            estado.update(ultimo_preco=preco, ultima_coleta=agora, falhas_seguidas=0)
+            estado["coletas"] += 1
+            estado["proxima_coleta"] = agora + intervalo_coleta(estado, agora)
+        self.estados[(produto_base, loja)] = estado
+        self._alterados.add((produto_base, loja))
+
+    def salvar(self, conn):
+        registros = [self.estados[chave] for chave in sorted(self._alterados)]
+        executar_em_lote(conn, SQL_UPSERT_AGENDA, COLUNAS_AGENDA, registros)
+        self._alterados.clear()
+        return len(registros)
@@ -0,0 +1,149 @@
+# meu_comparador_backend/agregacao.py (v1.4 - Agrupamento Comum à Listagem e aos Detalhes)
+#
+# Substitui o loop por produto (groupby + idxmin + iterrows) por poucas operações vetorizadas:
+#   1. última linha de cada (produto_base, loja)
+#   2. mínimo / média histórica dos preços válidos (> 0)
+#   3. linha "principal": a mais barata em estoque ou, sem estoque, a mais recente
+# A saída mantém exatamente o formato de /api/products. `iterar_listagem` gera os itens um a
+# um (para a resposta em streaming); `montar_listagem` é a mesma coisa em lista.
+# `montar_detalhes` faz o payload de /api/product/<nome> de vários produtos de uma vez; os dois
+# partem de `agrupar_por_produto`, então a linha principal e as colunas são sempre as mesmas.
+
+import numpy as np
+import pandas as pd
+
+def ultimas_por_loja(df):
+    """Última linha (maior timestamp) de cada (produto_base, loja)."""
+    ordenado = df.sort_values(['produto_base', 'loja', 'timestamp'], kind='mergesort')
+    return ordenado.drop_duplicates(['produto_base', 'loja'], keep='last')
+
+def estatisticas_historicas(df):
+    """Mínimo, soma e quantidade dos preços válidos de cada produto_base."""
+    validos = df.loc[df['preco'] > 0, ['produto_base', 'preco']]
+    return validos.groupby('produto_base')['preco'].agg(preco_min='min', preco_soma='sum', preco_qtd='count')
+
+def finalizar_stats(df):
+    """Converte soma/quantidade em preco_min/preco_medio (0.0 quando não há preço válido)."""
+    qtd = df['preco_qtd'].fillna(0).to_numpy(dtype=float)
+    soma = df['preco_soma'].fillna(0.0).to_numpy(dtype=float)
+    df['preco_min'] = pd.to_numeric(df['preco_min'], errors='coerce').fillna(0.0)
+    df['preco_medio'] = np.divide(soma, qtd, out=np.zeros_like(soma), where=qtd > 0)
+    return df.sort_values(['produto_base', 'loja'], kind='mergesort').reset_index(drop=True)
+
+def estado_atual_de_historico(df):
+    """Estado atual (última linha por loja) + estatísticas a partir do histórico completo de `precos`."""
+    recentes = ultimas_por_loja(df)
+    stats = estatisticas_historicas(df)
+    return finalizar_stats(recentes.merge(stats, left_on='produto_base', right_index=True, how='left'))
+
+def escolher_principais(recentes):
+    """Uma linha por produto: a mais barata com preço > 0; se nenhuma loja tiver estoque, a mais recente."""
+    sem_estoque = (recentes['preco'] <= 0).to_numpy()
+    chaves = pd.DataFrame({
+        'produto_base': recentes['produto_base'].to_numpy(),
+        'sem_estoque': sem_estoque,
+        'preco_ord': np.where(sem_estoque, np.inf, recentes['preco'].to_numpy(dtype=float)),
+        # Entre linhas sem estoque vence a mais recente (timestamp decrescente)
+        'ts_ord': np.where(sem_estoque, -recentes['timestamp'].to_numpy(dtype='datetime64[ns]').astype('int64'), 0),
+        'loja': recentes['loja'].to_numpy(),
+    }, index=recentes.index)
+    ordem = chaves.sort_values(['produto_base', 'sem_estoque', 'preco_ord', 'ts_ord', 'loja'], kind='mergesort')
+    return recentes.loc[ordem.drop_duplicates('produto_base', keep='first').index]
+
+def agrupar_por_produto(recentes):
+    """Colunas de `recentes` em listas, com as fronteiras de cada produto e os dados da linha principal.
+
+    As lojas de cada produto são as posições inicios[i]:fins[i] (arrays contíguos + fronteiras
+    de grupo, sem iterrows()); nomes/imagens/... vêm da linha de `escolher_principais`.
+    """
+    recentes = recentes.sort_values(['produto_base', 'loja'], kind='mergesort')
+    produtos = recentes['produto_base'].to_numpy()
+    inicios = np.flatnonzero(np.r_[True, produtos[1:] != produtos[:-1]])
+    principais = escolher_principais(recentes).set_index('produto_base').loc[produtos[inicios]]
+    return {
+        "produtos": produtos,
+        "inicios": inicios.tolist(),
+        "fins": np.r_[inicios[1:], len(produtos)].tolist(),
+        "lojas": recentes['loja'].tolist(),
+        "precos": recentes['preco'].astype(float).tolist(),
+        "urls": recentes['url'].tolist(),
+        "nomes": principais['nome_completo_raspado'].tolist(),
+        "imagens": principais['imagem_url'].tolist(),
+        "categorias": principais['categoria'].tolist(),
+        "p_min": principais['preco_min'].astype(float).tolist(),
+        "p_med": principais['preco_medio'].astype(float).tolist(),
+    }
+
+def montar_listagem(recentes, ofertas=None):
+    """Lista no formato de /api/products a partir do estado atual (com preco_min/preco_medio)."""
+    return list(iterar_listagem(recentes, ofertas))
+
+def iterar_listagem(recentes, ofertas=None):
+    """Como montar_listagem, mas devolve um iterador que monta cada produto só quando pedido.
+
+    A parte vetorizada (ordenação, linha principal, colunas em listas) roda aqui, antes de
+    devolver o iterador, para que um erro apareça antes de a resposta começar a ser enviada.
+    `ofertas` (dict produto_base -> sinais de precos_ofertas) entra como "oferta" quando
+    informado; None deixa o campo fora.
+    """
+    if recentes.empty: return iter(())
+    g = agrupar_por_produto(recentes)
+
+    def gerar():
+        lojas, precos, urls = g["lojas"], g["precos"], g["urls"]
+        for i, (ini, fim) in enumerate(zip(g["inicios"], g["fins"])):
+            item = {
+                "id": str(g["produtos"][ini]),
+                "name": g["nomes"][i],
+                "image": g["imagens"][i],
+                "category": g["categorias"][i],
+                "stores": [{
+                    "name": lojas[j],
+                    "price": precos[j],
+                    "affiliateLink": urls[j],
+                    "inStock": precos[j] > 0
+                } for j in range(ini, fim)],
+                "priceHistory": [],
+                "precoMinimoHistorico": g["p_min"][i],
+                "precoMedioHistorico": g["p_med"][i]
+            }
+            if ofertas is not None: item["oferta"] = ofertas.get(item["id"])
+            yield item
+    return gerar()
+
+def montar_detalhes(recentes, descricoes=None, historicos=None, ofertas=None):
+    """{produto_base: payload de /api/product/<nome>} para todos os produtos de `recentes`.
+
+    `descricoes`, `historicos` e `ofertas` são dicts produto_base -> HTML / priceHistory /
+    sinais de precos_ofertas; quando None,
+    o campo fica fora do payload (projeção `fields=` da rota de lote).
+    """
+    if recentes.empty: return {}
+    g = agrupar_por_produto(recentes)
+    lojas, precos, urls = g["lojas"], g["precos"], g["urls"]
+
+    detalhes = {}
+    for i, (ini, fim) in enumerate(zip(g["inicios"], g["fins"])):
+        produto = str(g["produtos"][ini])
+        detalhe = {
+            "id": produto,
+            "name": g["nomes"][i],
+            "image": g["imagens"][i],
+            "category": g["categorias"][i],
+            "stores": [{
+                "name": lojas[j],
+                "price": precos[j],
+                "originalPrice": None,
+                "shipping": "Consultar",
+                "rating": 0, "reviews": 0,
+                "affiliateLink": urls[j],
+                "inStock": precos[j] > 0
+            } for j in range(ini, fim)],
+            "precoMinimoHistorico": g["p_min"][i],
+            "precoMedioHistorico": g["p_med"][i],
+        }
+        if historicos is not None: detalhe["priceHistory"] = historicos.get(produto, [])
+        if descricoes is not None: detalhe["descricao"] = descricoes.get(produto, "")
+        if ofertas is not None: detalhe["oferta"] = ofertas.get(produto)
+        detalhes[produto] = detalhe
+    return detalhes
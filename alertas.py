@@ -0,0 +1,153 @@
+# meu_comparador_backend/alertas.py (v1.0 - Alertas de Queda de Preço na Gravação)
+#
+# Inscrições ("me avise quando o RTX 4070 ficar abaixo de R$ X" ou "quando atingir o menor
+# preço histórico") ficam em `alertas_inscricoes`. A avaliação roda dentro de salvar_precos,
+# antes de o lote ser aplicado a precos_atual/precos_stats: para cada produto do lote compara
+# o melhor preço antes e depois do lote com o alvo e com o mínimo histórico já calculado.
+# Só lê as linhas de estado e as inscrições dos produtos do lote (nunca o histórico), e os
+# disparos vão para a outbox `alertas_saida`, de onde um processo de envio lê os pendentes
+# (enviado_em nulo).
+#
+# Os alertas disparam na transição: abaixo do alvo quando o melhor preço cruza o alvo (ou na
+# primeira avaliação de uma inscrição que já nasce abaixo dele); mínimo histórico quando o
+# melhor preço chega ao mínimo vindo de cima ou o supera.
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from carga import executar_em_lote
+
+TIPOS = ("abaixo_de", "minimo_historico")
+TOLERANCIA = 0.005
+
+DDL_ALERTAS = [
+    """
+    CREATE TABLE IF NOT EXISTS alertas_inscricoes (
+        id SERIAL PRIMARY KEY,
+        produto_base VARCHAR(200) NOT NULL,
+        contato VARCHAR(255) NOT NULL,
+        tipo VARCHAR(20) NOT NULL,
+        preco_alvo FLOAT,
+        ativo BOOLEAN NOT NULL DEFAULT TRUE,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        ultimo_disparo TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_alertas_inscricoes_produto ON alertas_inscricoes (produto_base) WHERE ativo",
+    """
+    CREATE TABLE IF NOT EXISTS alertas_saida (
+        id SERIAL PRIMARY KEY,
+        inscricao_id INTEGER NOT NULL,
+        produto_base VARCHAR(200) NOT NULL,
+        contato VARCHAR(255) NOT NULL,
+        motivo VARCHAR(20) NOT NULL,
+        loja VARCHAR(50),
+        preco FLOAT NOT NULL,
+        preco_anterior FLOAT,
+        preco_referencia FLOAT,
+        url TEXT,
+        criado_em TIMESTAMP NOT NULL,
+        enviado_em TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_alertas_saida_pendentes ON alertas_saida (id) WHERE enviado_em IS NULL",
+]
+
+COLUNAS_SAIDA = ["inscricao_id", "produto_base", "contato", "motivo", "loja", "preco", "preco_anterior",
+                 "preco_referencia", "url", "criado_em"]
+SQL_INSERIR_SAIDA = f"INSERT INTO alertas_saida ({', '.join(COLUNAS_SAIDA)}) VALUES %s"
+
+SQL_ATUAIS = text("""
+    SELECT produto_base, loja, preco, url FROM precos_atual WHERE produto_base IN :produtos
+""").bindparams(bindparam('produtos', expanding=True))
+SQL_MINIMOS = text("""
+    SELECT produto_base, preco_min FROM precos_stats WHERE produto_base IN :produtos
+""").bindparams(bindparam('produtos', expanding=True))
+SQL_INSCRICOES = text("""
+    SELECT id, produto_base, contato, tipo, preco_alvo, ultimo_disparo
+    FROM alertas_inscricoes WHERE ativo AND produto_base IN :produtos
+""").bindparams(bindparam('produtos', expanding=True))
+SQL_MARCAR_DISPARO = text("""
+    UPDATE alertas_inscricoes SET ultimo_disparo = :momento WHERE id IN :ids
+""").bindparams(bindparam('ids', expanding=True))
+
+def _melhores(linhas):
+    """Melhor preço válido (> 0) por produto_base, com a loja e a URL que o oferecem."""
+    validos = linhas[linhas['preco'] > 0]
+    if validos.empty: return pd.DataFrame(columns=['preco', 'loja', 'url'])
+    return validos.sort_values(['preco', 'loja']).drop_duplicates('produto_base').set_index('produto_base')
+
+def comparar_lote(conn, df):
+    """Por produto do lote: melhor preço antes e depois do lote e o mínimo histórico anterior.
+
+    Lê só precos_atual/precos_stats dos produtos do lote, antes de atualizar_estado_atual.
+    """
+    lote = df.assign(preco=pd.to_numeric(df['preco'], errors='coerce').fillna(0.0))
+    lote = lote.sort_values('timestamp').drop_duplicates(['produto_base', 'loja'], keep='last')
+    produtos = list(lote['produto_base'].unique())
+    if not produtos: return pd.DataFrame()
+
+    antes = pd.DataFrame(conn.execute(SQL_ATUAIS, {"produtos": produtos}).all(), columns=['produto_base', 'loja', 'preco', 'url'])
+    antes['preco'] = pd.to_numeric(antes['preco'], errors='coerce').fillna(0.0)
+    # Depois do lote: a linha nova de cada loja que veio no lote, a antiga das demais
+    depois = pd.concat([lote[['produto_base', 'loja', 'preco', 'url']], antes]).drop_duplicates(['produto_base', 'loja'])
+    minimos = pd.DataFrame(conn.execute(SQL_MINIMOS, {"produtos": produtos}).all(), columns=['produto_base', 'preco_min'])
+
+    comparacao = pd.DataFrame(index=pd.Index(produtos, name='produto_base'))
+    melhor_antes, melhor_depois = _melhores(antes), _melhores(depois)
+    comparacao['melhor_antes'] = melhor_antes['preco']
+    comparacao['melhor'] = melhor_depois['preco']
+    comparacao['loja'] = melhor_depois['loja']
+    comparacao['url'] = melhor_depois['url']
+    comparacao['minimo_antes'] = minimos.set_index('produto_base')['preco_min'].astype(float)
+    return comparacao[comparacao['melhor'].notna()]
+
+def avaliar_alertas(conn, df, momento=None):
+    """Grava na outbox os alertas disparados pelo lote `df` (linhas de `precos`); retorna quantos."""
+    if df.empty: return 0
+    momento = momento or df['timestamp'].max()
+    if isinstance(momento, pd.Timestamp): momento = momento.to_pydatetime()
+    comparacao = comparar_lote(conn, df)
+    if comparacao.empty: return 0
+
+    inscricoes = pd.DataFrame(conn.execute(SQL_INSCRICOES, {"produtos": list(comparacao.index)}).all(),
+                              columns=['id', 'produto_base', 'contato', 'tipo', 'preco_alvo', 'ultimo_disparo'])
+    if inscricoes.empty: return 0
+    casados = inscricoes.join(comparacao, on='produto_base')
+
+    melhor, antes = casados['melhor'], casados['melhor_antes']
+    alvo = pd.to_numeric(casados['preco_alvo'], errors='coerce')
+    minimo = casados['minimo_antes']
+    abaixo = ((casados['tipo'] == 'abaixo_de') & (melhor < alvo)
+              & (antes.isna() | (antes >= alvo) | casados['ultimo_disparo'].isna()))
+    chegou_ao_minimo = (melhor <= minimo + TOLERANCIA) & (antes.isna() | (antes > minimo + TOLERANCIA))
+    novo_minimo = minimo.isna() | (melhor < minimo - TOLERANCIA)
+    historico = (casados['tipo'] == 'minimo_historico') & (chegou_ao_minimo | novo_minimo)
+    # Produto sem histórico nenhum: o primeiro preço não é "queda"
+    historico &= antes.notna() | minimo.notna()
+
+    disparados = casados[abaixo | historico]
+    if disparados.empty: return 0
+    saida = pd.DataFrame({
+        "inscricao_id": disparados['id'].astype(int), "produto_base": disparados['produto_base'],
+        "contato": disparados['contato'], "motivo": disparados['tipo'], "loja": disparados['loja'],
+        "preco": disparados['melhor'], "preco_anterior": disparados['melhor_antes'],
+        "preco_referencia": alvo[disparados.index].where(disparados['tipo'] == 'abaixo_de', disparados['minimo_antes']),
+        "url": disparados['url'],
+    })
+    registros = saida.astype(object).where(saida.notna(), None).to_dict(orient='records')
+    for r in registros: r["criado_em"] = momento
+    executar_em_lote(conn, SQL_INSERIR_SAIDA, COLUNAS_SAIDA, registros)
+    conn.execute(SQL_MARCAR_DISPARO, {"momento": momento, "ids": [int(i) for i in disparados['id']]})
+    return len(registros)
+
+def inscrever(conn, produto_base, contato, tipo, preco_alvo=None):
+    """Cria uma inscrição e devolve o id."""
+    if tipo not in TIPOS: raise ValueError(f"tipo deve ser um de {TIPOS}")
+    if tipo == 'abaixo_de' and (preco_alvo is None or preco_alvo <= 0):
+        raise ValueError("preco_alvo > 0 é obrigatório para 'abaixo_de'")
+    return conn.execute(text("""
+        INSERT INTO alertas_inscricoes (produto_base, contato, tipo, preco_alvo)
+        VALUES (:produto_base, :contato, :tipo, :preco_alvo) RETURNING id
+    """), {"produto_base": produto_base, "contato": contato, "tipo": tipo,
+           "preco_alvo": preco_alvo if tipo == 'abaixo_de' else None}).scalar()
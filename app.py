@@ -1,202 +1,703 @@
-# meu_comparador_backend/app.py (v13.4 - Rota de Cupons Validada)
+# meu_comparador_backend/app.py (v15.2 - ETag por Codificação no Cache de Respostas)
 
-from flask import Flask, jsonify, request
+from flask import Flask, g, has_request_context, jsonify, request, Response, send_file, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 import os
 import traceback
-from sqlalchemy import create_engine 
+from datetime import datetime
+import hashlib
+import threading
+import time
+from functools import wraps
 import numpy as np
+from sqlalchemy import bindparam, text
+
+import snapshot
+
+from alertas import inscrever
+from agregacao import estado_atual_de_historico, finalizar_stats, iterar_listagem, montar_detalhes, montar_listagem
+from busca import IndiceBusca, documentos_de_atuais
+from cache import CacheLRU, VersaoDados
+from config import env_int
+from consultas import FILTROS_OFERTA, ler_filtros, listar_ids
+from cupons import carregar_catalogo, ler_versao
+from database import get_engine, pool_stats
+from descricoes import carregar_descricoes, selecionar_descricoes_legado
+from historico import (BALDES, agregar_historico, agregar_historicos, carregar_historico, carregar_historicos,
+                       historico_bruto, ler_intervalo)
+from imagens import TAMANHOS, IndiceImagens, caminho_variante
+from metricas import registro
+from ofertas import carregar_ofertas
+from serializacao import (TAMANHO_MIN_COMPRESSAO, comprimir, comprimir_stream, dumps, escolher_codificacao,
+                          gerar_lista_json)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
+
+# --- MÉTRICAS (GET /metrics) ---
+ETAPAS = registro.histograma("api_etapa_segundos", "Tempo das etapas das rotas (leitura no banco, agregação, serialização)", ("rota", "etapa"))
+REQUISICOES = registro.contador("api_requisicoes_total", "Requisições atendidas", ("rota", "metodo", "status"))
+DURACAO = registro.histograma("api_requisicao_segundos", "Tempo total de cada requisição", ("rota",))
+ERROS_DB = registro.contador("api_erros_db_total", "Falhas de leitura no banco", ("origem",))
+
+def _rota():
+    """Regra da rota (ex.: /api/product/<path:product_base_name>), para não criar uma série por produto."""
+    if not has_request_context(): return "-"
+    return request.url_rule.rule if request.url_rule else "desconhecida"
+
+def etapa(nome):
+    return ETAPAS.cronometro(rota=_rota(), etapa=nome)
+
+def _json(dados):
+    with etapa('serializacao'):
+        return Response(dumps(dados), mimetype='application/json')
+
+def _json_stream(itens):
+    """Lista JSON enviada à medida que os itens são produzidos (nem a lista nem o JSON inteiro ficam na memória)."""
+    return Response(stream_with_context(gerar_lista_json(itens)), mimetype='application/json')
+
+@app.before_request
+def _iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
+
+@app.after_request
+def _registrar_requisicao(resp):
+    inicio = g.pop('inicio_requisicao', None)
+    if inicio is not None:
+        DURACAO.observar(time.perf_counter() - inicio, rota=_rota())
+    REQUISICOES.inc(rota=_rota(), metodo=request.method, status=resp.status_code)
+    return resp
+
+@app.after_request
+def _comprimir(resp):
+    """gzip/br para respostas JSON que ainda não vieram comprimidas (as do cache já vêm)."""
+    if resp.status_code != 200 or resp.mimetype != 'application/json' or 'Content-Encoding' in resp.headers: return resp
+    if resp.direct_passthrough: return resp  # arquivo do snapshot: vai como está (sendfile)
+    resp.vary.add('Accept-Encoding')
+    codificacao = escolher_codificacao(request.accept_encodings)
+    if codificacao is None: return resp
+    if resp.is_streamed:
+        resp.response = comprimir_stream(resp.response, codificacao)
+        resp.headers.pop('Content-Length', None)
+    else:
+        dados = resp.get_data()
+        if len(dados) < TAMANHO_MIN_COMPRESSAO: return resp
+        resp.set_data(comprimir(dados, codificacao))
+    resp.headers['Content-Encoding'] = codificacao
+    return resp
 
 # --- FUNÇÕES AUXILIARES ---
 def get_db_engine():
-    """Cria a conexão com o banco de dados."""
+    """Retorna o engine compartilhado do worker (um pool por processo, criado uma vez)."""
     try:
-        DATABASE_URL = os.environ.get('DATABASE_URL')
-        if not DATABASE_URL: return None
-        if DATABASE_URL.startswith("postgres://"):
-            DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
-        return create_engine(DATABASE_URL)
-    except: return None
+        return get_engine()
+    except Exception as e:
+        print(f"Erro ao criar engine: {e}")
+        return None
+
+def _normalizar_colunas(df):
+    """Tipos e valores padrão das colunas de `precos` (comum às leituras de histórico e estado atual)."""
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df['preco'] = pd.to_numeric(df['preco'], errors='coerce').fillna(0.0)
+
+    for col in ['imagem_url', 'descricao', 'categoria', 'produto_base']:
+         if col not in df.columns: df[col] = ''
+
+    df['imagem_url'] = df['imagem_url'].fillna('')
+    df['descricao'] = df['descricao'].fillna('')
+    df['categoria'] = df['categoria'].fillna('Eletrônicos').str.strip()
+    df['produto_base'] = df['produto_base'].str.strip()
+    return df
 
 def get_dados_do_db():
-    """Busca os produtos do banco."""
+    """Busca todo o histórico de produtos do banco (caminho legado, varre `precos` inteira)."""
     try:
         engine = get_db_engine()
         if not engine: return None
         
-        df = pd.read_sql("SELECT * FROM precos", engine)
+        with etapa('db_historico'):
+            df = pd.read_sql("SELECT * FROM precos", engine)
         if df.empty: return None
 
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['preco'] = pd.to_numeric(df['preco'], errors='coerce').fillna(0.0)
-        
-        for col in ['imagem_url', 'descricao', 'categoria', 'produto_base']:
-             if col not in df.columns: df[col] = ''
-        
-        df['imagem_url'] = df['imagem_url'].fillna('')
-        df['descricao'] = df['descricao'].fillna('')
-        df['categoria'] = df['categoria'].fillna('Eletrônicos').str.strip()
-        df['produto_base'] = df['produto_base'].str.strip()
-        
-        return df
+        return _normalizar_colunas(df)
     except Exception as e: 
         print(f"Erro DB: {e}")
+        ERROS_DB.inc(origem='historico')
+        return None
+
+def get_dados_atuais(produto_base=None, com_descricao=False):
+    """Última linha de cada (produto, loja) + mínimo/média histórica, lidos de `precos_atual`/`precos_stats`.
+
+    `produto_base` pode ser um nome ou uma lista de nomes.
+    Retorna DataFrame (vazio se não houver linhas) ou None em erro de banco.
+    Se as tabelas de estado atual ainda não existirem, calcula a partir de `precos`.
+    """
+    engine = get_db_engine()
+    if not engine: return None
+
+    if isinstance(produto_base, str): produto_base = [produto_base]
+    filtro, params = "", {}
+    if produto_base is not None:
+        if not produto_base: return pd.DataFrame()
+        filtro = " WHERE {coluna} IN :produtos"
+        params['produtos'] = list(produto_base)
+
+    colunas = "a.produto_base, a.loja, a.timestamp, a.categoria, a.nome_completo_raspado, a.preco, a.imagem_url, a.url"
+    if com_descricao: colunas += ", a.descricao"
+    sql = f"""
+        SELECT {colunas}, s.preco_min, s.preco_soma, s.preco_qtd
+        FROM precos_atual a
+        LEFT JOIN precos_stats s ON s.produto_base = a.produto_base
+    """ + filtro.format(coluna="a.produto_base")
+
+    try:
+        consulta = text(sql)
+        if params: consulta = consulta.bindparams(bindparam('produtos', expanding=True))
+        with etapa('db_estado_atual'):
+            df = pd.read_sql(consulta, engine, params=params)
+        return finalizar_stats(_normalizar_colunas(df))
+    except Exception as e:
+        print(f"Aviso: estado atual indisponível ({type(e).__name__}), usando histórico de precos.")
+        ERROS_DB.inc(origem='estado_atual')
+
+    if produto_base is None:
+        df = get_dados_do_db()
+    else:
+        try:
+            consulta = text("SELECT * FROM precos" + filtro.format(coluna="produto_base"))
+            with etapa('db_historico'):
+                df = pd.read_sql(consulta.bindparams(bindparam('produtos', expanding=True)), engine, params=params)
+            df = _normalizar_colunas(df)
+        except Exception as e:
+            print(f"Erro DB: {e}")
+            ERROS_DB.inc(origem='historico')
+            return None
+    if df is None: return None
+    if df.empty: return df
+    with etapa('agregacao'):
+        return estado_atual_de_historico(df)
+
+def get_descricoes_produtos(df_recentes):
+    """{produto_base: descrição exibida} (Pichau > Terabyte > Vencedor), escolhida pelo scraper na gravação.
+
+    Lê as linhas de `descricoes` dos produtos numa consulta; antes da migração aplica a mesma
+    regra às linhas atuais.
+    """
+    produtos = list(df_recentes['produto_base'].unique())
+    engine = get_db_engine()
+    if not engine: return {}
+    try:
+        with engine.connect() as conn:
+            return carregar_descricoes(conn, produtos)
+    except Exception as e:
+        print(f"Aviso: descrições por hash indisponíveis ({type(e).__name__}), usando coluna descricao.")
+
+    df_descricoes = get_dados_atuais(produtos, com_descricao=True)
+    if df_descricoes is None or df_descricoes.empty: return {}
+    return selecionar_descricoes_legado(df_descricoes)
+
+def get_historicos_produtos(produtos, modo_hist):
+    """{produto_base: priceHistory} de vários produtos com uma leitura de `precos` (modo day|hour|week|raw|none)."""
+    if modo_hist == 'none': return {}
+    with etapa('db_historico'):
+        df_hist = carregar_historicos(get_db_engine(), produtos)
+    if modo_hist == 'raw': return historico_bruto(df_hist)
+    with etapa('agregacao'):
+        return agregar_historicos(df_hist, modo_hist if modo_hist in BALDES else 'day')
+
+def get_ofertas_produtos(produtos=None):
+    """{produto_base: "oferta"} de precos_ofertas (todos quando `produtos` é None); None se a tabela não existir."""
+    engine = get_db_engine()
+    if not engine: return None
+    try:
+        with etapa('db_ofertas'), engine.connect() as conn:
+            return carregar_ofertas(conn, produtos)
+    except Exception as e:
+        print(f"Aviso: qualidade da oferta indisponível ({type(e).__name__}), rode migrate_ofertas.py.")
         return None
 
+def montar_detalhes_produtos(df_recentes, modo_hist='day', campos=None):
+    """{produto_base: payload de detalhe} dos produtos de `df_recentes` (estado atual).
+
+    Descrição, histórico e oferta só são lidos se estiverem em `campos` (None = todos).
+    """
+    produtos = list(df_recentes['produto_base'].unique())
+    descricoes = get_descricoes_produtos(df_recentes) if campos is None or 'descricao' in campos else None
+    historicos = get_historicos_produtos(produtos, modo_hist) if campos is None or 'priceHistory' in campos else None
+    ofertas = get_ofertas_produtos(produtos) if campos is None or 'oferta' in campos else None
+    with etapa('agregacao'):
+        return montar_detalhes(df_recentes, descricoes, historicos, ofertas)
+
+# --- CACHE DE RESPOSTAS ---
+# Os dados só mudam quando o scraper termina; a "versão" (MAX(timestamp) etc.) é conferida no banco
+# no máximo a cada CACHE_VERSAO_TTL segundos e entra na chave do cache e no ETag.
+CACHE_MAX_AGE = env_int("CACHE_MAX_AGE", 60)
+cache_respostas = CacheLRU(max_itens=env_int("CACHE_MAX_ITENS", 256), ttl=env_int("CACHE_TTL", 600))
+
+def _consultar_versao(*consultas):
+    """Executa a primeira consulta de versão que funcionar (tabelas novas podem não existir ainda)."""
+    engine = get_db_engine()
+    if not engine: return None
+    for sql in consultas:
+        try:
+            with engine.connect() as conn:
+                return repr(tuple(conn.execute(text(sql)).one()))
+        except Exception: continue
+    return None
+
+versoes_dados = {
+    'produtos': VersaoDados(lambda: _consultar_versao(
+        "SELECT MAX(timestamp), COUNT(*) FROM precos_atual",
+        "SELECT MAX(timestamp) FROM precos"), ttl=env_int("CACHE_VERSAO_TTL", 15)),
+    'cupons': VersaoDados(lambda: _consultar_versao(
+        "SELECT MAX(id), COUNT(*), MAX(timestamp), SUM(CASE WHEN ativo THEN 1 ELSE 0 END) FROM cupons",
+        "SELECT MAX(id), COUNT(*), MAX(timestamp) FROM cupons"), ttl=env_int("CACHE_VERSAO_TTL", 15)),
+}
+
+def _etag_codificado(base):
+    """ETag forte por variante: gzip, br e identity do mesmo conteúdo são bytes diferentes."""
+    return f"{base}-{escolher_codificacao(request.accept_encodings) or 'identity'}"
+
+def _headers_cache(resp, etag):
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = f"public, max-age={CACHE_MAX_AGE}"
+    return resp
+
+def _resposta_do_cache(item):
+    """Response a partir de um item do cache, já comprimida na codificação que o cliente aceita.
+
+    As versões comprimidas ficam no próprio item, calculadas na primeira vez que alguém pede.
+    """
+    dados, mimetype, extras, comprimidos = item
+    resp = Response(dados, mimetype=mimetype, headers=extras)
+    if mimetype != 'application/json': return resp
+    resp.vary.add('Accept-Encoding')
+    codificacao = escolher_codificacao(request.accept_encodings)
+    if codificacao is None or len(dados) < TAMANHO_MIN_COMPRESSAO: return resp
+    if codificacao not in comprimidos: comprimidos[codificacao] = comprimir(dados, codificacao)
+    resp.set_data(comprimidos[codificacao])
+    resp.headers['Content-Encoding'] = codificacao
+    return resp
+
+def _guardar_ao_final(pedacos, chave, mimetype, extras):
+    """Repassa os pedaços de uma resposta em streaming e guarda o corpo no cache quando termina.
+
+    Se o cliente desistir no meio, nada é guardado.
+    """
+    partes = []
+    for pedaco in pedacos:
+        partes.append(pedaco)
+        yield pedaco
+    cache_respostas.set(chave, (b''.join(partes), mimetype, extras, {}))
+
+def com_cache(escopo):
+    """Decorator: serve a resposta do cache LRU/TTL e responde 304 para If-None-Match válido."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versao = versoes_dados[escopo].get()
+            if versao is None: return view(*args, **kwargs)
+
+            chave = (escopo, request.full_path, versao)
+            etag = _etag_codificado(hashlib.sha1(repr(chave).encode('utf-8')).hexdigest()[:24])
+            if etag in request.if_none_match:
+                return _headers_cache(Response(status=304), etag)
+
+            item = cache_respostas.get(chave)
+            if item is None:
+                resp = app.make_response(view(*args, **kwargs))
+                if resp.status_code != 200: return resp
+                extras = {k: v for k, v in resp.headers.items() if k.startswith('X-')}
+                if resp.is_streamed:
+                    resp.response = _guardar_ao_final(resp.response, chave, resp.mimetype, extras)
+                    return _headers_cache(resp, etag)
+                item = (resp.get_data(), resp.mimetype, extras, {})
+                cache_respostas.set(chave, item)
+            return _headers_cache(_resposta_do_cache(item), etag)
+        return wrapper
+    return decorator
+
+def com_snapshot(arquivo):
+    """Decorator: serve o arquivo do snapshot atual (snapshot.py) quando existir.
+
+    `arquivo(*args)` dá o caminho relativo dentro da versão. Só vale para a requisição sem
+    query string (é a única renderizada); o resto, e tudo quando não há snapshot, segue
+    para a view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.args or request.environ.get(snapshot.IGNORAR): return view(*args, **kwargs)
+            achado = snapshot.localizar(arquivo(*args, **kwargs), request.accept_encodings)
+            if achado is None: return view(*args, **kwargs)
+            caminho, codificacao, versao = achado
+            resp = send_file(caminho, mimetype='application/json', conditional=True, max_age=CACHE_MAX_AGE,
+                             etag=f"{versao}-{codificacao or 'identity'}")
+            if codificacao: resp.headers['Content-Encoding'] = codificacao
+            resp.vary.add('Accept-Encoding')
+            return resp
+        return wrapper
+    return decorator
+
+# --- IMAGENS (cache local do scraper, ver imagens.py) ---
+# "image" passa a apontar para /api/image/<hash> quando a imagem está no cache; a URL da loja
+# fica em "imageOriginal". API_URL_PUBLICA prefixa a rota (vazio = caminho relativo).
+URL_PUBLICA = os.environ.get("API_URL_PUBLICA", "").rstrip('/')
+IMAGENS_MAX_AGE = env_int("IMAGENS_MAX_AGE", 365 * 24 * 3600)
+indice_imagens = IndiceImagens()
+
+def _referenciar_imagens(itens, tamanho='list'):
+    """Troca "image" pela rota do cache nos itens cuja imagem já foi baixada (gera os itens)."""
+    indice = indice_imagens.atualizar()
+    sufixo = '' if tamanho == 'list' else f"?size={tamanho}"
+    for item in itens:
+        chave = indice.hash_da_url(item.get('image'))
+        if chave:
+            item['imageOriginal'] = item['image']
+            item['image'] = f"{URL_PUBLICA}/api/image/{chave}{sufixo}"
+        yield item
+
 # --- ROTAS ---
 
 @app.route('/', methods=['GET'])
 def home():
     return jsonify({"message": "API V3.0 Online (Com Cupons)"}), 200
 
+@app.route('/api/health/db', methods=['GET'])
+def db_health():
+    """Estatísticas do pool de conexões deste worker (para dimensionar DB_POOL_SIZE/DB_MAX_OVERFLOW)."""
+    return jsonify(pool_stats()), 200
+
+@app.route('/api/health/cache', methods=['GET'])
+def cache_health():
+    """Estatísticas do cache de respostas deste worker."""
+    return jsonify(cache_respostas.stats()), 200
+
+registro.medidor("api_cache_hits", "Acertos do cache de respostas", lambda: cache_respostas.stats()['hits'])
+registro.medidor("api_cache_misses", "Faltas do cache de respostas", lambda: cache_respostas.stats()['misses'])
+registro.medidor("db_pool_conexoes_em_uso", "Conexões do pool em uso", lambda: pool_stats().get('checked_out'))
+registro.medidor("db_pool_espera_total_ms", "Tempo total esperando conexão do pool", lambda: pool_stats().get('wait_total_ms'))
+registro.medidor("db_pool_timeouts", "Esperas por conexão que estouraram DB_POOL_TIMEOUT", lambda: pool_stats().get('timeouts'))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Histogramas e contadores deste worker no formato texto do Prometheus."""
+    return Response(registro.exportar(), mimetype='text/plain; version=0.0.4')
+
 # --- ROTA DE CUPONS (CRUCIAL) ---
+# O catálogo (cupons ativos + removidos recentes, cupons.py) é montado uma vez por versão dos
+# dados e compartilhado pelas requisições do worker; filtro por loja/validade e delta são em memória.
+_catalogo_cupons = {'versao': None, 'catalogo': None}
+_catalogo_cupons_lock = threading.Lock()
+
+def get_catalogo_cupons():
+    versao = versoes_dados['cupons'].get()
+    catalogo = _catalogo_cupons['catalogo']
+    # Banco fora do ar (versão None): continua servindo o último catálogo montado
+    if catalogo is not None and (versao is None or versao == _catalogo_cupons['versao']): return catalogo
+    if not _catalogo_cupons_lock.acquire(blocking=catalogo is None): return catalogo
+    try:
+        if _catalogo_cupons['catalogo'] is not None and _catalogo_cupons['versao'] == versao: return _catalogo_cupons['catalogo']
+        engine = get_db_engine()
+        if not engine: return _catalogo_cupons['catalogo']
+        with etapa('db_cupons'), engine.connect() as conn:
+            catalogo = carregar_catalogo(conn, datetime.now())
+        _catalogo_cupons.update(versao=versao, catalogo=catalogo)
+        return catalogo
+    finally:
+        _catalogo_cupons_lock.release()
+
 @app.route('/api/coupons', methods=['GET'])
 def get_coupons():
-    """Retorna a lista de cupons ativos no banco."""
+    """Cupons ativos e dentro da validade: ?store=Kabum filtra a loja, ?expired=1 inclui os vencidos.
+
+    A versão vai no header X-Coupons-Version; com ?since=<versão> a resposta é
+    {"version", "added", "removed", "full"}: só os cupons novos/alterados e os ids que saíram
+    (ou tudo em "added", com full=true, se a versão for antiga demais).
+    """
+    loja = (request.args.get('store') or '').strip() or None
+    incluir_vencidos = request.args.get('expired', '').strip().lower() in ('1', 'true', 'yes', 'sim')
     try:
-        engine = get_db_engine()
-        if not engine: 
+        desde = ler_versao(request.args['since']) if request.args.get('since') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        catalogo = get_catalogo_cupons()
+        if catalogo is None:
             print("Erro: Sem conexão com o banco para buscar cupons.")
             return jsonify([])
-        
-        # Busca os cupons
-        df = pd.read_sql("SELECT * FROM cupons ORDER BY id DESC", engine)
-        
-        if df.empty: 
-            return jsonify([]) # Lista vazia se não houver cupons
-        
-        # Converte para lista de dicionários
-        cupons = df.to_dict(orient='records')
-        return jsonify(cupons)
-        
     except Exception as e:
         print(f"Erro ao buscar cupons: {e}")
+        ERROS_DB.inc(origem='cupons')
         # Retorna lista vazia em vez de erro 500 para não quebrar o front
         return jsonify([])
 
+    agora = datetime.now()
+    versao = catalogo.versao(agora)
+    # O conteúdo só muda com os dados ou quando mais um cupom vence
+    etag = _etag_codificado(hashlib.sha1(repr((catalogo.versao_dados, catalogo.vencidos(agora), request.full_path)).encode('utf-8')).hexdigest()[:24])
+    if etag in request.if_none_match:
+        resp = _headers_cache(Response(status=304), etag)
+    elif desde is None:
+        resp = _headers_cache(_json(catalogo.listar(agora, loja, incluir_vencidos)), etag)
+    else:
+        delta = catalogo.delta(desde, agora, loja, incluir_vencidos)
+        if delta is None:
+            corpo = {"version": versao, "added": catalogo.listar(agora, loja, incluir_vencidos), "removed": [], "full": True}
+        else:
+            corpo = {"version": versao, "added": delta[0], "removed": delta[1], "full": False}
+        resp = _headers_cache(_json(corpo), etag)
+    resp.headers['X-Coupons-Version'] = versao
+    return resp
+
 # --- ROTA DE PRODUTOS (LISTAGEM) ---
 @app.route('/api/products', methods=['GET'])
+@com_snapshot(lambda: snapshot.LISTAGEM)
+@com_cache('produtos')
 def get_products():
-    df_dados = get_dados_do_db()
-    if df_dados is None: return jsonify({"error": "Sem dados"}), 500
-
-    produtos_formatados = []
-    try:
-        for nome_base, group in df_dados.groupby('produto_base'):
-            try:
-                df_recentes = group.loc[group.groupby('loja')['timestamp'].idxmax()]
-                group_valido = df_recentes[df_recentes['preco'] > 0]
-                
-                if not group_valido.empty:
-                    principal = group_valido.loc[group_valido['preco'].idxmin()]
-                else:
-                    principal = df_recentes.sort_values(by='timestamp', ascending=False).iloc[0]
-
-                precos_hist = group[group['preco'] > 0]['preco']
-                p_min = float(precos_hist.min()) if not precos_hist.empty else 0.0
-                p_med = float(precos_hist.mean()) if not precos_hist.empty else 0.0
-
-                lojas = []
-                for _, row in df_recentes.iterrows():
-                    lojas.append({
-                        "name": row['loja'],
-                        "price": float(row['preco']),
-                        "affiliateLink": row['url'],
-                        "inStock": row['preco'] > 0
-                    })
-
-                produtos_formatados.append({
-                    "id": str(nome_base), 
-                    "name": principal['nome_completo_raspado'],
-                    "image": principal['imagem_url'],
-                    "category": principal['categoria'], 
-                    "stores": lojas,
-                    "priceHistory": [],
-                    "precoMinimoHistorico": p_min, 
-                    "precoMedioHistorico": p_med
-                })
-            except: continue
-    except Exception as e: return jsonify({"error": str(e)}), 500
-    return jsonify(produtos_formatados)
+    if any(p in request.args for p in PARAMS_LISTAGEM):
+        return _listagem_filtrada()
+
+    df_atual = get_dados_atuais()
+    if df_atual is None or df_atual.empty: return jsonify({"error": "Sem dados"}), 500
+    ofertas = get_ofertas_produtos()
+
+    try:
+        with etapa('agregacao'):
+            produtos = iterar_listagem(df_atual, ofertas)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    # Cada produto é montado e serializado só quando a resposta chega nele
+    return _json_stream(_referenciar_imagens(produtos))
+
+PARAMS_LISTAGEM = ('category', 'store', 'min_price', 'max_price', 'in_stock', 'sort', 'limit', 'cursor') + tuple(FILTROS_OFERTA)
+
+def _listagem_filtrada():
+    """Listagem com filtros/ordenação/paginação resolvidos em SQL; só a página é montada em pandas.
+
+    O corpo continua sendo a lista de produtos; o cursor da próxima página vai no header X-Next-Cursor.
+    """
+    try:
+        filtros = ler_filtros(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    engine = get_db_engine()
+    if not engine: return jsonify({"error": "Sem dados"}), 500
+    try:
+        with etapa('db_listagem'):
+            ids, proximo = listar_ids(engine, filtros)
+        df_pagina = get_dados_atuais(ids)
+        if df_pagina is None: return jsonify({"error": "Erro DB"}), 500
+        ofertas = get_ofertas_produtos(ids)
+        with etapa('agregacao'):
+            por_id = {p['id']: p for p in montar_listagem(df_pagina, ofertas)}
+        produtos_formatados = list(_referenciar_imagens(por_id[i] for i in ids if i in por_id))
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+    resp = _json(produtos_formatados)
+    if proximo: resp.headers['X-Next-Cursor'] = proximo
+    return resp
+
+# --- ROTA DE BUSCA ---
+# O índice é montado uma vez por versão dos dados (nova rodada do scraper) e compartilhado
+# pelas requisições do worker; a consulta em si não toca no banco.
+LIMITE_BUSCA_PADRAO, LIMITE_BUSCA_MAXIMO = 20, 100
+_indice_busca = {'versao': None, 'indice': None}
+_indice_busca_lock = threading.Lock()
+
+def get_indice_busca():
+    versao = versoes_dados['produtos'].get()
+    indice = _indice_busca['indice']
+    # Banco fora do ar (versão None): continua servindo o último índice montado
+    if indice is not None and (versao is None or versao == _indice_busca['versao']): return indice
+    # Enquanto uma requisição remonta o índice, as outras seguem com o anterior
+    if not _indice_busca_lock.acquire(blocking=indice is None): return indice
+    try:
+        if _indice_busca['indice'] is not None and _indice_busca['versao'] == versao: return _indice_busca['indice']
+        df_atual = get_dados_atuais()
+        if df_atual is None or df_atual.empty: return _indice_busca['indice']
+        # Mesmo formato de item de /api/products, com "oferta" (precos_ofertas muda junto com precos)
+        ofertas = get_ofertas_produtos()
+        with etapa('indice_busca'):
+            indice = IndiceBusca(documentos_de_atuais(df_atual, montar_listagem(df_atual, ofertas)))
+        _indice_busca.update(versao=versao, indice=indice)
+        return indice
+    finally:
+        _indice_busca_lock.release()
+
+@app.route('/api/search', methods=['GET'])
+@com_cache('produtos')
+def search_products():
+    """Busca sem acento e tolerante a erro de digitação: ?q=placa mae b650&limit=20"""
+    consulta = (request.args.get('q') or '').strip()
+    if not consulta: return jsonify({"error": "Parâmetro q é obrigatório"}), 400
+    try:
+        limite = min(max(1, int(request.args.get('limit', LIMITE_BUSCA_PADRAO))), LIMITE_BUSCA_MAXIMO)
+    except ValueError:
+        return jsonify({"error": "limit inválido"}), 400
+
+    indice = get_indice_busca()
+    if indice is None: return jsonify({"error": "Sem dados"}), 500
+    with etapa('busca'):
+        resultados = list(_referenciar_imagens(dict(doc['item'], score=pontos) for doc, pontos in indice.buscar(consulta, limite)))
+    return _json(resultados)
+
+# --- ALERTAS DE PREÇO (avaliados pelo scraper a cada gravação, ver alertas.py) ---
+TIPOS_ALERTA = {"below": "abaixo_de", "historical_min": "minimo_historico"}
+
+@app.route('/api/alerts', methods=['POST'])
+def create_alert():
+    """{"product": "RTX 4070", "contact": "...", "type": "below"|"historical_min", "target_price": 3500}"""
+    dados = request.get_json(silent=True) or {}
+    produto = str(dados.get('product') or '').strip()
+    contato = str(dados.get('contact') or '').strip()
+    tipo = TIPOS_ALERTA.get(dados.get('type'))
+    if not produto or not contato or len(contato) > 255:
+        return jsonify({"error": "product e contact são obrigatórios"}), 400
+    if tipo is None:
+        return jsonify({"error": f"type deve ser um de {sorted(TIPOS_ALERTA)}"}), 400
+    preco_alvo = None
+    if tipo == "abaixo_de":
+        try: preco_alvo = float(dados.get('target_price'))
+        except (TypeError, ValueError): preco_alvo = None
+        if not preco_alvo or preco_alvo <= 0:
+            return jsonify({"error": "target_price > 0 é obrigatório para type=below"}), 400
+
+    engine = get_db_engine()
+    if not engine: return jsonify({"error": "DB Error"}), 500
+    try:
+        with engine.begin() as conn:
+            existe = conn.execute(text("SELECT 1 FROM precos_atual WHERE produto_base = :p LIMIT 1"), {"p": produto}).first()
+            if existe is None: return jsonify({"error": "Produto não encontrado"}), 404
+            id_alerta = inscrever(conn, produto, contato, tipo, preco_alvo)
+    except Exception as e:
+        print(f"Erro ao criar alerta: {e}")
+        ERROS_DB.inc(origem='alertas')
+        return jsonify({"error": "DB Error"}), 500
+    return jsonify({"id": id_alerta, "product": produto, "type": dados.get('type'), "target_price": preco_alvo}), 201
 
 # --- ROTA DE PRODUTO ÚNICO (DETALHES) ---
 @app.route('/api/product/<path:product_base_name>', methods=['GET'])
+@com_snapshot(lambda product_base_name: snapshot.arquivo_produto(product_base_name.strip()))
+@com_cache('produtos')
 def get_single_product(product_base_name):
     product_name_limpo = product_base_name.strip()
     
-    df_dados = get_dados_do_db()
-    if df_dados is None: return jsonify({"error": "Erro DB"}), 500
+    df_recentes = get_dados_atuais(product_name_limpo)
+    if df_recentes is None: return jsonify({"error": "Erro DB"}), 500
+    if df_recentes.empty: return jsonify({"error": "Não encontrado"}), 404
+
+    try:
+        # Histórico embutido: um ponto por dia e loja (?history=hour|week|raw|none para mudar)
+        modo_hist = (request.args.get('history') or 'day').strip().lower()
+        detalhe = montar_detalhes_produtos(df_recentes, modo_hist)[product_name_limpo]
+        return _json(next(_referenciar_imagens([detalhe], 'detail')))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# --- ROTA DE DETALHES EM LOTE (COMPARAÇÃO / CARRINHO) ---
+LIMITE_LOTE = env_int("API_LOTE_MAX", 100)
+CAMPOS_DETALHE = ('name', 'image', 'category', 'stores', 'priceHistory', 'precoMinimoHistorico',
+                  'precoMedioHistorico', 'descricao', 'oferta')
 
-    group = df_dados[df_dados['produto_base'] == product_name_limpo].copy()
-    if group.empty: return jsonify({"error": "Não encontrado"}), 404
+def _ler_campos(valor):
+    """Lista de campos de `fields` (lista JSON ou "a,b,c"); None = todos. Levanta ValueError."""
+    if valor is None or valor == '': return None
+    campos = [c.strip() for c in valor.split(',')] if isinstance(valor, str) else valor
+    if not isinstance(campos, list) or not all(isinstance(c, str) for c in campos):
+        raise ValueError("fields deve ser uma lista de campos")
+    invalidos = [c for c in campos if c and c not in CAMPOS_DETALHE and c != 'id']
+    if invalidos: raise ValueError(f"campos desconhecidos: {', '.join(invalidos)} (use {', '.join(CAMPOS_DETALHE)})")
+    return {c for c in campos if c}
 
+@app.route('/api/products/batch', methods=['POST'])
+def get_products_batch():
+    """Detalhes de vários produtos numa ida: {"ids": [...], "fields": [...], "history": "day"}.
+
+    `fields` (também ?fields=name,stores) limita os campos devolvidos; sem "descricao" e
+    "priceHistory" eles nem são lidos do banco. A resposta traz os produtos na ordem pedida
+    e em "notFound" os ids que não existem.
+    """
+    dados = request.get_json(silent=True) or {}
+    ids = dados.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, str) for i in ids):
+        return jsonify({"error": "ids deve ser uma lista não vazia de produtos"}), 400
+    ids = list(dict.fromkeys(i.strip() for i in ids if i.strip()))
+    if len(ids) > LIMITE_LOTE: return jsonify({"error": f"no máximo {LIMITE_LOTE} ids por chamada"}), 400
     try:
-        df_recentes = group.loc[group.groupby('loja')['timestamp'].idxmax()]
-        
-        group_valido = df_recentes[df_recentes['preco'] > 0]
-        if not group_valido.empty:
-            principal = group_valido.loc[group_valido['preco'].idxmin()]
-        else:
-            principal = df_recentes.sort_values(by='timestamp', ascending=False).iloc[0]
+        campos = _ler_campos(dados.get('fields', request.args.get('fields')))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    modo_hist = str(dados.get('history') or request.args.get('history') or 'day').strip().lower()
 
-        # Lógica de Descrição (Pichau > Terabyte > Vencedor)
-        descricao_final = ""
-        try:
-            pichau_row = df_recentes[df_recentes['loja'] == 'Pichau']
-            if not pichau_row.empty:
-                desc = pichau_row.iloc[0]['descricao']
-                if desc and len(str(desc).strip()) > 10:
-                    descricao_final = desc
-        except: pass
-
-        if not descricao_final:
-            try:
-                tera_row = df_recentes[df_recentes['loja'] == 'Terabyte']
-                if not tera_row.empty:
-                    desc = tera_row.iloc[0]['descricao']
-                    if desc and len(str(desc).strip()) > 10:
-                        descricao_final = desc
-            except: pass
-
-        if not descricao_final:
-            desc_vencedor = principal.get('descricao', '')
-            if desc_vencedor and len(str(desc_vencedor).strip()) > 10:
-                 descricao_final = desc_vencedor
-
-        lojas = []
-        for _, row in df_recentes.iterrows():
-            lojas.append({
-                "name": row['loja'],
-                "price": float(row['preco']),
-                "originalPrice": None,
-                "shipping": "Consultar",
-                "rating": 0, "reviews": 0,
-                "affiliateLink": row['url'],
-                "inStock": row['preco'] > 0
-            })
-            
-        historico_df = group.sort_values('timestamp')[['timestamp', 'preco', 'loja']].drop_duplicates()
-        historico_formatado = [{"date": r['timestamp'].strftime('%Y-%m-%d'), "price": float(r['preco']), "loja": r['loja']} for _, r in historico_df.iterrows()]
-
-        validos_hist = group[group['preco'] > 0]['preco']
-        
-        return jsonify({
-            "id": str(product_name_limpo), 
-            "name": principal['nome_completo_raspado'],
-            "image": principal['imagem_url'],
-            "category": principal['categoria'],
-            "stores": lojas,
-            "priceHistory": historico_formatado,
-            "precoMinimoHistorico": float(validos_hist.min()) if not validos_hist.empty else 0.0,
-            "precoMedioHistorico": float(validos_hist.mean()) if not validos_hist.empty else 0.0,
-            "descricao": descricao_final
-        })
+    df_recentes = get_dados_atuais(ids)
+    if df_recentes is None: return jsonify({"error": "Erro DB"}), 500
+    try:
+        detalhes = montar_detalhes_produtos(df_recentes, modo_hist, campos) if not df_recentes.empty else {}
+        produtos = list(_referenciar_imagens((detalhes[i] for i in ids if i in detalhes), 'detail'))
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    if campos is not None:
+        # imageOriginal acompanha image quando a imagem vem do cache local
+        manter = campos | {'id'} | ({'imageOriginal'} if 'image' in campos else set())
+        produtos = [{k: v for k, v in p.items() if k in manter} for p in produtos]
+    return _json({"products": produtos, "notFound": [i for i in ids if i not in detalhes]})
+
+# --- ROTA DE IMAGEM ---
+@app.route('/api/image/<hash_imagem>', methods=['GET'])
+def get_image(hash_imagem):
+    """Variante WebP de uma imagem do cache local: ?size=list (padrão, 320px) ou detail (800px)."""
+    tamanho = (request.args.get('size') or 'list').strip().lower()
+    if tamanho not in TAMANHOS: return jsonify({"error": f"size deve ser um de: {', '.join(TAMANHOS)}"}), 400
+    conteudo = indice_imagens.atualizar().conteudo(hash_imagem)
+    caminho = caminho_variante(conteudo, tamanho) if conteudo else None
+    if caminho is None or not os.path.isfile(caminho): return jsonify({"error": "Não encontrada"}), 404
+    # O conteúdo de um hash nunca muda (a URL é baixada uma vez só): cache longo e imutável
+    resp = send_file(caminho, mimetype='image/webp', conditional=True, etag=f"{conteudo[:24]}-{tamanho}",
+                     max_age=IMAGENS_MAX_AGE)
+    resp.cache_control.immutable = True
+    return resp
 
+# --- ROTA DE HISTÓRICO (GRÁFICO) ---
+@app.route('/api/product/<path:product_base_name>/history', methods=['GET'])
+@com_cache('produtos')
+def get_product_history(product_base_name):
+    """Histórico agregado por período: ?from=&to=&bucket=hour|day|week&store="""
+    product_name_limpo = product_base_name.strip()
+    try:
+        intervalo = ler_intervalo(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    engine = get_db_engine()
+    if not engine: return jsonify({"error": "Erro DB"}), 500
+    try:
+        with etapa('db_historico'):
+            df_hist = carregar_historico(engine, product_name_limpo, intervalo['inicio'], intervalo['fim'], intervalo['loja'])
+        if df_hist.empty:
+            # Sem pontos no intervalo não é 404; só se o produto não existir
+            df_atual = get_dados_atuais(product_name_limpo)
+            if df_atual is not None and df_atual.empty: return jsonify({"error": "Não encontrado"}), 404
+        with etapa('agregacao'):
+            pontos = agregar_historico(df_hist, intervalo['bucket'])
+        return _json({
+            "id": product_name_limpo,
+            "bucket": intervalo['bucket'],
+            "from": intervalo['inicio'].isoformat() if intervalo['inicio'] else None,
+            "to": intervalo['fim'].isoformat() if intervalo['fim'] else None,
+            "store": intervalo['loja'],
+            "priceHistory": pontos
+        })
     except Exception as e:
+        traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
@@ -0,0 +1,132 @@
+# meu_comparador_backend/benchmarks/bench_agregacao.py
+#
+# Compara o loop antigo de /api/products (groupby por produto + idxmin + iterrows)
+# com a agregação vetorizada de agregacao.py sobre tabelas `precos` sintéticas.
+#
+# Uso:
+#   python benchmarks/bench_agregacao.py                      # 100k, 1M e 10M linhas
+#   python benchmarks/bench_agregacao.py --linhas 100000 --produtos 5000
+#   python benchmarks/bench_agregacao.py --max-legado 1000000 # pula o loop antigo acima disso
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agregacao import estado_atual_de_historico, montar_listagem
+
+LOJAS = ["Kabum", "Pichau", "Terabyte"]
+CATEGORIAS = ["Placa de Vídeo", "Processador", "Placa-Mãe", "Monitor", "Fonte de Alimentação"]
+
+def gerar_precos(linhas, produtos, seed=42):
+    """Tabela `precos` sintética: cada rodada do scraper grava produtos x lojas linhas."""
+    rng = np.random.default_rng(seed)
+    por_rodada = produtos * len(LOJAS)
+    rodadas = max(1, math.ceil(linhas / por_rodada))
+
+    nomes = np.array([f"Produto {i:06d}" for i in range(produtos)], dtype=object)
+    idx_produto = np.tile(np.repeat(np.arange(produtos), len(LOJAS)), rodadas)[:linhas]
+    idx_loja = np.tile(np.arange(len(LOJAS)), produtos * rodadas)[:linhas]
+    rodada = np.repeat(np.arange(rodadas), por_rodada)[:linhas]
+
+    base = rng.uniform(300, 8000, size=produtos)
+    preco = np.round(base[idx_produto] * rng.uniform(0.85, 1.15, size=linhas), 2)
+    preco[rng.random(linhas) < 0.08] = 0.0  # ~8% sem estoque
+
+    lojas = np.array(LOJAS, dtype=object)
+    return pd.DataFrame({
+        "timestamp": pd.Timestamp("2024-01-01") + pd.to_timedelta(rodada * 6, unit="h"),
+        "produto_base": nomes[idx_produto],
+        "categoria": np.array(CATEGORIAS, dtype=object)[idx_produto % len(CATEGORIAS)],
+        "nome_completo_raspado": nomes[idx_produto] + " " + lojas[idx_loja],
+        "preco": preco,
+        "imagem_url": "https://img.exemplo/" + nomes[idx_produto],
+        "loja": lojas[idx_loja],
+        "url": "https://loja.exemplo/" + lojas[idx_loja],
+        "descricao": "",
+    })
+
+def listagem_legada(df_dados):
+    """Cópia do loop original de get_products (referência para tempo e saída)."""
+    produtos_formatados = []
+    for nome_base, group in df_dados.groupby('produto_base'):
+        try:
+            df_recentes = group.loc[group.groupby('loja')['timestamp'].idxmax()]
+            group_valido = df_recentes[df_recentes['preco'] > 0]
+
+            if not group_valido.empty:
+                principal = group_valido.loc[group_valido['preco'].idxmin()]
+            else:
+                principal = df_recentes.sort_values(by='timestamp', ascending=False).iloc[0]
+
+            precos_hist = group[group['preco'] > 0]['preco']
+            p_min = float(precos_hist.min()) if not precos_hist.empty else 0.0
+            p_med = float(precos_hist.mean()) if not precos_hist.empty else 0.0
+
+            lojas = []
+            for _, row in df_recentes.iterrows():
+                lojas.append({
+                    "name": row['loja'],
+                    "price": float(row['preco']),
+                    "affiliateLink": row['url'],
+                    "inStock": row['preco'] > 0
+                })
+
+            produtos_formatados.append({
+                "id": str(nome_base),
+                "name": principal['nome_completo_raspado'],
+                "image": principal['imagem_url'],
+                "category": principal['categoria'],
+                "stores": lojas,
+                "priceHistory": [],
+                "precoMinimoHistorico": p_min,
+                "precoMedioHistorico": p_med
+            })
+        except: continue
+    return produtos_formatados
+
+def listagem_vetorizada(df_dados):
+    return montar_listagem(estado_atual_de_historico(df_dados))
+
+def comparar(a, b):
+    """Mesma saída, tolerando diferença de arredondamento na média (soma/qtd vs mean)."""
+    if len(a) != len(b): return False
+    for x, y in zip(a, b):
+        x, y = dict(x), dict(y)
+        mx, my = x.pop("precoMedioHistorico"), y.pop("precoMedioHistorico")
+        if x != y or not math.isclose(mx, my, rel_tol=1e-9): return False
+    return True
+
+def medir(func, *args):
+    inicio = time.perf_counter()
+    resultado = func(*args)
+    return resultado, time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da agregação de /api/products")
+    parser.add_argument("--linhas", default="100000,1000000,10000000", help="tamanhos separados por vírgula")
+    parser.add_argument("--produtos", type=int, default=2000, help="produtos distintos no catálogo")
+    parser.add_argument("--max-legado", type=int, default=10_000_000, help="não roda o loop antigo acima disso")
+    args = parser.parse_args()
+
+    print(f"{'linhas':>10} {'produtos':>8} {'legado (s)':>11} {'vetorizado (s)':>15} {'speedup':>8}  saída")
+    for linhas in [int(x) for x in args.linhas.split(",") if x]:
+        df = gerar_precos(linhas, args.produtos)
+        novo, t_novo = medir(listagem_vetorizada, df)
+
+        if linhas <= args.max_legado:
+            antigo, t_antigo = medir(listagem_legada, df)
+            igual = "igual" if comparar(antigo, novo) else "DIFERENTE"
+            print(f"{linhas:>10} {len(novo):>8} {t_antigo:>11.3f} {t_novo:>15.3f} {t_antigo / t_novo:>7.1f}x  {igual}")
+        else:
+            print(f"{linhas:>10} {len(novo):>8} {'-':>11} {t_novo:>15.3f} {'-':>8}  (legado pulado)")
+        del df
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# meu_comparador_backend/benchmarks/bench_alertas.py
+#
+# Mede a avaliação dos alertas de preço (alertas.avaliar_alertas) que roda em cada gravação
+# do scraper: um lote novo (produtos x lojas linhas) contra 100k+ inscrições, com históricos
+# de tamanhos diferentes em `precos` para mostrar que o custo acompanha o lote e as
+# inscrições dos produtos do lote, não o histórico. Cada avaliação roda numa transação
+# desfeita no fim, para todas verem o mesmo estado.
+#
+# Uso:
+#   python benchmarks/bench_alertas.py                          # 100k e 250k inscrições, 5 e 40 rodadas
+#   python benchmarks/bench_alertas.py --inscricoes 500000 --produtos 5000 --rodadas 10
+#   python benchmarks/bench_alertas.py --database-url postgresql+psycopg2://localhost/bench   # banco descartável!
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from bench_agregacao import LOJAS, gerar_precos
+from bench_replay import criar_tabelas
+
+def gravar_historico(engine, produtos, rodadas):
+    """Grava `rodadas` rodadas pelo caminho do scraper e devolve a rodada seguinte (o lote medido)."""
+    from estado_atual import preparar_lote, salvar_precos
+
+    df = gerar_precos(produtos * len(LOJAS) * (rodadas + 1), produtos)
+    rodadas_df = [lote for _, lote in df.groupby("timestamp", sort=True)]
+    for lote in rodadas_df[:-1]:
+        salvar_precos(engine, preparar_lote(lote.to_dict("records")))
+    return preparar_lote(rodadas_df[-1].to_dict("records"))
+
+def gravar_inscricoes(engine, quantidade, produtos, seed=7):
+    """Metade "abaixo de R$ X" (alvo 5-30% abaixo do preço base), metade "menor preço histórico"."""
+    from carga import executar_em_lote
+
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(produtos, size=quantidade)
+    base = np.random.default_rng(42).uniform(300, 8000, size=produtos)  # mesma semente de gerar_precos
+    alvo = np.round(base[idx] * rng.uniform(0.70, 0.95, size=quantidade), 2)
+    abaixo = rng.random(quantidade) < 0.5
+    registros = [{"produto_base": f"Produto {p:06d}", "contato": f"usuario{i}@exemplo.com",
+                  "tipo": "abaixo_de" if a else "minimo_historico", "preco_alvo": float(v) if a else None}
+                 for i, (p, a, v) in enumerate(zip(idx, abaixo, alvo))]
+    sql = "INSERT INTO alertas_inscricoes (produto_base, contato, tipo, preco_alvo) VALUES %s"
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM alertas_inscricoes"))
+        executar_em_lote(conn, sql, ["produto_base", "contato", "tipo", "preco_alvo"], registros)
+
+def medir_avaliacao(engine, lote, repeticoes):
+    from alertas import avaliar_alertas
+
+    tempos, disparados = [], 0
+    for _ in range(repeticoes):
+        with engine.connect() as conn:
+            transacao = conn.begin()
+            inicio = time.perf_counter()
+            disparados = avaliar_alertas(conn, lote)
+            tempos.append(time.perf_counter() - inicio)
+            transacao.rollback()
+    return float(np.median(tempos)), disparados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da avaliação de alertas na gravação")
+    parser.add_argument("--inscricoes", type=int, nargs="+", default=[100_000, 250_000])
+    parser.add_argument("--produtos", type=int, default=2000)
+    parser.add_argument("--rodadas", type=int, nargs="+", default=[5, 40], help="rodadas de histórico já gravadas")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    temporario = None
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        temporario = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        temporario.close()
+        engine = create_engine(f"sqlite:///{temporario.name}")
+
+    print(f"{args.produtos} produtos x {len(LOJAS)} lojas por rodada ({engine.dialect.name})")
+    print(f"{'histórico':>12} {'inscrições':>11} {'lote':>6} {'avaliação ms':>13} {'ms/linha':>9} {'alertas':>8}")
+    try:
+        for rodadas in args.rodadas:
+            criar_tabelas(engine)  # inclui alertas_inscricoes / alertas_saida
+            lote = gravar_historico(engine, args.produtos, rodadas)
+            historico = rodadas * args.produtos * len(LOJAS)
+            for quantidade in args.inscricoes:
+                gravar_inscricoes(engine, quantidade, args.produtos)
+                mediana, disparados = medir_avaliacao(engine, lote, args.repeticoes)
+                print(f"{historico:>12,} {quantidade:>11,} {len(lote):>6} {mediana * 1000:>13.1f} "
+                      f"{mediana * 1000 / len(lote):>9.3f} {disparados:>8,}")
+    finally:
+        engine.dispose()
+        if temporario: os.unlink(temporario.name)
+
+if __name__ == "__main__":
+    main()
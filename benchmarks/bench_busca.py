@@ -0,0 +1,80 @@
+# meu_comparador_backend/benchmarks/bench_busca.py
+#
+# Mede a montagem do índice de busca (busca.py) e a latência das consultas de /api/search
+# sobre um catálogo sintético, com consultas exatas, sem acento, incompletas e com erro
+# de digitação.
+#
+# Uso:
+#   python benchmarks/bench_busca.py                  # 10k, 50k produtos
+#   python benchmarks/bench_busca.py --produtos 20000 --consultas 5000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from busca import IndiceBusca
+
+LOJAS = ["Kabum", "Pichau", "Terabyte"]
+FAMILIAS = [
+    ("Placa de Vídeo", ["RTX {n}", "RTX {n} Ti", "RX {n} XT"], [3050, 3060, 4060, 4070, 4080, 5060, 5070, 6600, 7600, 7900]),
+    ("Processador", ["Ryzen {m} {n}X3D", "Ryzen {m} {n}X", "Core i{m} {n}K"], [5600, 5800, 7600, 7800, 9800, 12400, 13600, 14700]),
+    ("Placa-Mãe", ["Placa-Mãe B{n}M", "Placa-Mãe X{n}", "Placa-Mãe Z{n}"], [450, 550, 650, 670, 690, 790]),
+    ("Fonte de Alimentação", ["Fonte {n}W 80 Plus Gold"], [550, 650, 750, 850, 1000]),
+]
+MARCAS = ["Gigabyte", "ASUS", "MSI", "Galax", "Palit", "ASRock", "Corsair", "XPG", "Sapphire", "PowerColor"]
+
+CONSULTAS = ["rtx 4070", "placa mae b650m", "Placa-Mãe", "7800x3d", "7800x3b", "ryzen 7 780", "rtx4060ti",
+             "fonte 850w gold", "asus", "corsiar 750", "radeon", "i7 14700k"]
+
+def gerar_documentos(produtos, seed=42):
+    rng = np.random.default_rng(seed)
+    documentos = []
+    for i in range(produtos):
+        categoria, modelos, numeros = FAMILIAS[i % len(FAMILIAS)]
+        nome = rng.choice(modelos).format(n=rng.choice(numeros), m=rng.choice([3, 5, 7, 9]))
+        marca = MARCAS[rng.integers(len(MARCAS))]
+        base = f"{nome} {marca} {i:05d}"
+        documentos.append({"produto_base": base, "categoria": categoria,
+                           "nomes": [f"{categoria} {base} {loja} OC {rng.integers(4, 24)}GB" for loja in LOJAS],
+                           "item": {"id": base}})
+    return documentos
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do índice de busca")
+    parser.add_argument("--produtos", default="10000,50000", help="tamanhos separados por vírgula")
+    parser.add_argument("--consultas", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'produtos':>9} {'montagem (s)':>13} {'vocabulário':>12} {'p50 (ms)':>9} {'p99 (ms)':>9} {'frio p50 (ms)':>14}")
+    for produtos in [int(x) for x in args.produtos.split(",") if x]:
+        documentos = gerar_documentos(produtos)
+        inicio = time.perf_counter()
+        indice = IndiceBusca(documentos)
+        montagem = time.perf_counter() - inicio
+
+        # Primeira vez de cada termo (sem o cache de expansões) e depois em regime
+        frios = []
+        for consulta in CONSULTAS:
+            inicio = time.perf_counter()
+            indice.buscar(consulta)
+            frios.append(time.perf_counter() - inicio)
+        tempos = []
+        for i in range(args.consultas):
+            inicio = time.perf_counter()
+            indice.buscar(CONSULTAS[i % len(CONSULTAS)])
+            tempos.append(time.perf_counter() - inicio)
+        tempos = np.array(tempos) * 1000
+        print(f"{produtos:>9} {montagem:>13.2f} {len(indice.vocabulario):>12} {np.percentile(tempos, 50):>9.3f} "
+              f"{np.percentile(tempos, 99):>9.3f} {np.percentile(np.array(frios) * 1000, 50):>14.3f}")
+
+    print("\nExemplos:")
+    for consulta in CONSULTAS[:6]:
+        print(f"  {consulta!r:<20} -> {[d['produto_base'] for d, _ in indice.buscar(consulta, 3)]}")
+
+if __name__ == "__main__":
+    main()
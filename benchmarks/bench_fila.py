@@ -0,0 +1,167 @@
+# meu_comparador_backend/benchmarks/bench_fila.py
+#
+# Teste de carga da fila distribuída (fila.py + worker.py) com vários processos worker contra
+# um Postgres local descartável, sem acessar as lojas: a coleta é trocada por uma falsa
+# (espera --atraso segundos e devolve um preço sintético; --falhas da fração das páginas
+# vem sem preço; --quebradas vem com um preço que a tabela `precos` recusa, via CHECK, para
+# a gravação falhar sempre). Um dos workers (--matar) é morto com SIGKILL no meio da rodada,
+# para os jobs dele voltarem à fila pelo lease vencido (--lease curto).
+#
+# No fim confere, e termina com código 1 se algo estiver errado:
+#   - nenhum job aberto e a rodada fechada por exatamente um worker;
+#   - cada job concluído gerou exatamente uma linha em `precos` (nenhum perdido ou gravado
+#     em dobro, mesmo com o worker morto) e nenhum job com falha gerou linha;
+#   - cada job terminou no estado esperado: as páginas sem preço e as que não gravam como
+#     "falhou" só depois de FILA_MAX_TENTATIVAS tentativas (voltam à fila com a espera de
+#     FILA_ESPERA_DEVOLVIDO, curta aqui), sem levar junto os outros jobs dos lotes delas;
+#   - quando um worker foi morto, algum job foi retomado por outro.
+#
+# Uso (SKIP LOCKED e os leases precisam de Postgres; as tabelas são recriadas!):
+#   python benchmarks/bench_fila.py --database-url postgresql+psycopg2://localhost/bench
+#   python benchmarks/bench_fila.py --database-url ... --jobs 3000 --workers 8 --lote 10 --atraso 0.05
+
+import argparse
+import multiprocessing
+import os
+import random
+import signal
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+
+LOJAS_FALSAS = ("LojaA", "LojaB", "LojaC")
+PRECO_MAXIMO = 1_000_000  # CHECK em `precos`: acima disso a gravação falha
+
+def resultado_falso(url):
+    """("sem_preco" | "quebrada" | "ok", preço): determinístico por URL (o mesmo em qualquer worker)."""
+    sorteio = random.Random(url)
+    sem_preco, quebrada = sorteio.random(), sorteio.random()
+    if sem_preco < float(os.environ["BENCH_FILA_FALHAS"]): return "sem_preco", None
+    if quebrada < float(os.environ["BENCH_FILA_QUEBRADAS"]): return "quebrada", PRECO_MAXIMO * 10.0
+    return "ok", round(sorteio.uniform(100, 5000), 2)
+
+def buscar_falso(driver, url, loja):
+    time.sleep(float(os.environ["BENCH_FILA_ATRASO"]))
+    tipo, preco = resultado_falso(url)
+    if tipo == "sem_preco": return None, None, None, None
+    return f"Produto {url.rsplit('/', 1)[-1]}", preco, "", ""
+
+def rodar_worker(database_url, lote):
+    os.environ["DATABASE_URL"] = database_url
+    import worker
+    # Sem navegador (criar_driver devolve None) e sem cupons/snapshot ao fechar a rodada
+    worker.trabalhar(lote=lote, buscar=buscar_falso, criar_driver=lambda: None, ao_fechar=None, espera=1)
+
+def preparar_banco(engine, jobs):
+    import fila
+    from bench_replay import criar_tabelas
+
+    criar_tabelas(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE precos ADD CONSTRAINT bench_preco_gravavel CHECK (preco < {PRECO_MAXIMO})"))
+        for tabela in ("fila_coleta", "fila_rodadas"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {tabela} CASCADE"))
+        for ddl in fila.DDL_FILA:
+            conn.execute(text(ddl))
+        tarefas = [{"produto_base": f"Produto {i // len(LOJAS_FALSAS):06d}", "categoria": "Bench",
+                    "loja": LOJAS_FALSAS[i % len(LOJAS_FALSAS)], "url": f"https://loja.invalid/{i}"}
+                   for i in range(jobs)]
+        return fila.criar_rodada(conn, tarefas, modo="bench")
+
+def conferir(engine, rodada, matou):
+    """Lista de problemas encontrados (vazia = tudo certo)."""
+    problemas = []
+    with engine.connect() as conn:
+        abertos = conn.execute(text("SELECT COUNT(*) FROM fila_coleta WHERE estado IN ('pendente', 'em_andamento')")).scalar_one()
+        fechada = conn.execute(text("SELECT fechada_por FROM fila_rodadas WHERE id = :r"), {"r": rodada}).scalar_one()
+        # Linhas de precos por job (produto_base + loja identificam o job nesta rodada)
+        divergentes = conn.execute(text("""
+            SELECT f.id, f.estado, COUNT(p.produto_base) AS linhas
+            FROM fila_coleta f
+            LEFT JOIN precos p ON p.produto_base = f.produto_base AND p.loja = f.loja
+            WHERE f.rodada_id = :r
+            GROUP BY f.id, f.estado
+            HAVING COUNT(p.produto_base) <> CASE WHEN f.estado = 'concluida' THEN 1 ELSE 0 END
+        """), {"r": rodada}).all()
+        retomadas = conn.execute(text("SELECT COUNT(*) FROM fila_coleta WHERE rodada_id = :r AND tentativas > 1"),
+                                 {"r": rodada}).scalar_one()
+        jobs = conn.execute(text("SELECT id, url, estado, tentativas, erro FROM fila_coleta WHERE rodada_id = :r"),
+                            {"r": rodada}).all()
+    esperado = {"ok": "concluida", "sem_preco": "falhou", "quebrada": "falhou"}
+    errados = [job for job in jobs if job.estado != esperado[resultado_falso(job.url)[0]]]
+    erro_esperado = {"sem_preco": "página sem nome ou preço", "quebrada": "bench_preco_gravavel"}
+    devolvidos = [(job, erro_esperado[resultado_falso(job.url)[0]]) for job in jobs
+                  if resultado_falso(job.url)[0] in erro_esperado]
+    sem_limite = [job for job, erro in devolvidos if job.tentativas < int(os.environ["FILA_MAX_TENTATIVAS"])
+                  or erro not in (job.erro or "")]
+    if abertos: problemas.append(f"{abertos} jobs ainda abertos")
+    if not fechada: problemas.append("rodada não foi fechada")
+    if divergentes: problemas.append(f"{len(divergentes)} jobs com linhas em precos erradas (ex.: {list(divergentes[0])})")
+    if errados: problemas.append(f"{len(errados)} jobs em estado inesperado (ex.: {list(errados[0])})")
+    if sem_limite: problemas.append(f"{len(sem_limite)} jobs sem preço ou que não gravam fecharam sem esgotar as tentativas "
+                                    f"ou sem o erro (ex.: {list(sem_limite[0])})")
+    if matou and not retomadas: problemas.append("worker morto, mas nenhum job foi retomado")
+    return problemas
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da fila distribuída com vários workers")
+    parser.add_argument("--database-url", required=True, help="Postgres descartável (as tabelas são recriadas)")
+    parser.add_argument("--jobs", type=int, default=600)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lote", type=int, default=5)
+    parser.add_argument("--atraso", type=float, default=0.2, help="segundos por página na coleta falsa")
+    parser.add_argument("--falhas", type=float, default=0.05, help="fração das páginas sem preço")
+    parser.add_argument("--quebradas", type=float, default=0.01, help="fração das páginas cuja linha não grava")
+    parser.add_argument("--lease", type=int, default=5, help="FILA_LEASE dos workers, em segundos")
+    parser.add_argument("--matar", type=int, default=1, help="workers mortos com SIGKILL no meio da rodada")
+    args = parser.parse_args()
+
+    # Herdado pelos processos (spawn): lease curto, lojas falsas sem intervalo entre acessos
+    os.environ.update(FILA_LEASE=str(args.lease), BENCH_FILA_ATRASO=str(args.atraso), BENCH_FILA_FALHAS=str(args.falhas),
+                      BENCH_FILA_QUEBRADAS=str(args.quebradas), FILA_MAX_TENTATIVAS=os.environ.get("FILA_MAX_TENTATIVAS", "3"),
+                      FILA_ESPERA_DEVOLVIDO=os.environ.get("FILA_ESPERA_DEVOLVIDO", "1"),
+                      SCRAPER_AGENDA="0", SCRAPER_IMAGENS="0", SCRAPER_TENTATIVAS="1",
+                      SCRAPER_METRICAS_DIR=tempfile.mkdtemp(prefix="bench_fila_metricas_"))
+    for loja in LOJAS_FALSAS:
+        os.environ[f"SCRAPER_{loja.upper()}_CONCORRENCIA"] = "4"
+        os.environ[f"SCRAPER_{loja.upper()}_INTERVALO"] = "0"
+
+    engine = create_engine(args.database_url)
+    rodada = preparar_banco(engine, args.jobs)
+    print(f">>> Rodada {rodada}: {args.jobs} jobs, {args.workers} workers, lote {args.lote}, lease {args.lease}s")
+
+    contexto = multiprocessing.get_context("spawn")
+    inicio = time.monotonic()
+    processos = [contexto.Process(target=rodar_worker, args=(args.database_url, args.lote)) for _ in range(args.workers)]
+    for processo in processos: processo.start()
+
+    mortos = 0
+    if args.matar:
+        # Espera a rodada andar um pouco para os mortos terem jobs em andamento
+        while mortos == 0 and time.monotonic() - inicio < 120:
+            time.sleep(0.2)
+            with engine.connect() as conn:
+                feitos = conn.execute(text("SELECT COUNT(*) FROM fila_coleta WHERE estado <> 'pendente'")).scalar_one()
+            if feitos >= args.jobs // 4:
+                for processo in processos[:args.matar]:
+                    os.kill(processo.pid, signal.SIGKILL)
+                    mortos += 1
+                print(f">>> {mortos} worker(s) mortos com SIGKILL depois de {feitos} jobs")
+    for processo in processos: processo.join()
+    segundos = time.monotonic() - inicio
+
+    # O resumo da rodada já foi impresso pelo worker que a fechou
+    print(f"\n>>> {args.jobs} jobs em {segundos:.1f}s com {args.workers} workers "
+          f"({args.jobs / segundos * 60:.0f} jobs/min; sequencial levaria ~{args.jobs * args.atraso:.0f}s só de coleta)")
+    problemas = conferir(engine, rodada, mortos > 0)
+    for problema in problemas: print(f"ERRO: {problema}")
+    if not problemas: print(">>> OK: todos os jobs fechados, uma linha em precos por job concluído")
+    sys.exit(1 if problemas else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# meu_comparador_backend/benchmarks/bench_parsing.py
+#
+# Compara os parsers BeautifulSoup de scraper.py (árvore completa) com os parsers
+# parciais de parsing.py sobre páginas salvas em benchmarks/fixtures/<loja>/*.html.
+# Para cada página mostra o tempo médio de cada um e se a tupla (nome, preco, img, desc)
+# saiu idêntica, byte a byte.
+#
+# ATENÇÃO: as páginas versionadas (sintetica_*.html) são SINTÉTICAS, montadas à mão: título,
+# algumas dezenas de scripts dataLayer de enchimento e a marcação que os parsers procuram. Elas
+# só mostram que os dois parsers concordam nesse HTML e dão uma ordem de grandeza do ganho; o
+# speedup e a igualdade byte a byte em páginas reais da Kabum/Pichau/Terabyte ainda não foram
+# medidos. Para medir: salve páginas reais (Ctrl+S ou driver.page_source) em
+# benchmarks/fixtures/kabum|pichau|terabyte/ e rode de novo; a saída marca o que é sintético.
+#
+# Uso:
+#   python benchmarks/bench_parsing.py                # 20 repetições por página
+#   python benchmarks/bench_parsing.py --repeticoes 50
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bs4 import BeautifulSoup
+
+import scraper
+from parsing import PARSERS_RAPIDOS
+
+FIXTURES = os.path.join(RAIZ, "benchmarks", "fixtures")
+LOJAS = {"kabum": "Kabum", "pichau": "Pichau", "terabyte": "Terabyte"}
+
+def parser_completo(loja, url, conteudo):
+    return scraper.PARSERS[loja](url, BeautifulSoup(conteudo, 'lxml'))
+
+def parser_parcial(loja, url, conteudo):
+    return PARSERS_RAPIDOS[loja](url, conteudo)
+
+def medir(func, repeticoes, *args):
+    resultado = func(*args)
+    inicio = time.perf_counter()
+    for _ in range(repeticoes): func(*args)
+    return resultado, (time.perf_counter() - inicio) / repeticoes
+
+def diferencas(a, b):
+    campos = ("nome", "preco", "img", "desc")
+    return [c for c, x, y in zip(campos, a, b) if x != y or type(x) is not type(y)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos parsers de página de produto")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    iguais = True
+    print(f"{'página':<52} {'KB':>6} {'bs4 (ms)':>9} {'lxml (ms)':>10} {'speedup':>8}  saída")
+    for pasta, loja in LOJAS.items():
+        for caminho in sorted(glob.glob(os.path.join(FIXTURES, pasta, "*.html"))):
+            with open(caminho, "rb") as f: conteudo = f.read()
+            url = "https://exemplo/" + os.path.basename(caminho)
+            antigo, t_antigo = medir(parser_completo, args.repeticoes, loja, url, conteudo)
+            novo, t_novo = medir(parser_parcial, args.repeticoes, loja, url, conteudo)
+            diff = diferencas(antigo, novo)
+            iguais = iguais and not diff
+            nome = f"{pasta}/{os.path.basename(caminho)}"
+            if os.path.basename(caminho).startswith("sintetica_"): nome += " (sintética)"
+            print(f"{nome:<52} {len(conteudo) / 1024:>6.0f} {t_antigo * 1000:>9.2f} {t_novo * 1000:>10.2f} "
+                  f"{t_antigo / t_novo:>7.1f}x  {'idêntica' if not diff else 'DIFERENTE: ' + ', '.join(diff)}")
+    sys.exit(0 if iguais else 1)
+
+if __name__ == "__main__":
+    main()
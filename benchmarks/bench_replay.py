@@ -0,0 +1,331 @@
+# meu_comparador_backend/benchmarks/bench_replay.py
+#
+# Benchmark offline das duas metades do sistema, sem acessar as lojas nem o Postgres de produção:
+#
+#   scraper  -> as páginas em benchmarks/fixtures/<loja>/*.html (as versionadas são sintéticas,
+#               ver bench_parsing.py) passam por
+#               scraper.buscar_dados_loja e scraper.buscar_dados_rapido, com o Selenium
+#               (driver falso) e o `requests` (sessão falsa) trocados por stubs que
+#               devolvem o HTML salvo.
+#   gravação -> tabelas `precos`/`cupons` sintéticas, em escala configurável, gravadas pelo
+#               mesmo caminho do scraper (estado_atual.salvar_precos, cupons.salvar_cupons)
+#               num SQLite temporário ou num Postgres descartável (--database-url).
+#   api      -> get_products, get_single_product e get_coupons pelo test client do Flask,
+#               com o cache de respostas limpo a cada chamada (e uma medição com cache quente).
+#
+# Cada etapa tem tempo (média, mínimo, p95) e pico de memória (tracemalloc, numa execução à
+# parte para não distorcer o tempo; nas etapas de gravação, num SQLite descartável).
+# O relatório sai em JSON (--saida) e, com --comparar, o script termina com código 1 se
+# alguma etapa ficar mais lenta que a base além da tolerância (ou se a API não responder 200).
+#
+# Uso:
+#   python benchmarks/bench_replay.py --saida relatorio.json
+#   python benchmarks/bench_replay.py --produtos 5000 --rodadas 40 --cupons 200
+#   python benchmarks/bench_replay.py --comparar base.json --tolerancia 0.25
+#   python benchmarks/bench_replay.py --accept-encoding gzip                 # API com resposta comprimida
+#   python benchmarks/bench_replay.py --database-url postgresql+psycopg2://localhost/bench   # banco descartável: tabelas são recriadas!
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from bench_agregacao import gerar_precos
+
+FIXTURES = os.path.join(RAIZ, "benchmarks", "fixtures")
+LOJAS = {"kabum": "Kabum", "pichau": "Pichau", "terabyte": "Terabyte"}
+
+# --- STUBS DO SCRAPER ---
+class RespostaFalsa:
+    def __init__(self, conteudo):
+        self.status_code = 200 if conteudo is not None else 404
+        self.content = conteudo or b""
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+class SessaoFalsa:
+    """Substitui scraper.s: devolve o HTML salvo para a URL pedida."""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+
+    def get(self, url, timeout=None):
+        return RespostaFalsa(self.paginas.get(url))
+
+class ElementoFalso:
+    def is_displayed(self): return True
+    def is_enabled(self): return True
+
+class DriverFalso:
+    """Substitui o Chrome: `get` carrega a página salva, os waits encontram qualquer seletor."""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.page_source = ""
+
+    def get(self, url):
+        self.page_source = self.paginas.get(url, b"").decode("utf-8", errors="replace")
+
+    def find_element(self, *args):
+        return ElementoFalso()
+
+    def execute_script(self, *args):
+        return None
+
+def carregar_fixtures():
+    """{loja: [(url, bytes)]} a partir de benchmarks/fixtures/<loja>/*.html."""
+    paginas = {}
+    for pasta, loja in LOJAS.items():
+        for caminho in sorted(glob.glob(os.path.join(FIXTURES, pasta, "*.html"))):
+            with open(caminho, "rb") as f:
+                paginas.setdefault(loja, []).append((f"https://{pasta}.exemplo/{os.path.basename(caminho)}", f.read()))
+    return paginas
+
+# --- MEDIÇÃO ---
+def medir(nome, func, repeticoes, relatorio):
+    """Tempo de `repeticoes` execuções + pico de memória de uma execução com tracemalloc."""
+    tempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()  # aquecimento
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            func()
+            tempos.append(time.perf_counter() - inicio)
+        tracemalloc.start()
+        func()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    tempos_ms = np.array(tempos) * 1000
+    relatorio["etapas"][nome] = {
+        "repeticoes": repeticoes,
+        "media_ms": round(float(tempos_ms.mean()), 3),
+        "min_ms": round(float(tempos_ms.min()), 3),
+        "p95_ms": round(float(np.percentile(tempos_ms, 95)), 3),
+        "pico_memoria_kb": round(pico / 1024, 1),
+    }
+    st = relatorio["etapas"][nome]
+    print(f"  {nome:<32} {st['media_ms']:>10.2f} ms  (min {st['min_ms']:.2f}, p95 {st['p95_ms']:.2f})  pico {st['pico_memoria_kb']:>10.1f} KB")
+
+def medir_uma_vez(nome, func, engine, relatorio):
+    """Etapas que alteram o banco (gravação) rodam uma vez para o tempo e outra, num SQLite
+    descartável, com tracemalloc para o pico de memória. `func` recebe o engine."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        resultado = func(engine)
+        duracao = time.perf_counter() - inicio
+
+        with tempfile.TemporaryDirectory(prefix="bench_replay_mem_") as pasta:
+            rascunho = create_engine(f"sqlite:///{os.path.join(pasta, 'mem.db')}")
+            criar_tabelas(rascunho)
+            tracemalloc.start()
+            func(rascunho)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            rascunho.dispose()
+    ms = round(duracao * 1000, 3)
+    relatorio["etapas"][nome] = {"repeticoes": 1, "media_ms": ms, "min_ms": ms, "p95_ms": ms,
+                                 "pico_memoria_kb": round(pico / 1024, 1)}
+    print(f"  {nome:<32} {ms:>10.2f} ms  pico {pico / 1024:>10.1f} KB")
+    return resultado
+
+# --- BANCO SINTÉTICO ---
+def criar_tabelas(engine):
+    import descricoes
+    import estado_atual
+    import ofertas
+    from alertas import DDL_ALERTAS
+    from cupons import DDL_CUPONS_UPSERT, DDL_CUPONS_VALIDADE
+
+    serial = "SERIAL PRIMARY KEY" if engine.dialect.name == "postgresql" else "INTEGER PRIMARY KEY"
+    with engine.begin() as conn:
+        for tabela in ("precos", "precos_atual", "precos_stats", "descricoes", "produtos_descricao", "cupons",
+                       "alertas_inscricoes", "alertas_saida", "precos_ofertas"):
+            conn.execute(text(f"DROP TABLE IF EXISTS {tabela}"))
+        conn.execute(text("""
+            CREATE TABLE precos (
+                timestamp TIMESTAMP, produto_base VARCHAR(200), categoria VARCHAR(100),
+                nome_completo_raspado TEXT, preco FLOAT, imagem_url TEXT, loja VARCHAR(50),
+                url TEXT, descricao TEXT, descricao_hash CHAR(64)
+            )
+        """))
+        conn.execute(text("CREATE INDEX idx_precos_produto_loja_ts ON precos (produto_base, loja, timestamp DESC)"))
+        conn.execute(text(f"""
+            CREATE TABLE cupons (
+                id {serial}, codigo VARCHAR(100), descricao TEXT, validade VARCHAR(100),
+                loja VARCHAR(50), link TEXT, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        # SQLite não aceita ADD COLUMN IF NOT EXISTS; a tabela acabou de ser criada
+        for ddl in DDL_CUPONS_UPSERT + DDL_CUPONS_VALIDADE:
+            conn.execute(text(ddl.replace(" IF NOT EXISTS", "") if "ADD COLUMN" in ddl else ddl))
+        for ddl in estado_atual.DDL_ESTADO_ATUAL + descricoes.DDL_DESCRICOES + ofertas.DDL_OFERTAS:
+            conn.execute(text(ddl))
+        for ddl in DDL_ALERTAS:
+            conn.execute(text(ddl.replace("SERIAL PRIMARY KEY", serial)))
+
+def gravar_precos(engine, linhas, produtos):
+    """Grava o histórico sintético rodada a rodada, como o scraper faria."""
+    from estado_atual import preparar_lote, salvar_precos
+
+    df = gerar_precos(linhas, produtos)
+    # Descrições HTML na Pichau/Terabyte (uma por produto, repetida a cada rodada)
+    com_desc = df["loja"].isin(["Pichau", "Terabyte"])
+    df.loc[com_desc, "descricao"] = "<div><p>" + df.loc[com_desc, "produto_base"] + " - especificações " + "x" * 2000 + "</p></div>"
+    for _, lote in df.groupby("timestamp", sort=True):
+        salvar_precos(engine, preparar_lote(lote.to_dict("records")))
+    return df
+
+def gravar_cupons(engine, quantidade):
+    """Duas rodadas de cupons: na segunda, 10% somem (expiram) e 10% são novos.
+
+    Metade tem data de validade (1 em cada 10 já vencida), o resto "Verificar no site".
+    """
+    from cupons import salvar_cupons
+
+    def validade(i):
+        if i % 2: return "Verificar no site"
+        return "Válido até 01/01/2025" if i % 10 == 0 else f"Válido até {i % 28 + 1:02d}/12/2099"
+
+    def cupom(i):
+        return {"codigo": f"CUPOM{i:05d}", "descricao": f"{i % 20 + 5}% OFF", "validade": validade(i),
+                "loja": "Kabum", "link": "https://www.kabum.com.br/cupons"}
+    agora = datetime(2025, 1, 1)
+    salvar_cupons(engine, [cupom(i) for i in range(quantidade)], agora)
+    deslocamento = max(1, quantidade // 10)
+    return salvar_cupons(engine, [cupom(i) for i in range(deslocamento, quantidade + deslocamento)], agora + timedelta(hours=6))
+
+# --- COMPARAÇÃO COM A BASE (CI) ---
+def comparar(relatorio, base, tolerancia):
+    regressoes = []
+    for nome, st in relatorio["etapas"].items():
+        anterior = base.get("etapas", {}).get(nome)
+        if not anterior or not anterior.get("media_ms"): continue
+        razao = st["media_ms"] / anterior["media_ms"]
+        if razao > 1 + tolerancia:
+            regressoes.append({"etapa": nome, "base_ms": anterior["media_ms"], "atual_ms": st["media_ms"], "razao": round(razao, 2)})
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline (replay) do scraper e da API")
+    parser.add_argument("--produtos", type=int, default=1000, help="produtos distintos no catálogo sintético")
+    parser.add_argument("--rodadas", type=int, default=20, help="rodadas do scraper no histórico sintético")
+    parser.add_argument("--cupons", type=int, default=100)
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--database-url", default=None, help="Postgres descartável (as tabelas são recriadas); padrão SQLite temporário")
+    parser.add_argument("--saida", default=None, help="arquivo JSON do relatório (padrão: só imprime)")
+    parser.add_argument("--accept-encoding", default=None, help="Accept-Encoding das chamadas à API (ex.: gzip)")
+    parser.add_argument("--comparar", default=None, help="relatório JSON anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="aumento máximo aceito na média (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    pasta_tmp = None
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        pasta_tmp = tempfile.TemporaryDirectory(prefix="bench_replay_")
+        database_url = f"sqlite:///{os.path.join(pasta_tmp.name, 'bench.db')}"
+    # Antes de importar scraper/app: o load_dotenv deles não sobrescreve variáveis já definidas
+    os.environ["DATABASE_URL"] = database_url
+
+    import scraper
+    import app as api
+    from database import reset_engine
+
+    relatorio = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {"python": platform.python_version(), "pandas": pd.__version__, "plataforma": platform.platform(),
+                     "banco": create_engine(database_url).dialect.name},
+        "escala": {"produtos": args.produtos, "rodadas": args.rodadas, "linhas_precos": args.produtos * 3 * args.rodadas,
+                   "cupons": args.cupons, "repeticoes": args.repeticoes},
+        "etapas": {},
+    }
+
+    # 1. Scraper: replay das páginas salvas
+    print("\n>>> Scraper (páginas salvas, Selenium e requests simulados)")
+    fixtures = carregar_fixtures()
+    paginas = {url: conteudo for lista in fixtures.values() for url, conteudo in lista}
+    scraper.s = SessaoFalsa(paginas)
+    driver = DriverFalso(paginas)
+    for loja, lista in sorted(fixtures.items()):
+        medir(f"scraper.loja.{loja}", lambda lista=lista, loja=loja: [scraper.buscar_dados_loja(driver, url, loja) for url, _ in lista],
+              args.repeticoes, relatorio)
+        medir(f"scraper.rapido.{loja}", lambda lista=lista, loja=loja: [scraper.buscar_dados_rapido(url, loja) for url, _ in lista],
+              args.repeticoes, relatorio)
+
+    # 2. Gravação: histórico e cupons sintéticos pelo mesmo caminho do scraper
+    print(f"\n>>> Gravação ({relatorio['escala']['linhas_precos']} linhas de precos, {args.cupons} cupons, {relatorio['ambiente']['banco']})")
+    engine = create_engine(database_url)
+    criar_tabelas(engine)
+    medir_uma_vez("gravacao.precos", lambda e: gravar_precos(e, relatorio["escala"]["linhas_precos"], args.produtos), engine, relatorio)
+    medir_uma_vez("gravacao.cupons", lambda e: gravar_cupons(e, args.cupons), engine, relatorio)
+    engine.dispose()
+
+    # 3. API pelo test client
+    print("\n>>> API (Flask test client)")
+    reset_engine()
+    cliente = api.app.test_client()
+    produtos = [f"Produto {i:06d}" for i in range(0, args.produtos, max(1, args.produtos // 20))]
+    status_ruins = []
+
+    cabecalhos = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else {}
+
+    def chamar(url, limpar_cache=True):
+        if limpar_cache: api.cache_respostas.clear()
+        resp = cliente.get(url, headers=cabecalhos)
+        resp.get_data()  # consome o corpo: respostas em streaming só são montadas aqui
+        if resp.status_code != 200: status_ruins.append((url, resp.status_code))
+        return resp
+
+    proximo = iter(range(10 ** 9))
+    medir("api.products", lambda: chamar("/api/products"), args.repeticoes, relatorio)
+    medir("api.products.cache_quente", lambda: chamar("/api/products", limpar_cache=False), args.repeticoes, relatorio)
+    medir("api.products.filtrada", lambda: chamar("/api/products?category=Processador&sort=price&limit=50"), args.repeticoes, relatorio)
+    medir("api.product", lambda: chamar(f"/api/product/{produtos[next(proximo) % len(produtos)]}"), args.repeticoes, relatorio)
+    medir("api.product.sem_historico", lambda: chamar(f"/api/product/{produtos[next(proximo) % len(produtos)]}?history=none"),
+          args.repeticoes, relatorio)
+    medir("api.coupons", lambda: chamar("/api/coupons"), args.repeticoes, relatorio)
+    versao_cupons = chamar("/api/coupons").headers.get("X-Coupons-Version")
+    medir("api.coupons.delta", lambda: chamar(f"/api/coupons?store=Kabum&since={versao_cupons}"), args.repeticoes, relatorio)
+
+    relatorio["rss_max_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    relatorio["erros_http"] = [{"url": u, "status": s} for u, s in sorted(set(status_ruins))]
+
+    codigo_saida = 0
+    if relatorio["erros_http"]:
+        print(f"\nERRO: respostas diferentes de 200: {relatorio['erros_http']}")
+        codigo_saida = 1
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f: base = json.load(f)
+        relatorio["regressoes"] = comparar(relatorio, base, args.tolerancia)
+        for r in relatorio["regressoes"]:
+            print(f"REGRESSÃO: {r['etapa']} {r['base_ms']} ms -> {r['atual_ms']} ms ({r['razao']}x)")
+        if relatorio["regressoes"]: codigo_saida = 1
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f: json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório salvo em {args.saida}")
+    reset_engine()
+    if pasta_tmp: pasta_tmp.cleanup()
+    sys.exit(codigo_saida)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# meu_comparador_backend/busca.py (v1.0 - Índice de Busca em Memória)
+#
+# Índice invertido (token -> produtos) + índice de trigramas sobre o vocabulário, montado
+# uma vez por versão dos dados. A consulta só faz buscas em dicionário:
+#   - normalização sem acento e sem caixa ("Placa-Mãe" == "placa mae");
+#   - token exato, prefixo (digitação incompleta: "7800x" -> "7800x3d") e, se nada casar,
+#     similaridade de trigramas para erros de digitação ("7800x3b", "rtx4060ti");
+#   - tokens vizinhos do nome também entram juntos ("rtx 4070" casa com "rtx4070").
+# Ranking: se houver produtos que casam todos os termos, só eles; senão os que casam mais
+# termos primeiro. Depois a soma dos pesos (produto_base > nome raspado > categoria) vezes a
+# qualidade do casamento.
+
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+PESO_CAMPOS = {"produto_base": 3.0, "nome_completo_raspado": 2.0, "categoria": 1.0}
+PESO_JUNCAO = 0.8          # token formado por dois vizinhos ("rtx" + "4070")
+SIMILARIDADE_MINIMA = 0.45  # Jaccard de trigramas para aceitar um erro de digitação
+MAX_EXPANSOES = 8           # termos do vocabulário considerados por termo da busca
+MAX_CACHE_TERMOS = 4096
+BONUS_BREVIDADE = 0.1       # desempate a favor de produto_base com menos palavras
+
+RE_NAO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e só [0-9a-z] separados por espaço."""
+    if not texto: return ""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode('ascii').lower()
+    return RE_NAO_ALFANUMERICO.sub(' ', texto).strip()
+
+def tokenizar(texto):
+    return normalizar(texto).split()
+
+def trigramas(token):
+    marcado = f"  {token} "
+    return {marcado[i:i + 3] for i in range(len(marcado) - 2)}
+
+class IndiceBusca:
+    """Índice imutável sobre uma lista de documentos {id, produto_base, nomes, categoria, ...}."""
+
+    def __init__(self, documentos):
+        self.documentos = documentos
+        postagens = defaultdict(dict)  # token -> {doc: peso}
+        for i, doc in enumerate(documentos):
+            campos = (("produto_base", [doc.get("produto_base")]), ("nome_completo_raspado", doc.get("nomes") or []),
+                      ("categoria", [doc.get("categoria")]))
+            for campo, textos in campos:
+                peso = PESO_CAMPOS[campo]
+                for texto in textos:
+                    tokens = tokenizar(texto)
+                    for token in tokens:
+                        if postagens[token].get(i, 0) < peso: postagens[token][i] = peso
+                    for a, b in zip(tokens, tokens[1:]):
+                        junto = a + b
+                        if postagens[junto].get(i, 0) < peso * PESO_JUNCAO: postagens[junto][i] = peso * PESO_JUNCAO
+
+        self.vocabulario = sorted(postagens)
+        # Postagens como arrays: a pontuação da consulta é feita em numpy sobre todos os produtos
+        self._docs = [np.fromiter(postagens[t].keys(), dtype=np.int32, count=len(postagens[t])) for t in self.vocabulario]
+        self._pesos = [np.fromiter(postagens[t].values(), dtype=np.float32, count=len(postagens[t])) for t in self.vocabulario]
+        self._posicao = {t: i for i, t in enumerate(self.vocabulario)}
+        self._trigramas = defaultdict(list)
+        self._qtd_trigramas = []
+        for i, token in enumerate(self.vocabulario):
+            tri = trigramas(token)
+            self._qtd_trigramas.append(len(tri))
+            for t in tri: self._trigramas[t].append(i)
+        self._brevidade = np.array([BONUS_BREVIDADE / max(1, len(tokenizar(doc.get("produto_base"))))
+                                    for doc in documentos], dtype=np.float32)
+        self._cache_termos = {}
+
+    def __len__(self):
+        return len(self.documentos)
+
+    def _expandir(self, termo):
+        """[(posição no vocabulário, similaridade)] para um termo da busca (com cache)."""
+        expansoes = self._cache_termos.get(termo)
+        if expansoes is not None: return expansoes
+
+        expansoes = []
+        exato = self._posicao.get(termo)
+        if exato is not None: expansoes.append((exato, 1.0))
+
+        # Prefixo: digitação incompleta (só a partir de 2 caracteres para não explodir)
+        if len(termo) >= 2:
+            inicio = bisect.bisect_left(self.vocabulario, termo)
+            fim = bisect.bisect_left(self.vocabulario, termo + "\x7f")
+            prefixos = [i for i in range(inicio, min(fim, inicio + 64)) if i != exato]
+            prefixos.sort(key=lambda i: len(self.vocabulario[i]))
+            for i in prefixos[:MAX_EXPANSOES]:
+                expansoes.append((i, 0.6 + 0.3 * len(termo) / len(self.vocabulario[i])))
+
+        # Erro de digitação: só quando não houve casamento exato nem por prefixo
+        if not expansoes and len(termo) >= 3:
+            tri = trigramas(termo)
+            comuns = defaultdict(int)
+            for t in tri:
+                for i in self._trigramas.get(t, ()):
+                    comuns[i] += 1
+            candidatos = []
+            for i, n in comuns.items():
+                similaridade = n / (len(tri) + self._qtd_trigramas[i] - n)
+                if similaridade >= SIMILARIDADE_MINIMA: candidatos.append((similaridade, i))
+            for similaridade, i in heapq.nlargest(MAX_EXPANSOES, candidatos):
+                expansoes.append((i, 0.8 * similaridade))
+
+        if len(self._cache_termos) >= MAX_CACHE_TERMOS: self._cache_termos.clear()
+        self._cache_termos[termo] = expansoes
+        return expansoes
+
+    def buscar(self, consulta, limite=20):
+        """[(documento, pontuação)] em ordem de relevância."""
+        termos = list(dict.fromkeys(tokenizar(consulta)))
+        if not termos: return []
+
+        n = len(self.documentos)
+        pontos = np.zeros(n, dtype=np.float32)
+        casados = np.zeros(n, dtype=np.int16)
+        for termo in termos:
+            melhor = np.zeros(n, dtype=np.float32)
+            for posicao, similaridade in self._expandir(termo):
+                docs = self._docs[posicao]
+                melhor[docs] = np.maximum(melhor[docs], self._pesos[posicao] * similaridade)
+            pontos += melhor
+            casados += melhor > 0
+
+        # Se algum produto casa todos os termos, os parciais ficam de fora
+        maximo = int(casados.max()) if n else 0
+        if maximo == 0: return []
+        candidatos = np.flatnonzero(casados == maximo if maximo == len(termos) else casados > 0)
+        # Ordem total e determinística: termos casados, pontuação (+ bônus para nomes curtos,
+        # "RTX 4070" antes de "RTX 4070 Ti"), ordem original
+        pontuacao = np.rint((pontos[candidatos] + self._brevidade[candidatos]) * 1000).astype(np.int64)
+        chave = (casados[candidatos].astype(np.int64) << 44) | (pontuacao << 24) | (0xFFFFFF - candidatos)
+        if len(candidatos) > limite:
+            parte = np.argpartition(-chave, limite - 1)[:limite]
+            candidatos, chave = candidatos[parte], chave[parte]
+        ordem = np.argsort(-chave)
+        return [(self.documentos[d], round(float(pontos[d]) / len(termos), 4)) for d in candidatos[ordem]]
+
+def documentos_de_atuais(df_atual, listagem):
+    """Um documento por produto: textos para indexar + o item da listagem para devolver."""
+    nomes = df_atual.groupby('produto_base')['nome_completo_raspado'].agg(lambda s: [n for n in s.dropna().unique()])
+    return [{"produto_base": item["id"], "nomes": nomes.get(item["id"], []), "categoria": item["category"], "item": item}
+            for item in listagem]
@@ -0,0 +1,78 @@
+# meu_comparador_backend/cache.py (v1.0 - Cache LRU com TTL + Versão dos Dados)
+
+import threading
+import time
+from collections import OrderedDict
+
+class CacheLRU:
+    """Cache em memória, limitado em itens, com expiração (TTL) e descarte do menos usado (LRU)."""
+
+    def __init__(self, max_itens=256, ttl=600):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, chave):
+        agora = time.monotonic()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None or item[0] < agora:
+                if item is not None: del self._itens[chave]
+                self.misses += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return item[1]
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "itens": len(self._itens), "max_itens": self.max_itens, "ttl_s": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            }
+
+class VersaoDados:
+    """Guarda a versão atual dos dados (ex.: MAX(timestamp)) e só consulta o banco a cada `ttl` segundos.
+
+    Enquanto a versão estiver fresca, requisições condicionais (If-None-Match) são respondidas
+    com 304 sem nenhuma ida ao banco. Uma nova rodada do scraper muda a versão e invalida o cache.
+    """
+
+    def __init__(self, carregar, ttl=15):
+        self.carregar = carregar
+        self.ttl = ttl
+        self._valor = None
+        self._expira = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        agora = time.monotonic()
+        if self._valor is not None and agora < self._expira: return self._valor
+        with self._lock:
+            if self._valor is None or time.monotonic() >= self._expira:
+                valor = self.carregar()
+                # Em falha do banco não guarda nada: a próxima requisição tenta de novo
+                self._valor = valor
+                self._expira = time.monotonic() + self.ttl if valor is not None else 0.0
+            return self._valor
+
+    def invalidar(self):
+        with self._lock:
+            self._valor = None
+            self._expira = 0.0
@@ -0,0 +1,48 @@
+# meu_comparador_backend/carga.py (v1.0 - Carga em Lote: COPY / execute_values)
+#
+# `DataFrame.to_sql` e o executemany do psycopg2 mandam um INSERT por linha. No Postgres
+# (psycopg2) o append usa COPY e os upserts usam execute_values (várias linhas por comando),
+# sempre no cursor da conexão recebida, ou seja, dentro da transação de quem chamou.
+# Em outros bancos (SQLite dos benchmarks) cai no executemany do driver.
+
+import io
+
+from sqlalchemy import text
+
+PAGINA = 500
+
+def usa_psycopg2(conn):
+    return conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2'
+
+def copiar_dataframe(conn, tabela, df):
+    """Append de `df` em `tabela` (colunas com os mesmos nomes) via COPY ... FROM STDIN."""
+    if df.empty: return 0
+    if not usa_psycopg2(conn):
+        df.to_sql(tabela, con=conn, if_exists='append', index=False, chunksize=PAGINA)
+        return len(df)
+
+    # NULL explícito (\N) para que string vazia continue sendo '' e não vire NULL
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep='\\N')
+    buffer.seek(0)
+    colunas = ", ".join(f'"{c}"' for c in df.columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {tabela} ({colunas}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cursor.close()
+    return len(df)
+
+def executar_em_lote(conn, sql, colunas, registros):
+    """Executa `sql` (com um único `VALUES %s`) para todos os registros (dicts com `colunas`)."""
+    if not registros: return
+    if usa_psycopg2(conn):
+        from psycopg2.extras import execute_values
+        cursor = conn.connection.cursor()
+        try:
+            execute_values(cursor, sql, [tuple(r[c] for c in colunas) for r in registros], page_size=PAGINA)
+        finally:
+            cursor.close()
+        return
+    valores = "(" + ", ".join(f":{c}" for c in colunas) + ")"
+    conn.execute(text(sql.replace("%s", valores, 1)), registros)
@@ -0,0 +1,16 @@
+# meu_comparador_backend/config.py (v1.0 - Leitura de Variáveis de Ambiente)
+
+import os
+
+def env_int(nome, padrao):
+    try: return int(os.environ.get(nome, padrao))
+    except (TypeError, ValueError): return padrao
+
+def env_float(nome, padrao):
+    try: return float(os.environ.get(nome, padrao))
+    except (TypeError, ValueError): return padrao
+
+def env_bool(nome, padrao):
+    valor = os.environ.get(nome)
+    if valor is None: return padrao
+    return valor.strip().lower() in ("1", "true", "yes", "on", "sim")
@@ -0,0 +1,178 @@
+# meu_comparador_backend/consultas.py (v1.2 - Cursor Validado pelo Tipo da Ordenação)
+#
+# Filtros, ordenação e paginação de /api/products executados no banco, devolvendo só os
+# produto_base da página. Lê de precos_atual/precos_stats; se ainda não existirem,
+# calcula o estado atual direto de `precos` com ROW_NUMBER() (apoiado pelo índice
+# (produto_base, loja, timestamp DESC) criado em migrate_indices_precos.py).
+# As ordenações/filtros de oferta (percentil, z-score, "menor em N dias", spread) leem
+# `precos_ofertas` (ofertas.py), que o scraper mantém na gravação; o join só entra quando pedido.
+
+import base64
+import json
+import math
+
+from sqlalchemy import text
+
+FONTES = [
+    ("precos_atual", "precos_stats"),
+    ("""(SELECT * FROM (
+            SELECT p.*, ROW_NUMBER() OVER (PARTITION BY produto_base, loja ORDER BY timestamp DESC) AS rn
+            FROM precos p) ultimas WHERE rn = 1)""",
+     """(SELECT produto_base, MIN(preco) AS preco_min, SUM(preco) AS preco_soma, COUNT(*) AS preco_qtd
+         FROM precos WHERE preco > 0 GROUP BY produto_base)"""),
+]
+
+# Chaves de ordenação sempre crescentes e nunca nulas (produtos sem preço vão para o fim)
+ORDENACOES = {
+    'price': "COALESCE(p.preco_atual, 1e15)",
+    'name': "p.produto_base",
+    # Maior desconto em relação à média histórica primeiro: preco_atual / media - 1
+    'discount': "COALESCE(p.preco_atual * s.preco_qtd / NULLIF(s.preco_soma, 0) - 1, 1e15)",
+    # Sinais de precos_ofertas: mais abaixo da média de 90 dias / mais perto do mínimo da janela primeiro
+    'deal': "COALESCE(o.zscore, 1e15)",
+    'percentile_30': "COALESCE(o.percentil_30, 1e15)",
+    'percentile_90': "COALESCE(o.percentil_90, 1e15)",
+    'percentile_365': "COALESCE(o.percentil_365, 1e15)",
+    # "Menor preço em N dias": maior N primeiro
+    'lowest_days': "COALESCE(-COALESCE(o.dias_desde_menor, o.dias_observados), 1e15)",
+    # Maior diferença entre lojas primeiro
+    'spread': "COALESCE(-o.spread_pct, 1e15)",
+}
+
+# Filtros numéricos sobre precos_ofertas: parâmetro -> condição
+FILTROS_OFERTA = {
+    'max_percentile_30': "o.percentil_30 <= :max_percentile_30",
+    'max_percentile_90': "o.percentil_90 <= :max_percentile_90",
+    'max_percentile_365': "o.percentil_365 <= :max_percentile_365",
+    'max_zscore': "o.zscore <= :max_zscore",
+    'min_lowest_days': "COALESCE(o.dias_desde_menor, o.dias_observados) >= :min_lowest_days",
+    'min_spread': "o.spread_pct >= :min_spread",
+}
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+def _bool_param(valor):
+    v = valor.strip().lower()
+    if v in ("1", "true", "yes", "sim"): return True
+    if v in ("0", "false", "no", "nao", "não"): return False
+    raise ValueError(f"valor booleano inválido: {valor}")
+
+def codificar_cursor(chave, produto_base):
+    bruto = json.dumps([chave, produto_base], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii').rstrip('=')
+
+def decodificar_cursor(cursor, sort='name'):
+    """(chave, produto_base) do cursor; a chave tem que ter o tipo da ordenação (texto em name, número nas outras)."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        chave, produto_base = json.loads(bruto.decode('utf-8'))
+    except Exception:
+        raise ValueError("cursor inválido")
+    # O cursor vem do cliente: tipo errado aqui viraria erro do banco (500) na consulta por faixa
+    if sort == 'name': chave_valida = isinstance(chave, str)
+    else: chave_valida = isinstance(chave, (int, float)) and not isinstance(chave, bool) and math.isfinite(chave)
+    if not chave_valida or not isinstance(produto_base, str):
+        raise ValueError("cursor inválido")
+    return chave, produto_base
+
+def ler_filtros(args):
+    """Valida os query params da listagem. Levanta ValueError com mensagem para o cliente."""
+    filtros = {
+        'category': (args.get('category') or '').strip() or None,
+        'store': (args.get('store') or '').strip() or None,
+        'min_price': None, 'max_price': None, 'in_stock': None,
+        'sort': (args.get('sort') or 'name').strip().lower(),
+        'limit': None, 'cursor': None,
+    }
+    for nome in ('min_price', 'max_price') + tuple(FILTROS_OFERTA):
+        if args.get(nome):
+            try: filtros[nome] = float(args[nome])
+            except ValueError: raise ValueError(f"{nome} deve ser numérico")
+    if args.get('in_stock'): filtros['in_stock'] = _bool_param(args['in_stock'])
+    if filtros['sort'] not in ORDENACOES:
+        raise ValueError(f"sort deve ser um de: {', '.join(ORDENACOES)}")
+    if args.get('limit'):
+        try: filtros['limit'] = int(args['limit'])
+        except ValueError: raise ValueError("limit deve ser inteiro")
+        if filtros['limit'] < 1: raise ValueError("limit deve ser >= 1")
+        filtros['limit'] = min(filtros['limit'], LIMITE_MAXIMO)
+    if args.get('cursor'):
+        filtros['cursor'] = decodificar_cursor(args['cursor'], filtros['sort'])
+        if filtros['limit'] is None: filtros['limit'] = LIMITE_PADRAO
+    return filtros
+
+def _montar_sql(fonte_atual, fonte_stats, filtros):
+    params = {}
+    filtro_loja = ""
+    if filtros['store']:
+        filtro_loja = " AND a.loja = :store"
+        params['store'] = filtros['store']
+
+    chave = ORDENACOES[filtros['sort']]
+    condicoes = []
+    if filtros['category']:
+        condicoes.append("p.categoria = :category"); params['category'] = filtros['category']
+    if filtros['store']:
+        condicoes.append("p.na_loja > 0")
+    if filtros['min_price'] is not None:
+        condicoes.append("p.preco_atual >= :min_price"); params['min_price'] = filtros['min_price']
+    if filtros['max_price'] is not None:
+        condicoes.append("p.preco_atual <= :max_price"); params['max_price'] = filtros['max_price']
+    for nome, condicao in FILTROS_OFERTA.items():
+        if filtros.get(nome) is not None:
+            condicoes.append(condicao); params[nome] = filtros[nome]
+    if filtros['in_stock'] is True: condicoes.append("p.preco_atual IS NOT NULL")
+    if filtros['in_stock'] is False: condicoes.append("p.preco_atual IS NULL")
+    if filtros['cursor']:
+        chave_cursor, id_cursor = filtros['cursor']
+        if filtros['sort'] == 'name':
+            condicoes.append("p.produto_base > :cursor_id")
+        else:
+            condicoes.append(f"({chave} > :cursor_chave OR ({chave} = :cursor_chave AND p.produto_base > :cursor_id))")
+            params['cursor_chave'] = chave_cursor
+        params['cursor_id'] = id_cursor
+
+    sql = f"""
+        WITH produtos AS (
+            SELECT a.produto_base,
+                   MIN(TRIM(a.categoria)) AS categoria,
+                   MIN(CASE WHEN a.preco > 0{filtro_loja} THEN a.preco END) AS preco_atual,
+                   SUM(CASE WHEN 1 = 1{filtro_loja} THEN 1 ELSE 0 END) AS na_loja
+            FROM {fonte_atual} a
+            GROUP BY a.produto_base
+        )
+        SELECT p.produto_base, {chave} AS chave
+        FROM produtos p
+        LEFT JOIN {fonte_stats} s ON s.produto_base = p.produto_base
+    """
+    if "o." in chave or any(filtros.get(nome) is not None for nome in FILTROS_OFERTA):
+        sql += " LEFT JOIN precos_ofertas o ON o.produto_base = p.produto_base"
+    if condicoes: sql += " WHERE " + " AND ".join(condicoes)
+    sql += " ORDER BY chave, p.produto_base"
+    if filtros['limit'] is not None:
+        # Uma linha a mais para saber se existe próxima página
+        sql += " LIMIT :limite"
+        params['limite'] = filtros['limit'] + 1
+    return text(sql), params
+
+def listar_ids(engine, filtros):
+    """Retorna (ids da página em ordem, próximo cursor ou None)."""
+    erro = None
+    for fonte_atual, fonte_stats in FONTES:
+        sql, params = _montar_sql(fonte_atual, fonte_stats, filtros)
+        try:
+            with engine.connect() as conn:
+                linhas = conn.execute(sql, params).all()
+            break
+        except Exception as e:
+            erro = e
+    else:
+        raise erro
+
+    proximo = None
+    if filtros['limit'] is not None and len(linhas) > filtros['limit']:
+        linhas = linhas[:filtros['limit']]
+        ultima = linhas[-1]
+        proximo = codificar_cursor(ultima.chave, ultima.produto_base)
+    return [l.produto_base for l in linhas], proximo
@@ -0,0 +1,241 @@
+# meu_comparador_backend/cupons.py (v1.1 - Validade Estruturada, Catálogo em Memória e Delta)
+#
+# Antes o scraper apagava os cupons da loja e inseria de novo em outra transação, e durante
+# esse intervalo a API respondia sem cupons. Agora a rodada faz, numa única transação,
+# um upsert por (loja, codigo) e marca como inativos os cupons que não apareceram mais.
+# Cupons adicionados à mão (add_manual_coupon.py) não têm `visto_em` e não expiram por aqui.
+#
+# `validade` é texto livre ("31/12/2025", "Verificar no site"); na gravação ela é interpretada
+# em `valido_ate` (TIMESTAMP, NULL quando não há data), com índice para os ativos. `alterado_em`
+# só muda quando o cupom entra, muda de conteúdo ou sai, e é a base do delta de /api/coupons:
+# a API mantém um CatalogoCupons em memória (ativos + removidos recentes) e responde ?since=
+# com o que entrou e o que saiu (desativado ou vencido) desde a versão que o cliente tem.
+
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from carga import executar_em_lote
+from config import env_int
+
+# Por quantos dias os cupons removidos ficam no catálogo; ?since= mais antigo recebe a lista inteira
+DIAS_DELTA = env_int("CUPONS_DELTA_DIAS", 30)
+
+DDL_CUPONS_UPSERT = [
+    "ALTER TABLE cupons ADD COLUMN IF NOT EXISTS ativo BOOLEAN NOT NULL DEFAULT TRUE",
+    "ALTER TABLE cupons ADD COLUMN IF NOT EXISTS visto_em TIMESTAMP",
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_cupons_loja_codigo ON cupons (loja, codigo)",
+]
+
+DDL_CUPONS_VALIDADE = [
+    "ALTER TABLE cupons ADD COLUMN IF NOT EXISTS valido_ate TIMESTAMP",
+    "ALTER TABLE cupons ADD COLUMN IF NOT EXISTS alterado_em TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS idx_cupons_valido_ate ON cupons (valido_ate) WHERE ativo",
+    "CREATE INDEX IF NOT EXISTS idx_cupons_alterado_em ON cupons (alterado_em)",
+]
+
+COLUNAS_CUPONS = ["codigo", "descricao", "validade", "loja", "link", "timestamp", "visto_em"]
+COLUNAS_VALIDADE = ["valido_ate", "alterado_em"]
+
+SQL_UPSERT_CUPONS = f"""
+    INSERT INTO cupons ({", ".join(COLUNAS_CUPONS)}) VALUES %s
+    ON CONFLICT (loja, codigo) DO UPDATE SET
+        descricao = excluded.descricao,
+        validade = excluded.validade,
+        link = excluded.link,
+        timestamp = excluded.timestamp,
+        visto_em = excluded.visto_em,
+        ativo = TRUE
+"""
+
+# Depois de migrate_cupons_validade.py: alterado_em só avança se o cupom voltou ou mudou
+SQL_UPSERT_CUPONS_VALIDADE = f"""
+    INSERT INTO cupons ({", ".join(COLUNAS_CUPONS + COLUNAS_VALIDADE)}) VALUES %s
+    ON CONFLICT (loja, codigo) DO UPDATE SET
+        descricao = excluded.descricao,
+        validade = excluded.validade,
+        link = excluded.link,
+        timestamp = excluded.timestamp,
+        visto_em = excluded.visto_em,
+        valido_ate = excluded.valido_ate,
+        alterado_em = CASE
+            WHEN cupons.ativo AND COALESCE(cupons.descricao, '') = COALESCE(excluded.descricao, '')
+                 AND COALESCE(cupons.validade, '') = COALESCE(excluded.validade, '')
+                 AND COALESCE(cupons.link, '') = COALESCE(excluded.link, '')
+            THEN cupons.alterado_em ELSE excluded.alterado_em END,
+        ativo = TRUE
+"""
+
+SQL_EXPIRAR_CUPONS = text("""
+    UPDATE cupons SET ativo = FALSE, timestamp = :momento
+    WHERE loja = :loja AND ativo AND visto_em IS NOT NULL AND visto_em < :momento
+""")
+SQL_EXPIRAR_CUPONS_VALIDADE = text("""
+    UPDATE cupons SET ativo = FALSE, timestamp = :momento, alterado_em = :momento
+    WHERE loja = :loja AND ativo AND visto_em IS NOT NULL AND visto_em < :momento
+""")
+
+# Colunas públicas de /api/coupons (as de controle ficam de fora do JSON)
+SQL_CUPONS_ATIVOS = """
+    SELECT id, codigo, descricao, validade, loja, link, timestamp FROM cupons
+    WHERE ativo ORDER BY id DESC
+"""
+
+# Catálogo da API: ativos + removidos nos últimos DIAS_DELTA dias (para o delta)
+SQL_CATALOGO_CUPONS = text("""
+    SELECT id, codigo, descricao, validade, loja, link, timestamp, valido_ate, ativo, alterado_em FROM cupons
+    WHERE ativo OR alterado_em >= :horizonte ORDER BY id DESC
+""")
+
+# --- VALIDADE ---
+RE_DATA_ISO = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{1,2}):(\d{2}))?')
+RE_DATA_BR = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?\b(?:\s*(?:às|as|-|,)?\s*(\d{1,2})(?::|h)(\d{2})?)?', re.I)
+
+def interpretar_validade(texto, referencia=None):
+    """datetime do fim da validade em `texto` ("31/12/2025", "Válido até 05/01 às 23h", "2025-12-31"), ou None.
+
+    Sem hora, vale até o fim do dia. Sem ano, usa o de `referencia` (hoje), ou o seguinte se a
+    data já tiver passado há mais de 60 dias (cupom de janeiro visto em dezembro).
+    """
+    if not texto: return None
+    referencia = referencia or datetime.now()
+    achado = RE_DATA_ISO.search(texto)
+    if achado:
+        ano, mes, dia, hora, minuto = achado.groups()
+    else:
+        achado = RE_DATA_BR.search(texto)
+        if not achado: return None
+        dia, mes, ano, hora, minuto = achado.groups()
+    try:
+        if ano is None:
+            fim = date(referencia.year, int(mes), int(dia))
+            if fim < referencia.date() - timedelta(days=60): fim = fim.replace(year=referencia.year + 1)
+        else:
+            fim = date(int(ano) + (2000 if len(ano) == 2 else 0), int(mes), int(dia))
+        if hora is None: return datetime(fim.year, fim.month, fim.day, 23, 59, 59)
+        return datetime(fim.year, fim.month, fim.day, int(hora), int(minuto or 0))
+    except ValueError:  # 31/02, 25:00...
+        return None
+
+def _tem_validade(conn):
+    """Se as colunas de migrate_cupons_validade.py já existem (consulta num savepoint)."""
+    try:
+        with conn.begin_nested():
+            conn.execute(text("SELECT valido_ate, alterado_em FROM cupons WHERE 1 = 0"))
+        return True
+    except Exception:
+        return False
+
+def salvar_cupons(engine, cupons, momento):
+    """Upsert dos cupons vistos nesta rodada + expiração dos não vistos, por loja, numa transação.
+
+    Retorna (gravados, expirados).
+    """
+    registros = {}
+    for cupom in cupons:
+        registro = {c: cupom.get(c) for c in COLUNAS_CUPONS}
+        registro.update(timestamp=momento, visto_em=momento, alterado_em=momento,
+                        valido_ate=cupom.get('valido_ate') or interpretar_validade(cupom.get('validade'), momento))
+        registros[(registro['loja'], registro['codigo'])] = registro
+    lojas = sorted({loja for loja, _ in registros})
+
+    expirados = 0
+    with engine.begin() as conn:
+        # Antes de migrate_cupons_validade.py grava só as colunas antigas
+        if _tem_validade(conn):
+            upsert, expirar, colunas = SQL_UPSERT_CUPONS_VALIDADE, SQL_EXPIRAR_CUPONS_VALIDADE, COLUNAS_CUPONS + COLUNAS_VALIDADE
+        else:
+            upsert, expirar, colunas = SQL_UPSERT_CUPONS, SQL_EXPIRAR_CUPONS, COLUNAS_CUPONS
+        executar_em_lote(conn, upsert, colunas, list(registros.values()))
+        for loja in lojas:
+            expirados += conn.execute(expirar, {'loja': loja, 'momento': momento}).rowcount
+    return len(registros), expirados
+
+# --- CATÁLOGO EM MEMÓRIA (API) ---
+EPOCA = datetime(1970, 1, 1)
+COLUNAS_CONTROLE = ('ativo', 'visto_em', 'alterado_em')
+
+def _ms(valor):
+    """Milissegundos desde 1970 de um TIMESTAMP sem fuso (o SQLite devolve texto); None se vazio."""
+    if valor is None: return None
+    if isinstance(valor, str): valor = datetime.fromisoformat(valor)
+    return (valor.replace(tzinfo=None) - EPOCA) // timedelta(milliseconds=1)
+
+def ler_versao(texto):
+    """(versão dos dados, instante) de um token "<ms>.<ms>" de ?since=; levanta ValueError."""
+    dados, _, instante = (texto or '').strip().partition('.')
+    if not dados.isdigit() or not instante.isdigit(): raise ValueError("since inválido (use a versão devolvida pela API)")
+    return int(dados), int(instante)
+
+class CatalogoCupons:
+    """Cupons de /api/coupons em memória: ativos + removidos recentes, com a validade já em ms.
+
+    Montado uma vez por versão dos dados; filtrar por loja e por validade e calcular o delta
+    não tocam no banco. `com_delta` é False antes da migração (sem alterado_em/removidos).
+    """
+
+    def __init__(self, linhas, horizonte=None, com_delta=True):
+        self.itens = []
+        for linha in linhas:
+            linha = dict(linha)
+            publico = {k: v for k, v in linha.items() if k not in COLUNAS_CONTROLE}
+            loja = (linha.get('loja') or '').casefold()
+            alterado = _ms(linha.get('alterado_em') or linha.get('timestamp')) or 0
+            self.itens.append((publico, loja, _ms(linha.get('valido_ate')), bool(linha.get('ativo', True)), alterado))
+        self.versao_dados = max((item[4] for item in self.itens), default=0)
+        self.horizonte = _ms(horizonte) or 0
+        self.com_delta = com_delta
+
+    def versao(self, agora):
+        return f"{self.versao_dados}.{_ms(agora)}"
+
+    def vencidos(self, agora):
+        """Quantos ativos já venceram em `agora` (a validade só avança: a contagem identifica o conjunto)."""
+        agora = _ms(agora)
+        return sum(1 for _, _, valido_ate, ativo, _ in self.itens if ativo and valido_ate is not None and valido_ate <= agora)
+
+    def _da_loja(self, loja):
+        loja = (loja or '').casefold()
+        return (item for item in self.itens if not loja or item[1] == loja)
+
+    def listar(self, agora, loja=None, incluir_vencidos=False):
+        agora = _ms(agora)
+        return [publico for publico, _, valido_ate, ativo, _ in self._da_loja(loja)
+                if ativo and (incluir_vencidos or valido_ate is None or valido_ate > agora)]
+
+    def delta(self, desde, agora, loja=None, incluir_vencidos=False):
+        """(adicionados, ids removidos) desde a versão `desde` (de ler_versao); None se for preciso recarregar tudo.
+
+        Adicionados inclui os cupons alterados (o cliente substitui pelo id); removidos inclui
+        os desativados pelo scraper e os que venceram entre as duas consultas.
+        """
+        dados, instante = desde
+        if not self.com_delta or dados < self.horizonte: return None
+        agora = _ms(agora)
+        adicionados, removidos = [], []
+        for publico, _, valido_ate, ativo, alterado in self._da_loja(loja):
+            visivel = ativo and (incluir_vencidos or valido_ate is None or valido_ate > agora)
+            if alterado > dados:
+                if visivel: adicionados.append(publico)
+                else: removidos.append(publico['id'])
+            elif not visivel and ativo and instante < valido_ate <= agora:
+                removidos.append(publico['id'])
+        return adicionados, removidos
+
+def carregar_catalogo(conn, agora):
+    """CatalogoCupons a partir do banco, com os fallbacks de antes das migrações de cupons."""
+    horizonte = agora - timedelta(days=DIAS_DELTA)
+    try:
+        with conn.begin_nested():
+            linhas = conn.execute(SQL_CATALOGO_CUPONS, {'horizonte': horizonte}).mappings().all()
+        return CatalogoCupons(linhas, horizonte)
+    except Exception:
+        pass
+    # Antes de migrate_cupons_validade.py (sem validade nem removidos) / de migrate_cupons_upsert.py (sem 'ativo')
+    try:
+        with conn.begin_nested():
+            linhas = conn.execute(text(SQL_CUPONS_ATIVOS)).mappings().all()
+    except Exception:
+        linhas = conn.execute(text("SELECT * FROM cupons ORDER BY id DESC")).mappings().all()
+    return CatalogoCupons(linhas, com_delta=False)
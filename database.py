@@ -0,0 +1,154 @@
+# meu_comparador_backend/database.py (v1.0 - Engine Único por Worker + Métricas do Pool)
+
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from config import env_bool, env_int
+
+# --- CONFIGURAÇÃO DO POOL (via variáveis de ambiente) ---
+# DB_POOL_SIZE        conexões mantidas abertas por worker (padrão 5)
+# DB_MAX_OVERFLOW     conexões extras permitidas em pico (padrão 10)
+# DB_POOL_TIMEOUT     segundos esperando uma conexão livre antes de erro (padrão 30)
+# DB_POOL_RECYCLE     segundos até reciclar uma conexão, evita cortes do Postgres gerenciado (padrão 1800)
+# DB_POOL_PRE_PING    testa a conexão antes de usar (padrão true)
+
+def get_database_url():
+    """Lê DATABASE_URL e corrige o prefixo antigo do Render (postgres:// -> postgresql://)."""
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+    if not DATABASE_URL: return None
+    if DATABASE_URL.startswith("postgres://"):
+        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+    return DATABASE_URL
+
+# --- MÉTRICAS DO POOL ---
+_stats_lock = threading.Lock()
+_stats = {}
+
+def _zerar_stats():
+    with _stats_lock:
+        _stats.clear()
+        _stats.update({
+            "checkouts": 0,
+            "connects": 0,
+            "invalidations": 0,
+            "timeouts": 0,
+            "wait_total_s": 0.0,
+            "wait_max_s": 0.0,
+        })
+
+_zerar_stats()
+
+def _registrar_espera(segundos, timeout=False):
+    with _stats_lock:
+        _stats["wait_total_s"] += segundos
+        if segundos > _stats["wait_max_s"]: _stats["wait_max_s"] = segundos
+        if timeout: _stats["timeouts"] += 1
+
+class PoolInstrumentado(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout esperou por uma conexão (inclui abrir uma nova)."""
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            _registrar_espera(time.perf_counter() - inicio, timeout=True)
+            raise
+        _registrar_espera(time.perf_counter() - inicio)
+        return conn
+
+def _instalar_eventos(engine):
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, conn_record):
+        with _stats_lock: _stats["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, conn_record, conn_proxy):
+        with _stats_lock: _stats["checkouts"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, conn_record, exception):
+        with _stats_lock: _stats["invalidations"] += 1
+
+# --- ENGINE ÚNICO POR PROCESSO ---
+_engine = None
+_engine_lock = threading.Lock()
+
+def _criar_engine(url):
+    if url.startswith("sqlite"):
+        # SQLite (testes/benchmarks locais) não aceita os parâmetros de QueuePool
+        engine = create_engine(url)
+    else:
+        engine = create_engine(
+            url,
+            poolclass=PoolInstrumentado,
+            pool_size=env_int("DB_POOL_SIZE", 5),
+            max_overflow=env_int("DB_MAX_OVERFLOW", 10),
+            pool_timeout=env_int("DB_POOL_TIMEOUT", 30),
+            pool_recycle=env_int("DB_POOL_RECYCLE", 1800),
+            pool_pre_ping=env_bool("DB_POOL_PRE_PING", True),
+        )
+    _instalar_eventos(engine)
+    return engine
+
+def get_engine():
+    """Retorna o engine do processo, criando na primeira chamada (depois do fork do gunicorn)."""
+    global _engine
+    if _engine is not None: return _engine
+    with _engine_lock:
+        if _engine is None:
+            url = get_database_url()
+            if not url: return None
+            _engine = _criar_engine(url)
+            _zerar_stats()
+    return _engine
+
+def reset_engine():
+    """Descarta o engine atual (usado em testes e após fork)."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+
+def _apos_fork():
+    # Conexões herdadas do processo pai não podem ser reutilizadas pelo filho
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=False)
+    _engine = None
+    _zerar_stats()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_apos_fork)
+
+def pool_stats():
+    """Snapshot das métricas do pool para dimensionamento (checked-out, overflow, espera)."""
+    with _stats_lock:
+        dados = dict(_stats)
+    dados["wait_avg_ms"] = (dados["wait_total_s"] / dados["checkouts"] * 1000) if dados["checkouts"] else 0.0
+    dados["wait_total_ms"] = dados.pop("wait_total_s") * 1000
+    dados["wait_max_ms"] = dados.pop("wait_max_s") * 1000
+
+    engine = _engine
+    if engine is None:
+        dados["engine"] = None
+        return dados
+
+    pool = engine.pool
+    dados["engine"] = engine.dialect.name
+    dados["pool_class"] = type(pool).__name__
+    if isinstance(pool, QueuePool):
+        dados.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+        })
+    dados["pid"] = os.getpid()
+    return dados
@@ -0,0 +1,151 @@
+# meu_comparador_backend/descricoes.py (v1.1 - Leitura de Descrições em Lote)
+#
+# A descrição HTML de cada página (dezenas de KB) quase nunca muda, mas era regravada em
+# `precos` a cada rodada. Agora cada conteúdo é guardado uma única vez em `descricoes`,
+# com chave = sha256 do HTML, e as linhas de `precos`/`precos_atual` só levam o hash.
+# A escolha da descrição exibida (Pichau > Terabyte > loja vencedora) também é feita na
+# gravação e fica em `produtos_descricao`, para a rota de detalhes ler uma única linha.
+
+import hashlib
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from agregacao import escolher_principais
+from carga import executar_em_lote
+
+DDL_DESCRICOES = [
+    """
+    CREATE TABLE IF NOT EXISTS descricoes (
+        hash CHAR(64) PRIMARY KEY,
+        conteudo TEXT NOT NULL,
+        tamanho INTEGER NOT NULL,
+        criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS produtos_descricao (
+        produto_base VARCHAR(200) PRIMARY KEY,
+        descricao_hash CHAR(64),
+        loja VARCHAR(50),
+        atualizado_em TIMESTAMP
+    )
+    """,
+]
+
+# Ordem de preferência da descrição exibida; depois delas vale a da loja vencedora
+PREFERENCIA_LOJAS = ["Pichau", "Terabyte"]
+TAMANHO_MINIMO = 10
+
+SQL_INSERIR_DESCRICAO = """
+    INSERT INTO descricoes (hash, conteudo, tamanho) VALUES %s
+    ON CONFLICT (hash) DO NOTHING
+"""
+
+SQL_UPSERT_PRODUTO_DESCRICAO = """
+    INSERT INTO produtos_descricao (produto_base, descricao_hash, loja, atualizado_em) VALUES %s
+    ON CONFLICT (produto_base) DO UPDATE SET
+        descricao_hash = excluded.descricao_hash,
+        loja = excluded.loja,
+        atualizado_em = excluded.atualizado_em
+"""
+
+def hash_descricao(conteudo):
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def descricao_valida(desc):
+    return bool(desc) and len(str(desc).strip()) > TAMANHO_MINIMO
+
+def registrar_descricoes(conn, df):
+    """Grava as descrições novas do lote em `descricoes` e troca o HTML pelo hash nas linhas.
+
+    Retorna uma cópia do lote com `descricao_hash` preenchido e `descricao` vazia (None).
+    """
+    df = df.copy()
+    textos = df['descricao'].where(df['descricao'].notna(), '').astype(str)
+    preenchidas = textos != ''
+    hashes = pd.Series([None] * len(df), index=df.index, dtype=object)
+    hashes[preenchidas] = [hash_descricao(t) for t in textos[preenchidas]]
+
+    unicas = pd.DataFrame({'hash': hashes[preenchidas], 'conteudo': textos[preenchidas]}).drop_duplicates('hash')
+    if not unicas.empty:
+        unicas['tamanho'] = unicas['conteudo'].str.strip().str.len().astype(int)
+        executar_em_lote(conn, SQL_INSERIR_DESCRICAO, ['hash', 'conteudo', 'tamanho'], unicas.to_dict(orient='records'))
+
+    df['descricao_hash'] = hashes
+    df['descricao'] = None
+    return df
+
+def escolher_descricoes(atuais):
+    """Uma descrição por produto: Pichau > Terabyte > loja vencedora, só se tiver mais de 10 caracteres.
+
+    `atuais` tem produto_base, loja, preco, timestamp, descricao_hash e tamanho (0 se sem descrição).
+    Retorna DataFrame produto_base, descricao_hash, loja (hash/loja None quando nenhuma serve).
+    """
+    produtos = pd.DataFrame({'produto_base': atuais['produto_base'].unique()})
+    if atuais.empty: return produtos.assign(descricao_hash=None, loja=None)
+
+    validas = atuais[(atuais['tamanho'] > TAMANHO_MINIMO) & atuais['descricao_hash'].notna()]
+    principais = escolher_principais(atuais)[['produto_base', 'loja']]
+    candidatas = []
+    for prioridade, loja in enumerate(PREFERENCIA_LOJAS):
+        candidatas.append(validas[validas['loja'] == loja].assign(prioridade=prioridade))
+    vencedoras = validas.merge(principais, on=['produto_base', 'loja'])
+    candidatas.append(vencedoras.assign(prioridade=len(PREFERENCIA_LOJAS)))
+
+    escolhidas = (pd.concat(candidatas, ignore_index=True)
+                  .sort_values(['produto_base', 'prioridade'], kind='mergesort')
+                  .drop_duplicates('produto_base'))
+    resultado = produtos.merge(escolhidas[['produto_base', 'descricao_hash', 'loja']], on='produto_base', how='left')
+    return resultado.astype(object).where(resultado.notna(), None)
+
+def atualizar_descricoes_produtos(conn, produtos, momento=None):
+    """Recalcula a descrição escolhida dos produtos informados a partir de `precos_atual`."""
+    produtos = list(produtos)
+    if not produtos: return
+    consulta = text("""
+        SELECT a.produto_base, a.loja, a.preco, a.timestamp, a.descricao_hash, COALESCE(d.tamanho, 0) AS tamanho
+        FROM precos_atual a
+        LEFT JOIN descricoes d ON d.hash = a.descricao_hash
+        WHERE a.produto_base IN :produtos
+    """).bindparams(bindparam('produtos', expanding=True))
+    atuais = pd.read_sql(consulta, conn, params={'produtos': produtos})
+    atuais['timestamp'] = pd.to_datetime(atuais['timestamp'])
+    atuais['preco'] = pd.to_numeric(atuais['preco'], errors='coerce').fillna(0.0)
+
+    escolhidas = escolher_descricoes(atuais)
+    momento = momento or pd.Timestamp.now().to_pydatetime()
+    registros = [dict(r, atualizado_em=momento) for r in escolhidas.to_dict(orient='records')]
+    executar_em_lote(conn, SQL_UPSERT_PRODUTO_DESCRICAO, ['produto_base', 'descricao_hash', 'loja', 'atualizado_em'], registros)
+
+def selecionar_descricao_legado(df_recentes, loja_vencedora):
+    """Mesma regra, sobre as linhas atuais com a coluna `descricao` (antes da migração)."""
+    for loja in PREFERENCIA_LOJAS + [loja_vencedora]:
+        linhas = df_recentes[df_recentes['loja'] == loja]
+        if not linhas.empty and descricao_valida(linhas.iloc[0].get('descricao', '')):
+            return linhas.iloc[0]['descricao']
+    return ""
+
+def selecionar_descricoes_legado(df_recentes):
+    """{produto_base: descrição} pela regra de selecionar_descricao_legado, para vários produtos."""
+    vencedoras = escolher_principais(df_recentes).set_index('produto_base')['loja']
+    return {produto: selecionar_descricao_legado(linhas, vencedoras.get(produto))
+            for produto, linhas in df_recentes.groupby('produto_base', sort=False)}
+
+def carregar_descricoes(conn, produtos):
+    """{produto_base: HTML da descrição escolhida} numa consulta (sem chave quando não há). Levanta erro sem as tabelas."""
+    consulta = text("""
+        SELECT p.produto_base, d.conteudo FROM produtos_descricao p
+        JOIN descricoes d ON d.hash = p.descricao_hash
+        WHERE p.produto_base IN :produtos
+    """).bindparams(bindparam('produtos', expanding=True))
+    return dict(conn.execute(consulta, {'produtos': list(produtos)}).all())
+
+def carregar_descricao(conn, produto_base):
+    """HTML da descrição escolhida para o produto ('' se não houver). Levanta erro se as tabelas não existirem."""
+    linha = conn.execute(text("""
+        SELECT d.conteudo FROM produtos_descricao p
+        JOIN descricoes d ON d.hash = p.descricao_hash
+        WHERE p.produto_base = :produto_base
+    """), {'produto_base': produto_base}).first()
+    return linha[0] if linha else ""
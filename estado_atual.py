@@ -0,0 +1,146 @@
+# meu_comparador_backend/estado_atual.py (v1.4 - Preço Atual por Loja + Estatísticas + Descrições por Hash + Alertas + Ofertas + Gravação na Transação do Chamador)
+#
+# Tabelas mantidas incrementalmente pelo scraper, na mesma transação do append em `precos`:
+#   precos_atual  -> última linha de cada (produto_base, loja)
+#   precos_stats  -> mínimo / soma / quantidade dos preços válidos (> 0) de cada produto_base
+# Assim a API lê O(produtos x lojas) linhas em vez de varrer todo o histórico.
+# As descrições ficam em `descricoes` (uma vez por conteúdo); as linhas só guardam o hash.
+# Os alertas de preço (alertas.py) são avaliados contra o estado anterior ao lote; os sinais
+# de qualidade da oferta (ofertas.py) são recalculados depois, sobre o estado novo.
+
+import pandas as pd
+
+from alertas import avaliar_alertas
+from carga import copiar_dataframe, executar_em_lote
+from descricoes import atualizar_descricoes_produtos, registrar_descricoes
+from ofertas import atualizar_ofertas
+
+COLUNAS_PRECOS = ["timestamp", "produto_base", "categoria", "nome_completo_raspado", "preco", "imagem_url", "loja", "url", "descricao", "descricao_hash"]
+COLUNAS_ATUAL = ["produto_base", "loja", "timestamp", "categoria", "nome_completo_raspado", "preco", "imagem_url", "url", "descricao_hash"]
+
+DDL_ESTADO_ATUAL = [
+    """
+    CREATE TABLE IF NOT EXISTS precos_atual (
+        produto_base VARCHAR(200) NOT NULL,
+        loja VARCHAR(50) NOT NULL,
+        timestamp TIMESTAMP,
+        categoria VARCHAR(100),
+        nome_completo_raspado TEXT,
+        preco FLOAT,
+        imagem_url TEXT,
+        url TEXT,
+        descricao TEXT,
+        descricao_hash CHAR(64),
+        PRIMARY KEY (produto_base, loja)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS precos_stats (
+        produto_base VARCHAR(200) PRIMARY KEY,
+        preco_min FLOAT,
+        preco_soma FLOAT NOT NULL DEFAULT 0,
+        preco_qtd INTEGER NOT NULL DEFAULT 0,
+        atualizado_em TIMESTAMP
+    )
+    """,
+]
+
+# `VALUES %s` é expandido por carga.executar_em_lote (execute_values no Postgres)
+SQL_UPSERT_ATUAL = f"""
+    INSERT INTO precos_atual ({", ".join(COLUNAS_ATUAL)}) VALUES %s
+    ON CONFLICT (produto_base, loja) DO UPDATE SET
+        timestamp = excluded.timestamp,
+        categoria = excluded.categoria,
+        nome_completo_raspado = excluded.nome_completo_raspado,
+        preco = excluded.preco,
+        imagem_url = excluded.imagem_url,
+        url = excluded.url,
+        -- Página resolvida sem descrição (ex.: só JSON-LD) mantém a descrição já salva
+        descricao_hash = COALESCE(excluded.descricao_hash, precos_atual.descricao_hash)
+    WHERE excluded.timestamp >= precos_atual.timestamp OR precos_atual.timestamp IS NULL
+"""
+
+# CASE em vez de LEAST para funcionar também no SQLite (benchmarks locais)
+COLUNAS_STATS = ["produto_base", "preco_min", "preco_soma", "preco_qtd", "atualizado_em"]
+SQL_UPSERT_STATS = f"""
+    INSERT INTO precos_stats ({", ".join(COLUNAS_STATS)}) VALUES %s
+    ON CONFLICT (produto_base) DO UPDATE SET
+        preco_min = CASE
+            WHEN precos_stats.preco_min IS NULL THEN excluded.preco_min
+            WHEN excluded.preco_min IS NOT NULL AND excluded.preco_min < precos_stats.preco_min THEN excluded.preco_min
+            ELSE precos_stats.preco_min
+        END,
+        preco_soma = precos_stats.preco_soma + excluded.preco_soma,
+        preco_qtd = precos_stats.preco_qtd + excluded.preco_qtd,
+        atualizado_em = excluded.atualizado_em
+"""
+
+def _registros(df):
+    """Converte o DataFrame em dicts com tipos nativos (os drivers não entendem numpy/NaT/pd.Timestamp)."""
+    df = df.astype(object).where(pd.notna(df), None)
+    return [{k: (v.to_pydatetime() if isinstance(v, pd.Timestamp) else v) for k, v in r.items()}
+            for r in df.to_dict(orient='records')]
+
+def preparar_lote(resultados):
+    """Monta o DataFrame no formato da tabela `precos` a partir da lista do scraper."""
+    df = pd.DataFrame(resultados)
+    for col in COLUNAS_PRECOS:
+        if col not in df.columns: df[col] = ""
+    df = df[COLUNAS_PRECOS].copy()
+    df['descricao_hash'] = None
+    df['produto_base'] = df['produto_base'].astype(str).str.strip()
+    return df
+
+def atualizar_estado_atual(conn, df):
+    """Aplica um lote recém-inserido em `precos` às tabelas de estado atual (custo O(linhas do lote))."""
+    if df.empty: return
+
+    # Última linha de cada (produto_base, loja) dentro do lote
+    recentes = df.sort_values('timestamp').drop_duplicates(['produto_base', 'loja'], keep='last')
+    executar_em_lote(conn, SQL_UPSERT_ATUAL, COLUNAS_ATUAL, _registros(recentes[COLUNAS_ATUAL]))
+
+    precos = pd.to_numeric(df['preco'], errors='coerce').fillna(0.0)
+    validos = df.assign(preco=precos)[precos > 0]
+    stats = validos.groupby('produto_base')['preco'].agg(preco_min='min', preco_soma='sum', preco_qtd='count')
+    # Produtos sem nenhum preço válido no lote também ganham linha (min nulo, qtd 0)
+    stats = stats.reindex(df['produto_base'].unique())
+    stats['preco_soma'] = stats['preco_soma'].fillna(0.0)
+    stats['preco_qtd'] = stats['preco_qtd'].fillna(0).astype(int)
+    stats['atualizado_em'] = df['timestamp'].max()
+    stats = stats.rename_axis('produto_base').reset_index()
+    executar_em_lote(conn, SQL_UPSERT_STATS, COLUNAS_STATS, _registros(stats[COLUNAS_STATS]))
+
+def disparar_alertas(conn, df):
+    """avaliar_alertas num savepoint: sem as tabelas de alertas (ou com erro nelas) os preços são gravados mesmo assim."""
+    try:
+        with conn.begin_nested():
+            disparados = avaliar_alertas(conn, df)
+        if disparados: print(f"  -> [Alertas] {disparados} alertas na outbox")
+        return disparados
+    except Exception as e:
+        print(f"  -> [Alertas] Avaliação ignorada (rode migrate_alertas.py?): {str(e).splitlines()[0]}")
+        return 0
+
+def recalcular_ofertas(conn, df):
+    """atualizar_ofertas num savepoint: sem precos_ofertas (ou com erro nela) os preços são gravados mesmo assim."""
+    try:
+        with conn.begin_nested():
+            return atualizar_ofertas(conn, df['produto_base'].dropna().unique(), df['timestamp'].max())
+    except Exception as e:
+        print(f"  -> [Ofertas] Cálculo ignorado (rode migrate_ofertas.py?): {str(e).splitlines()[0]}")
+        return 0
+
+def gravar_precos(conn, df):
+    """Append em `precos` (COPY) + alertas + estado atual + ofertas + descrições na transação de `conn`."""
+    df = registrar_descricoes(conn, df)
+    copiar_dataframe(conn, 'precos', df)
+    disparar_alertas(conn, df)
+    atualizar_estado_atual(conn, df)
+    recalcular_ofertas(conn, df)
+    atualizar_descricoes_produtos(conn, df['produto_base'].unique())
+    return len(df)
+
+def salvar_precos(engine, df):
+    """gravar_precos numa transação própria."""
+    with engine.begin() as conn:
+        return gravar_precos(conn, df)
@@ -0,0 +1,238 @@
+# meu_comparador_backend/extracao_estruturada.py (v1.1 - Descrição em Texto do JSON-LD Aproveitada)
+#
+# Muitas páginas de produto trazem no HTML cru um bloco schema.org Product/Offer (JSON-LD)
+# ou o estado do framework (__NEXT_DATA__, window.__INITIAL_STATE__ ...). Ler esses blocos
+# com regex + json é bem mais barato que renderizar no Chrome e montar a árvore inteira.
+# Se nada for encontrado, o scraper cai nos parsers BeautifulSoup/Selenium de sempre.
+
+import json
+import re
+import threading
+from collections import Counter
+from html import escape, unescape
+
+RE_SCRIPT = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.S | re.I)
+RE_ESTADO_GLOBAL = re.compile(r'window\.(__[A-Z_]+__)\s*=\s*', re.S)
+
+# Chaves de preço em blobs de estado, da mais para a menos específica (à vista/pix primeiro)
+CHAVES_PRECO = ('priceWithDiscount', 'pixPrice', 'priceVista', 'price_vista', 'cashPrice', 'finalPrice', 'price')
+CHAVES_IMAGEM = ('image', 'images', 'photos', 'thumbnail', 'imageUrl', 'img')
+CHAVES_ESTOQUE = ('available', 'isAvailable', 'inStock', 'stock')
+# Só nas páginas de listagem: como chegar à página do produto a partir do item
+CHAVES_URL = ('url', 'link', 'href', 'friendlyName', 'urlKey', 'url_key', 'slug')
+CHAVES_CODIGO = ('code', 'sku', 'productId', 'id')
+
+PROFUNDIDADE_MAXIMA = 12
+
+def _para_preco(valor):
+    if valor is None or isinstance(valor, bool): return None
+    if isinstance(valor, (int, float)): return float(valor) if valor >= 0 else None
+    texto = re.sub(r'[^\d,\.]', '', str(valor))
+    if not texto: return None
+    if ',' in texto:  # formato brasileiro: 1.234,56
+        texto = texto.replace('.', '').replace(',', '.')
+    try: return float(texto)
+    except ValueError: return None
+
+def _primeira_imagem(valor):
+    if isinstance(valor, str): return valor or None
+    if isinstance(valor, dict):
+        for chave in ('url', 'contentUrl', 'src', 'g', 'gg', 'large'):
+            if chave in valor:
+                img = _primeira_imagem(valor[chave])
+                if img: return img
+        return None
+    if isinstance(valor, list):
+        for item in valor:
+            img = _primeira_imagem(item)
+            if img: return img
+    return None
+
+def _tem_tipo(obj, tipo):
+    t = obj.get('@type')
+    return t == tipo or (isinstance(t, list) and tipo in t)
+
+def _percorrer(obj):
+    """Percorre dicts/listas em largura; strings que parecem JSON (ex.: pageProps.data da Kabum) são abertas."""
+    fila = [(obj, 0)]
+    while fila:
+        atual, nivel = fila.pop(0)
+        if nivel > PROFUNDIDADE_MAXIMA: continue
+        if isinstance(atual, str):
+            if len(atual) > 50 and atual.lstrip()[:1] in ('{', '['):
+                try: fila.append((json.loads(atual), nivel + 1))
+                except ValueError: pass
+            continue
+        if isinstance(atual, dict):
+            yield atual
+            fila.extend((v, nivel + 1) for v in atual.values() if isinstance(v, (dict, list, str)))
+        elif isinstance(atual, list):
+            fila.extend((v, nivel + 1) for v in atual if isinstance(v, (dict, list, str)))
+
+def _blocos_json(html):
+    """Separa os blocos JSON-LD e os blobs de estado embutidos no HTML cru."""
+    json_ld, estados = [], []
+    for attrs, corpo in RE_SCRIPT.findall(html):
+        attrs_l = attrs.lower()
+        corpo = corpo.strip()
+        if not corpo: continue
+        if 'application/ld+json' in attrs_l:
+            try: json_ld.append(json.loads(corpo))
+            except ValueError:
+                try: json_ld.append(json.loads(unescape(corpo)))
+                except ValueError: pass
+        elif '__next_data__' in attrs_l or 'application/json' in attrs_l:
+            try: estados.append(json.loads(corpo))
+            except ValueError: pass
+        else:
+            for m in RE_ESTADO_GLOBAL.finditer(corpo):
+                try:
+                    estado, _ = json.JSONDecoder().raw_decode(corpo, m.end())
+                    estados.append(estado)
+                except ValueError: pass
+    return json_ld, estados
+
+def _produto_json_ld(obj):
+    """(nome, preco, img, desc) de um objeto schema.org Product, ou None sem nome/preço."""
+    nome = obj.get('name')
+    if not isinstance(nome, str) or not nome.strip(): return None
+
+    ofertas = obj.get('offers')
+    if isinstance(ofertas, dict): ofertas = [ofertas]
+    precos, sem_estoque = [], False
+    for oferta in ofertas or []:
+        if not isinstance(oferta, dict): continue
+        if 'OutOfStock' in str(oferta.get('availability', '')): sem_estoque = True
+        for chave in ('price', 'lowPrice'):
+            p = _para_preco(oferta.get(chave))
+            if p: precos.append(p)
+        especificacoes = oferta.get('priceSpecification') or []
+        if isinstance(especificacoes, dict): especificacoes = [especificacoes]
+        for spec in especificacoes:
+            if isinstance(spec, dict):
+                p = _para_preco(spec.get('price'))
+                if p: precos.append(p)
+    if not precos and not sem_estoque: return None
+
+    preco = 0.0 if sem_estoque and not precos else min(precos)
+    desc = obj.get('description') if isinstance(obj.get('description'), str) else None
+    return unescape(nome).strip(), preco, _primeira_imagem(obj.get('image')), desc
+
+def _produto_estado(obj):
+    """(nome, preco, img, desc) de um objeto de estado do framework que pareça um produto."""
+    nome = obj.get('name') or obj.get('title')
+    if not isinstance(nome, str) or len(nome.strip()) < 5: return None
+    preco = None
+    for chave in CHAVES_PRECO:
+        if chave in obj:
+            preco = _para_preco(obj[chave])
+            if preco: break
+    if not preco: return None
+
+    for chave in CHAVES_ESTOQUE:
+        if obj.get(chave) is False or obj.get(chave) == 0: preco = 0.0
+    img = None
+    for chave in CHAVES_IMAGEM:
+        img = _primeira_imagem(obj.get(chave))
+        if img: break
+    desc = obj.get('description')
+    desc = desc if isinstance(desc, str) and '<' in desc else None
+    return unescape(nome).strip(), preco, img, desc
+
+def _de_json_ld(blocos):
+    for bloco in blocos:
+        for obj in _percorrer(bloco):
+            if not _tem_tipo(obj, 'Product'): continue
+            dados = _produto_json_ld(obj)
+            if dados: return dados
+    return None
+
+def _de_estado(estados):
+    for estado in estados:
+        for obj in _percorrer(estado):
+            dados = _produto_estado(obj)
+            if dados: return dados
+    return None
+
+def _texto_para_html(texto):
+    """Descrição em texto puro (o JSON-LD costuma trazer assim) em parágrafos HTML escapados."""
+    paragrafos = [p.strip() for p in re.split(r'\n\s*\n', unescape(texto).replace('\r', '')) if p.strip()]
+    return "".join(f"<p>{escape(p).replace(chr(10), '<br>')}</p>" for p in paragrafos) or None
+
+def extrair_dados_estruturados(html):
+    """(nome, preco, img, desc) a partir de JSON-LD ou estado embutido, ou None se não houver.
+
+    `desc` é o HTML do bloco ou, quando o JSON-LD só tem texto puro, esse texto em parágrafos;
+    None quando o bloco não tem descrição (o scraper decide se busca no HTML da página).
+    """
+    if not html: return None
+    if isinstance(html, bytes): html = html.decode('utf-8', errors='replace')
+    json_ld, estados = _blocos_json(html)
+    dados = _de_json_ld(json_ld) or _de_estado(estados)
+    if not dados: return None
+    nome, preco, img, desc = dados
+    if desc and '<' not in desc: desc = _texto_para_html(desc)
+    return nome, preco, img, desc or None
+
+def _primeiro_texto(obj, chaves):
+    for chave in chaves:
+        valor = obj.get(chave)
+        if isinstance(valor, (str, int)) and not isinstance(valor, bool) and str(valor).strip():
+            return str(valor).strip()
+    return None
+
+def extrair_itens_estruturados(html):
+    """Todos os produtos de uma página de listagem (categoria/busca), do JSON-LD ou do estado embutido.
+
+    Retorna [{"nome", "preco", "img", "url", "codigo"}]; `url` pode ser relativa ou só o slug
+    e `codigo` é o código/sku da loja quando existir (quem chama monta a URL final).
+    """
+    if not html: return []
+    if isinstance(html, bytes): html = html.decode('utf-8', errors='replace')
+    json_ld, estados = _blocos_json(html)
+
+    itens, vistos = [], set()
+    def adicionar(dados, url, codigo):
+        nome, preco, img, _ = dados
+        chave = url or codigo or nome
+        if chave in vistos: return
+        vistos.add(chave)
+        itens.append({"nome": nome, "preco": preco, "img": img, "url": url, "codigo": codigo})
+
+    for bloco in json_ld:
+        for obj in _percorrer(bloco):
+            if not _tem_tipo(obj, 'Product'): continue
+            dados = _produto_json_ld(obj)
+            if dados: adicionar(dados, _primeiro_texto(obj, ('url',)), _primeiro_texto(obj, ('sku', 'productID')))
+    if itens: return itens
+
+    for estado in estados:
+        for obj in _percorrer(estado):
+            dados = _produto_estado(obj)
+            if dados: adicionar(dados, _primeiro_texto(obj, CHAVES_URL), _primeiro_texto(obj, CHAVES_CODIGO))
+    return itens
+
+# --- CONTADOR DE CAMINHOS (qual estratégia resolveu cada página, por loja) ---
+class ContadorCaminhos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contagem = {}
+
+    def registrar(self, loja, caminho):
+        with self._lock:
+            self._contagem.setdefault(loja, Counter())[caminho] += 1
+
+    def como_dict(self):
+        with self._lock:
+            return {loja: dict(c) for loja, c in self._contagem.items()}
+
+    def imprimir(self):
+        dados = self.como_dict()
+        if not dados: return
+        print("\n=== CAMINHO DE EXTRAÇÃO POR LOJA ===")
+        for loja, contagem in sorted(dados.items()):
+            total = sum(contagem.values())
+            partes = ", ".join(f"{caminho} {n} ({n / total:.0%})" for caminho, n in sorted(contagem.items(), key=lambda x: -x[1]))
+            print(f"  {loja:<10} {partes}")
+
+caminhos = ContadorCaminhos()
@@ -0,0 +1,264 @@
+# meu_comparador_backend/fila.py (v1.2 - Devolução com Espera Exponencial)
+#
+# O scraper.py coleta tudo num processo só e só grava no fim: não passa de uma máquina e,
+# se cair no meio, perde a rodada inteira. Aqui uma rodada vira uma linha em `fila_rodadas`
+# e um job por (produto, loja) em `fila_coleta`; qualquer número de workers (worker.py, em
+# quantos processos e máquinas quiser, todos no mesmo Postgres) divide os jobs:
+#   - `reivindicar` pega até FILA_LOTE jobs com FOR UPDATE SKIP LOCKED: dois workers nunca
+#     recebem o mesmo job e ninguém espera pelo lock do outro;
+#   - o job reivindicado fica "em_andamento" até `lease_ate` (relógio do banco), renovado
+#     enquanto a coleta roda (RenovadorLease). Worker morto para de renovar: o lease vence e
+#     o job volta a ser reivindicável; depois de FILA_MAX_TENTATIVAS leases vencidos, "falhou";
+#   - o resultado do lote (preços, agenda e estado dos jobs) vai numa transação só, e só para
+#     os jobs que ainda são do worker (`meus`): se o lease venceu e outro worker assumiu, o
+#     primeiro descarta o que coletou em vez de gravar duas vezes;
+#   - job cujo lote deu erro, cuja linha não grava ou cuja página veio sem nome/preço (bloqueio
+#     passageiro, página pela metade) é devolvido à fila com o erro e só volta a ser
+#     reivindicável depois de FILA_ESPERA_DEVOLVIDO x 2^(tentativas-1) segundos; depois de
+#     FILA_MAX_TENTATIVAS reivindicações, "falhou" em vez de voltar (um job que quebra sempre
+#     do mesmo jeito não prende a fila);
+#   - o último worker a ver a rodada sem jobs abertos a fecha (`fechar_rodada`, um só consegue).
+# Estados de um job: pendente -> em_andamento -> concluida | falhou | pulada (disjuntor aberto).
+#
+# Variáveis de ambiente:
+#   FILA_LOTE (5 jobs por reivindicação), FILA_LEASE (300 s), FILA_MAX_TENTATIVAS (3),
+#   FILA_ESPERA_DEVOLVIDO (60 s antes da 2ª tentativa de um job devolvido; dobra a cada nova)
+
+import threading
+
+from sqlalchemy import bindparam, text
+
+from carga import executar_em_lote
+from config import env_int
+
+LOTE = env_int("FILA_LOTE", 5)
+LEASE = env_int("FILA_LEASE", 300)
+MAX_TENTATIVAS = env_int("FILA_MAX_TENTATIVAS", 3)
+ESPERA_DEVOLVIDO = env_int("FILA_ESPERA_DEVOLVIDO", 60)
+ESTADOS_FINAIS = ("concluida", "falhou", "pulada")
+
+DDL_FILA = [
+    """
+    CREATE TABLE IF NOT EXISTS fila_rodadas (
+        id SERIAL PRIMARY KEY,
+        modo VARCHAR(20) NOT NULL DEFAULT 'produto',
+        total INTEGER NOT NULL DEFAULT 0,
+        criada_em TIMESTAMP NOT NULL DEFAULT NOW(),
+        concluida_em TIMESTAMP,
+        fechada_por VARCHAR(100)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS fila_coleta (
+        id BIGSERIAL PRIMARY KEY,
+        rodada_id INTEGER NOT NULL REFERENCES fila_rodadas (id) ON DELETE CASCADE,
+        produto_base VARCHAR(200) NOT NULL,
+        categoria VARCHAR(100),
+        loja VARCHAR(50) NOT NULL,
+        url TEXT NOT NULL,
+        estado VARCHAR(15) NOT NULL DEFAULT 'pendente',
+        tentativas INTEGER NOT NULL DEFAULT 0,
+        worker VARCHAR(100),
+        lease_ate TIMESTAMP,
+        disponivel_em TIMESTAMP,
+        iniciada_em TIMESTAMP,
+        concluida_em TIMESTAMP,
+        erro TEXT,
+        UNIQUE (rodada_id, produto_base, loja)
+    )
+    """,
+    # Tabelas criadas pela v1.0 (sem a espera dos jobs devolvidos)
+    "ALTER TABLE fila_coleta ADD COLUMN IF NOT EXISTS disponivel_em TIMESTAMP",
+    # Só os jobs abertos entram no índice: a reivindicação não varre o histórico de rodadas
+    "CREATE INDEX IF NOT EXISTS idx_fila_abertos ON fila_coleta (id) WHERE estado IN ('pendente', 'em_andamento')",
+    "CREATE INDEX IF NOT EXISTS idx_fila_rodada ON fila_coleta (rodada_id, estado)",
+]
+
+COLUNAS_JOB = ["rodada_id", "produto_base", "categoria", "loja", "url"]
+
+SQL_INSERIR_JOBS = f"""
+    INSERT INTO fila_coleta ({", ".join(COLUNAS_JOB)}) VALUES %s
+    ON CONFLICT (rodada_id, produto_base, loja) DO NOTHING
+"""
+
+SQL_REIVINDICAR = text("""
+    WITH livres AS (
+        SELECT id FROM fila_coleta
+        WHERE (estado = 'pendente' AND (disponivel_em IS NULL OR disponivel_em <= NOW()))
+           OR (estado = 'em_andamento' AND lease_ate < NOW() AND tentativas < :maximo)
+        ORDER BY id
+        LIMIT :lote
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE fila_coleta f SET
+        estado = 'em_andamento', worker = :worker, tentativas = f.tentativas + 1,
+        lease_ate = NOW() + :lease * INTERVAL '1 second', iniciada_em = NOW()
+    FROM livres
+    WHERE f.id = livres.id
+    RETURNING f.id, f.rodada_id, f.produto_base, f.categoria, f.loja, f.url, f.tentativas
+""")
+
+# Lease vencido de novo depois de MAX_TENTATIVAS: a página provavelmente derruba o worker
+SQL_DESISTIR = text("""
+    UPDATE fila_coleta SET estado = 'falhou', concluida_em = NOW(), lease_ate = NULL,
+        erro = 'lease vencido ' || tentativas || 'x (worker parou no meio?)'
+    WHERE estado = 'em_andamento' AND lease_ate < NOW() AND tentativas >= :maximo
+""")
+
+SQL_RENOVAR = text("""
+    UPDATE fila_coleta SET lease_ate = NOW() + :lease * INTERVAL '1 second'
+    WHERE id IN :ids AND worker = :worker AND estado = 'em_andamento'
+""").bindparams(bindparam('ids', expanding=True))
+
+SQL_MEUS = text("""
+    SELECT id FROM fila_coleta
+    WHERE id IN :ids AND worker = :worker AND estado = 'em_andamento'
+    FOR UPDATE
+""").bindparams(bindparam('ids', expanding=True))
+
+SQL_REGISTRAR = text("""
+    UPDATE fila_coleta SET estado = :estado, erro = :erro, concluida_em = NOW(), lease_ate = NULL
+    WHERE id = :id
+""")
+
+SQL_DEVOLVER = text("""
+    UPDATE fila_coleta SET
+        estado = CASE WHEN tentativas >= :maximo THEN 'falhou' ELSE 'pendente' END,
+        concluida_em = CASE WHEN tentativas >= :maximo THEN NOW() END,
+        disponivel_em = NOW() + :espera * POWER(2, GREATEST(tentativas - 1, 0)) * INTERVAL '1 second',
+        lease_ate = NULL, erro = :erro
+    WHERE id IN :ids AND worker = :worker AND estado = 'em_andamento'
+    RETURNING estado
+""").bindparams(bindparam('ids', expanding=True))
+
+SQL_FECHAR_RODADA = text("""
+    UPDATE fila_rodadas r SET concluida_em = NOW(), fechada_por = :worker
+    WHERE r.id = :rodada AND r.concluida_em IS NULL
+      AND NOT EXISTS (SELECT 1 FROM fila_coleta f
+                      WHERE f.rodada_id = r.id AND f.estado IN ('pendente', 'em_andamento'))
+    RETURNING r.id
+""")
+
+def criar_rodada(conn, tarefas, modo="produto"):
+    """Cria a rodada e um job por tarefa ({produto_base, categoria, loja, url}); retorna o id da rodada."""
+    rodada = conn.execute(text("INSERT INTO fila_rodadas (modo, total) VALUES (:modo, :total) RETURNING id"),
+                          {"modo": modo, "total": len(tarefas)}).scalar_one()
+    registros = [dict({c: tarefa.get(c) for c in COLUNAS_JOB[1:]}, rodada_id=rodada) for tarefa in tarefas]
+    executar_em_lote(conn, SQL_INSERIR_JOBS, COLUNAS_JOB, registros)
+    return rodada
+
+def rodadas_abertas(conn):
+    return conn.execute(text("SELECT id FROM fila_rodadas WHERE concluida_em IS NULL ORDER BY id")).scalars().all()
+
+def jobs_abertos(conn):
+    """Jobs pendentes ou em andamento em qualquer rodada."""
+    return conn.execute(text("SELECT COUNT(*) FROM fila_coleta WHERE estado IN ('pendente', 'em_andamento')")).scalar_one()
+
+def desistir_vencidos(conn, maximo=MAX_TENTATIVAS):
+    return conn.execute(SQL_DESISTIR, {"maximo": maximo}).rowcount
+
+def reivindicar(conn, worker, lote=LOTE, lease=LEASE, maximo=MAX_TENTATIVAS):
+    """Até `lote` jobs livres (pendentes ou com lease vencido), já marcados como deste worker, em ordem de id."""
+    linhas = conn.execute(SQL_REIVINDICAR, {"worker": worker, "lote": lote, "lease": lease, "maximo": maximo}).mappings().all()
+    return sorted((dict(linha) for linha in linhas), key=lambda job: job["id"])
+
+def renovar(conn, worker, ids, lease=LEASE):
+    return conn.execute(SQL_RENOVAR, {"worker": worker, "ids": list(ids), "lease": lease}).rowcount
+
+def meus(conn, worker, ids):
+    """Ids que ainda são deste worker, travados até o fim da transação (outro worker não os assume no meio)."""
+    return set(conn.execute(SQL_MEUS, {"worker": worker, "ids": list(ids)}).scalars().all())
+
+def registrar_resultados(conn, resultados):
+    """Fecha os jobs: `resultados` = [{id, estado (concluida|falhou|pulada), erro}]."""
+    if resultados: conn.execute(SQL_REGISTRAR, resultados)
+
+def devolver(conn, worker, ids, erro, maximo=MAX_TENTATIVAS, espera=ESPERA_DEVOLVIDO):
+    """Devolve à fila os jobs deste worker (erro no lote, página sem dados): qualquer worker pega
+    depois da espera exponencial, sem esperar o lease.
+
+    Os que já foram reivindicados `maximo` vezes ficam "falhou" com `erro`; retorna (devolvidos, desistidos).
+    """
+    params = {"worker": worker, "ids": list(ids), "erro": erro, "maximo": maximo, "espera": espera}
+    estados = conn.execute(SQL_DEVOLVER, params).scalars().all()
+    return estados.count("pendente"), estados.count("falhou")
+
+def fechar_rodada(conn, rodada, worker):
+    """Marca a rodada como concluída se não tiver jobs abertos; True só para o worker que conseguiu."""
+    return conn.execute(SQL_FECHAR_RODADA, {"rodada": rodada, "worker": worker}).first() is not None
+
+class RenovadorLease(threading.Thread):
+    """Renova o lease dos jobs de um lote a cada LEASE/3 segundos enquanto a coleta roda."""
+
+    def __init__(self, engine, worker, ids, lease=LEASE):
+        super().__init__(daemon=True, name="renovador-lease")
+        self.engine, self.worker, self.ids, self.lease = engine, worker, list(ids), lease
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(max(1.0, self.lease / 3)):
+            try:
+                with self.engine.begin() as conn: renovar(conn, self.worker, self.ids, self.lease)
+            except Exception as e:
+                # Sem renovar, o lease vence e o job volta para a fila: nada se perde
+                print(f"  -> [Fila] Falha ao renovar lease: {type(e).__name__}: {e}")
+
+    def parar(self):
+        self._parar.set()
+        self.join()
+
+# --- RESUMO DA RODADA ---
+def resumo_rodada(conn, rodada=None):
+    """Contagens por estado, loja e worker, retomadas (jobs reivindicados mais de uma vez) e tempo total."""
+    if rodada is None:
+        rodada = conn.execute(text("SELECT MAX(id) FROM fila_rodadas")).scalar_one()
+        if rodada is None: return None
+    cabecalho = conn.execute(text("""
+        SELECT r.id, r.total, r.criada_em, r.concluida_em, r.fechada_por,
+               MIN(f.iniciada_em) AS inicio, MAX(f.concluida_em) AS fim,
+               COALESCE(SUM(GREATEST(f.tentativas - 1, 0)), 0) AS retomadas
+        FROM fila_rodadas r LEFT JOIN fila_coleta f ON f.rodada_id = r.id
+        WHERE r.id = :rodada GROUP BY r.id
+    """), {"rodada": rodada}).mappings().first()
+    if cabecalho is None: return None
+    por_loja = conn.execute(text("""
+        SELECT loja, estado, COUNT(*) FROM fila_coleta WHERE rodada_id = :rodada GROUP BY loja, estado
+    """), {"rodada": rodada}).all()
+    por_worker = conn.execute(text("""
+        SELECT worker, COUNT(*) FROM fila_coleta
+        WHERE rodada_id = :rodada AND estado IN ('concluida', 'falhou', 'pulada') AND worker IS NOT NULL
+        GROUP BY worker
+    """), {"rodada": rodada}).all()
+
+    estados, lojas = {}, {}
+    for loja, estado, quantidade in por_loja:
+        estados[estado] = estados.get(estado, 0) + quantidade
+        lojas.setdefault(loja, {})[estado] = quantidade
+    duracao = (cabecalho["fim"] - cabecalho["inicio"]).total_seconds() if cabecalho["inicio"] and cabecalho["fim"] else 0.0
+    finalizados = sum(estados.get(e, 0) for e in ESTADOS_FINAIS)
+    return {
+        "rodada": cabecalho["id"], "total": cabecalho["total"],
+        "criada_em": cabecalho["criada_em"].isoformat(timespec="seconds"),
+        "concluida_em": cabecalho["concluida_em"].isoformat(timespec="seconds") if cabecalho["concluida_em"] else None,
+        "fechada_por": cabecalho["fechada_por"],
+        "estados": estados, "lojas": lojas, "workers": dict(por_worker),
+        "retomadas": int(cabecalho["retomadas"]),
+        "duracao_s": round(duracao, 2),
+        "jobs_por_minuto": round(finalizados / duracao * 60, 1) if duracao > 0 else 0.0,
+    }
+
+def imprimir_resumo(resumo):
+    if resumo is None:
+        print("Nenhuma rodada na fila.")
+        return
+    e = resumo["estados"]
+    situacao = f"concluída em {resumo['concluida_em']} por {resumo['fechada_por']}" if resumo["concluida_em"] else "aberta"
+    print(f"\n=== RODADA {resumo['rodada']} ({situacao}): {e.get('concluida', 0)}/{resumo['total']} páginas ok, "
+          f"{e.get('falhou', 0)} falhas, {e.get('pulada', 0)} puladas, "
+          f"{e.get('pendente', 0) + e.get('em_andamento', 0)} abertas ===")
+    print(f"  {resumo['duracao_s']}s do primeiro job ao último ({resumo['jobs_por_minuto']} jobs/min), "
+          f"{resumo['retomadas']} jobs retomados depois de lease vencido/devolvido")
+    for loja, st in sorted(resumo["lojas"].items()):
+        print(f"  {loja:<10} {st.get('concluida', 0):>4} ok / {st.get('falhou', 0):>4} falhas / {st.get('pulada', 0):>4} puladas")
+    for worker, quantidade in sorted(resumo["workers"].items()):
+        print(f"  worker {worker}: {quantidade} jobs")
@@ -0,0 +1,141 @@
+# meu_comparador_backend/historico.py (v1.3 - Primeiro Dia Bruto Calculado uma Vez por Produto)
+#
+# O scraper roda várias vezes ao dia; o gráfico só precisa de um ponto por período.
+# O recorte (produto, intervalo, loja) é feito em SQL e a agregação por balde
+# (hora/dia/semana) é vetorizada em pandas: min/max dos preços válidos e o último preço.
+# Os meses que a retenção já tirou de `precos` vêm de `precos_diario` (particoes.py): cada
+# dia consolidado vira até três linhas (mínimo e máximo à meia-noite, último no horário
+# real), que a agregação trata como linhas brutas. Nesses dias o balde 'hour' só tem esses
+# pontos.
+# `carregar_historicos`/`agregar_historicos` fazem o mesmo para uma lista de produtos com uma
+# consulta e um groupby só (rota de lote /api/products/batch).
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+BALDES = {
+    'hour': ('h', '%Y-%m-%dT%H:00'),
+    'day': ('D', '%Y-%m-%d'),
+    'week': ('W-SUN', '%Y-%m-%d'),  # semana começando na segunda-feira
+}
+
+def ler_intervalo(args):
+    """Lê from/to/bucket/store dos query params. Levanta ValueError com mensagem para o cliente."""
+    bucket = (args.get('bucket') or 'day').strip().lower()
+    if bucket not in BALDES: raise ValueError(f"bucket deve ser um de: {', '.join(BALDES)}")
+    intervalo = {'bucket': bucket, 'inicio': None, 'fim': None, 'loja': (args.get('store') or '').strip() or None}
+    for param, chave in (('from', 'inicio'), ('to', 'fim')):
+        if args.get(param):
+            try: intervalo[chave] = pd.Timestamp(args[param]).to_pydatetime()
+            except (ValueError, TypeError): raise ValueError(f"{param} deve ser uma data ISO (ex.: 2025-01-31)")
+    # 'to' só com data inclui o dia inteiro
+    if intervalo['fim'] is not None and len(args.get('to', '')) <= 10:
+        intervalo['fim'] = intervalo['fim'] + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    return intervalo
+
+# Só os dias anteriores à primeira linha bruta do produto (um dia nunca conta duas vezes);
+# o primeiro dia de cada produto sai de um GROUP BY só, não de uma subconsulta por dia consolidado
+SQL_DIARIO = """
+    WITH primeiros AS (
+        SELECT produto_base, MIN(timestamp)::date AS primeiro_dia FROM precos
+        WHERE produto_base IN :produtos GROUP BY produto_base
+    )
+    SELECT d.produto_base, d.dia, d.loja, d.preco_min, d.preco_max, d.preco_ultimo, d.ts_ultimo FROM precos_diario d
+    LEFT JOIN primeiros f ON f.produto_base = d.produto_base
+    WHERE d.produto_base IN :produtos
+      AND d.dia < COALESCE(f.primeiro_dia, DATE '9999-12-31')
+"""
+
+def _filtros(inicio, fim, loja, coluna_data, inicio_valor, fim_valor):
+    sql, params = "", {}
+    if inicio is not None: sql += f" AND {coluna_data} >= :inicio"; params['inicio'] = inicio_valor
+    if fim is not None: sql += f" AND {coluna_data} <= :fim"; params['fim'] = fim_valor
+    if loja is not None: sql += " AND loja = :loja"; params['loja'] = loja
+    return sql, params
+
+def _linhas_consolidadas(engine, produtos, inicio, fim, loja):
+    filtro, params = _filtros(inicio, fim, loja, 'd.dia', inicio and inicio.date(), fim and fim.date())
+    consulta = text(SQL_DIARIO + filtro).bindparams(bindparam('produtos', expanding=True))
+    try:
+        diario = pd.read_sql(consulta, engine, params=dict(params, produtos=list(produtos)))
+    except Exception:
+        return None  # sem precos_diario (antes da migração de partições ou fora do Postgres)
+    if diario.empty: return None
+
+    dia = pd.to_datetime(diario['dia'])
+    partes = [pd.DataFrame({'produto_base': diario['produto_base'], 'timestamp': dia, 'preco': diario[coluna],
+                            'loja': diario['loja']})[diario[coluna].notna()]
+              for coluna in ('preco_min', 'preco_max')]
+    partes.append(pd.DataFrame({'produto_base': diario['produto_base'], 'timestamp': pd.to_datetime(diario['ts_ultimo']),
+                                'preco': diario['preco_ultimo'], 'loja': diario['loja']}))
+    return pd.concat(partes, ignore_index=True)
+
+def carregar_historicos(engine, produtos, inicio=None, fim=None, loja=None):
+    """Linhas (produto_base, timestamp, preco, loja) de vários produtos numa consulta (bruto + consolidado)."""
+    produtos = list(produtos)
+    filtro, params = _filtros(inicio, fim, loja, 'timestamp', inicio, fim)
+    consulta = text("SELECT produto_base, timestamp, preco, loja FROM precos WHERE produto_base IN :produtos" + filtro)
+    df = pd.read_sql(consulta.bindparams(bindparam('produtos', expanding=True)), engine, params=dict(params, produtos=produtos))
+    consolidadas = _linhas_consolidadas(engine, produtos, inicio, fim, loja)
+    if consolidadas is not None: df = pd.concat([consolidadas, df], ignore_index=True)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df['preco'] = pd.to_numeric(df['preco'], errors='coerce').fillna(0.0)
+    return df
+
+def carregar_historico(engine, produto_base, inicio=None, fim=None, loja=None):
+    """Linhas (timestamp, preco, loja) de um produto, já recortadas no banco (bruto + consolidado)."""
+    return carregar_historicos(engine, [produto_base], inicio, fim, loja)
+
+def _pontos(df, bucket, chaves):
+    """min/max dos preços válidos e último preço por (chaves..., período, loja), ordenado."""
+    freq, formato = BALDES[bucket]
+    df = df.sort_values('timestamp', kind='mergesort')
+    periodo = df['timestamp'].dt.to_period(freq).dt.start_time
+    validos = df['preco'].where(df['preco'] > 0)
+    agrupado = df.assign(periodo=periodo, valido=validos).groupby(chaves + ['periodo', 'loja'], sort=True)
+    pontos = agrupado.agg(min=('valido', 'min'), max=('valido', 'max'), last=('preco', 'last')).reset_index()
+    return pontos, formato
+
+def _formatar_pontos(pontos, formato):
+    datas = pontos['periodo'].dt.strftime(formato).tolist()
+    minimos = pontos['min'].astype(object).where(pontos['min'].notna(), None).tolist()
+    maximos = pontos['max'].astype(object).where(pontos['max'].notna(), None).tolist()
+    ultimos = pontos['last'].astype(float).tolist()
+    return [{
+        "date": data,
+        "price": ultimo,
+        "loja": loja,
+        "min": None if minimo is None else float(minimo),
+        "max": None if maximo is None else float(maximo),
+        "inStock": ultimo > 0,
+    } for data, loja, minimo, maximo, ultimo in zip(datas, pontos['loja'].tolist(), minimos, maximos, ultimos)]
+
+def agregar_historico(df, bucket='day'):
+    """Um ponto por (período, loja): min/max dos preços > 0 e o último preço do período.
+
+    Cada ponto mantém as chaves antigas de priceHistory ("date", "price", "loja"), com
+    "price" = último preço do período, e acrescenta "min", "max" e "inStock".
+    """
+    if df is None or df.empty: return []
+    return _formatar_pontos(*_pontos(df, bucket, []))
+
+def agregar_historicos(df, bucket='day'):
+    """{produto_base: pontos de agregar_historico} para o histórico de vários produtos, num groupby só."""
+    if df is None or df.empty: return {}
+    pontos, formato = _pontos(df, bucket, ['produto_base'])
+    formatados = _formatar_pontos(pontos, formato)
+    produtos = pontos['produto_base'].to_numpy()
+    inicios = np.flatnonzero(np.r_[True, produtos[1:] != produtos[:-1]])
+    fins = np.r_[inicios[1:], len(produtos)]
+    return {produtos[ini]: formatados[ini:fim] for ini, fim in zip(inicios.tolist(), fins.tolist())}
+
+def historico_bruto(df):
+    """{produto_base: [{"date", "price", "loja"}]} com todas as linhas (?history=raw), por data."""
+    if df is None or df.empty: return {}
+    linhas = df.sort_values('timestamp', kind='mergesort')[['produto_base', 'timestamp', 'preco', 'loja']].drop_duplicates()
+    resultado = {}
+    for produto, data, preco, loja in zip(linhas['produto_base'].tolist(), linhas['timestamp'].dt.strftime('%Y-%m-%d').tolist(),
+                                          linhas['preco'].astype(float).tolist(), linhas['loja'].tolist()):
+        resultado.setdefault(produto, []).append({"date": data, "price": preco, "loja": loja})
+    return resultado
@@ -0,0 +1,182 @@
+# meu_comparador_backend/imagens.py (v1.1 - Índice com Trava entre Processos)
+#
+# `imagem_url` aponta para as imagens de zoom das lojas (Kabum _gg.jpg, Pichau iiz__img,
+# Terabyte zoomImg): vários MB por página de listagem, vindos de hosts de terceiros, e a
+# imagem quebra quando a loja troca a URL. O scraper baixa cada imagem_url nova uma vez e
+# grava as variantes em WebP num cache no disco:
+#
+#   IMAGENS_DIR/conteudo/<ab>/<sha256 do arquivo original>-<tamanho>.webp   (endereçado por conteúdo:
+#                                                                          a mesma imagem em duas URLs
+#                                                                          é gravada uma vez)
+#   IMAGENS_DIR/indice.tsv    uma linha por URL: "<hash da URL>\t<sha256 do conteúdo>\t<URL>"
+#
+# O índice só recebe a linha depois que as variantes estão no disco, então quem lê o índice
+# sempre encontra os arquivos. Vários processos (workers da fila) acrescentam ao mesmo índice:
+# cada acréscimo é feito com flock exclusivo, para as linhas de dois workers não se misturarem. O app serve /api/image/<hash da URL>?size=list|detail e troca
+# "image" dos payloads por essa rota quando a imagem está no cache (a URL da loja continua em
+# "imageOriginal"). O scraper e o app precisam enxergar a mesma IMAGENS_DIR.
+#
+# Variáveis de ambiente:
+#   IMAGENS_DIR (pasta "imagens_cache" ao lado deste arquivo), IMAGENS_QUALIDADE (80),
+#   IMAGENS_CONCORRENCIA (4), IMAGENS_MAX_POR_RODADA (300), IMAGENS_MAX_BYTES (10 MB)
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos (um scraper por vez)
+    fcntl = None
+
+from config import env_int
+
+DIRETORIO = os.environ.get("IMAGENS_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "imagens_cache")
+QUALIDADE = env_int("IMAGENS_QUALIDADE", 80)
+CONCORRENCIA = env_int("IMAGENS_CONCORRENCIA", 4)
+MAX_POR_RODADA = env_int("IMAGENS_MAX_POR_RODADA", 300)
+MAX_BYTES = env_int("IMAGENS_MAX_BYTES", 10 * 1024 * 1024)
+TIMEOUT = 20
+
+# Lado maior de cada variante, em pixels (imagem menor que isso não é ampliada)
+TAMANHOS = {"list": 320, "detail": 800}
+
+def hash_url(url):
+    return hashlib.sha256(url.strip().encode("utf-8")).hexdigest()[:32]
+
+def caminho_variante(conteudo, tamanho, diretorio=DIRETORIO):
+    return os.path.join(diretorio, "conteudo", conteudo[:2], f"{conteudo}-{tamanho}.webp")
+
+class IndiceImagens:
+    """indice.tsv em memória (hash da URL -> conteúdo, URL -> hash), relido quando o arquivo muda.
+
+    Cada worker do app mantém um; a checagem custa um stat por chamada de `atualizar`.
+    """
+
+    def __init__(self, diretorio=DIRETORIO):
+        self.caminho = os.path.join(diretorio, "indice.tsv")
+        self._assinatura = None
+        self._por_hash, self._por_url = {}, {}
+        self._lock = threading.Lock()
+
+    def atualizar(self):
+        try:
+            st = os.stat(self.caminho)
+            assinatura = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            self._por_hash, self._por_url, self._assinatura = {}, {}, None
+            return self
+        if assinatura != self._assinatura:
+            with self._lock:
+                if assinatura != self._assinatura:
+                    por_hash = ler_indice(self.caminho)
+                    self._por_url = {url: chave for chave, (_, url) in por_hash.items()}
+                    self._por_hash, self._assinatura = por_hash, assinatura
+        return self
+
+    def conteudo(self, chave):
+        """sha256 do conteúdo da imagem com esse hash de URL, ou None se não estiver no cache."""
+        item = self._por_hash.get(chave)
+        return item[0] if item else None
+
+    def hash_da_url(self, url):
+        return self._por_url.get(url.strip()) if url else None
+
+def ler_indice(caminho):
+    """{hash da URL: (sha256 do conteúdo, URL)}."""
+    indice = {}
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                # Linha sem \n é uma gravação em andamento
+                if not linha.endswith("\n"): break
+                partes = linha.rstrip("\n").split("\t")
+                if len(partes) >= 3: indice[partes[0]] = (partes[1], partes[2])
+    except OSError:
+        pass
+    return indice
+
+def gerar_variantes(dados):
+    """{tamanho: bytes WebP} a partir da imagem original (qualquer formato que o Pillow abra)."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(dados)) as original:
+        original.load()
+        modo = "RGBA" if original.mode in ("RGBA", "LA", "P") else "RGB"
+        imagem = original.convert(modo)
+    variantes = {}
+    for tamanho, lado in TAMANHOS.items():
+        copia = imagem.copy()
+        copia.thumbnail((lado, lado), Image.LANCZOS)
+        saida = io.BytesIO()
+        copia.save(saida, "WEBP", quality=QUALIDADE, method=4)
+        variantes[tamanho] = saida.getvalue()
+    return variantes
+
+def _gravar_atomico(caminho, dados):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    fd, temporario = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(caminho))
+    with os.fdopen(fd, "wb") as f: f.write(dados)
+    os.chmod(temporario, 0o644)
+    os.replace(temporario, caminho)
+
+def armazenar(dados, diretorio=DIRETORIO):
+    """Grava as variantes de `dados` (se ainda não existirem) e devolve o sha256 do conteúdo."""
+    conteudo = hashlib.sha256(dados).hexdigest()
+    if all(os.path.isfile(caminho_variante(conteudo, t, diretorio)) for t in TAMANHOS): return conteudo
+    for tamanho, webp in gerar_variantes(dados).items():
+        _gravar_atomico(caminho_variante(conteudo, tamanho, diretorio), webp)
+    return conteudo
+
+def baixar(sessao, url):
+    resp = sessao.get(url, timeout=TIMEOUT, stream=True)
+    resp.raise_for_status()
+    dados = bytearray()
+    for pedaco in resp.iter_content(64 * 1024):
+        dados.extend(pedaco)
+        if len(dados) > MAX_BYTES: raise ValueError(f"imagem maior que {MAX_BYTES} bytes")
+    return bytes(dados)
+
+def acrescentar_indice(caminho, linhas):
+    """Acrescenta `linhas` ao índice com trava exclusiva (outros processos esperam o acréscimo inteiro)."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "a", encoding="utf-8") as f:
+        if fcntl: fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(linhas)
+            f.flush()
+        finally:
+            if fcntl: fcntl.flock(f, fcntl.LOCK_UN)
+
+def atualizar_cache(sessao, urls, diretorio=DIRETORIO, limite=MAX_POR_RODADA):
+    """Baixa e converte as URLs que ainda não estão no índice; retorna (novas, falhas, pendentes).
+
+    No máximo `limite` downloads por rodada: o resto fica para as próximas (o catálogo
+    inicial entra aos poucos, sem alongar a rodada do scraper).
+    """
+    conhecidas = ler_indice(os.path.join(diretorio, "indice.tsv"))
+    novas = {}
+    for url in urls:
+        if url and url.startswith(("http://", "https://")) and hash_url(url) not in conhecidas:
+            novas.setdefault(hash_url(url), url.strip())
+    fila = list(novas.items())
+    lote = fila[:limite] if limite > 0 else fila
+    pendentes = len(fila) - len(lote)
+
+    def processar(item):
+        chave, url = item
+        try:
+            return chave, url, armazenar(baixar(sessao, url), diretorio)
+        except Exception as e:
+            print(f"  -> imagem falhou ({url[:80]}): {type(e).__name__}: {e}")
+            return chave, url, None
+
+    with ThreadPoolExecutor(max_workers=max(1, CONCORRENCIA), thread_name_prefix="imagens") as executor:
+        resultados = list(executor.map(processar, lote))
+    linhas = "".join(f"{chave}\t{conteudo}\t{url}\n" for chave, url, conteudo in resultados if conteudo)
+    if linhas: acrescentar_indice(os.path.join(diretorio, "indice.tsv"), linhas)
+    gravadas = sum(1 for *_, conteudo in resultados if conteudo)
+    return gravadas, len(resultados) - gravadas, pendentes
@@ -0,0 +1,51 @@
+# meu_comparador_backend/manutencao_precos.py (v1.0 - Manutenção Diária de `precos`)
+#
+# Cria as partições dos próximos meses e consolida/apaga as que passaram da retenção
+# (PRECOS_RETENCAO_MESES, padrão 6). Rodar uma vez por dia (cron), depois de
+# migrate_particionar_precos.py.
+#
+# Uso:
+#   python manutencao_precos.py
+#   python manutencao_precos.py --recalcular-stats   # reconstrói precos_stats (bruto + consolidado)
+
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+from particoes import DDL_PRECOS_DIARIO, RETENCAO_MESES, aplicar_retencao, garantir_particoes, recalcular_stats
+
+def main():
+    load_dotenv()
+    db_url = get_database_url()
+    if not db_url:
+        print("ERRO: DATABASE_URL não configurada.")
+        return 1
+    engine = create_engine(db_url)
+    hoje = date.today()
+
+    try:
+        with engine.begin() as conn:
+            for ddl in DDL_PRECOS_DIARIO:
+                conn.execute(text(ddl))
+            criadas = garantir_particoes(conn, hoje)
+        print(f"Partições garantidas: {', '.join(criadas)}")
+
+        print(f"Aplicando retenção de {RETENCAO_MESES} meses...")
+        removidas = aplicar_retencao(engine, hoje)
+        for nome, dias in removidas:
+            print(f"  -> {nome}: {dias} dias (produto/loja) consolidados em precos_diario e apagados")
+        if not removidas: print("  -> Nenhuma partição passou da retenção.")
+
+        if "--recalcular-stats" in sys.argv[1:]:
+            with engine.begin() as conn: recalcular_stats(conn)
+            print("precos_stats reconstruída.")
+    except Exception as e:
+        print(f"Erro na manutenção: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
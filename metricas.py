@@ -0,0 +1,140 @@
+# meu_comparador_backend/metricas.py (v1.0 - Contadores e Histogramas no Formato Prometheus)
+#
+# Implementação mínima (sem dependência nova) de contadores e histogramas com rótulos,
+# exportados no formato texto do Prometheus (GET /metrics no app) ou como dict (arquivo de
+# métricas de cada rodada do scraper). As métricas são por processo: com vários workers do
+# gunicorn cada um responde com os próprios números.
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Em segundos: de 1 ms (leituras em cache) até 60 s (páginas via Selenium)
+BALDES_PADRAO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _rotulos_texto(nomes, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra: pares.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+def _numero(valor):
+    if valor == float('inf'): return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def linhas(self):
+        with self._lock: itens = sorted(self._valores.items())
+        return [f"{self.nome}{_rotulos_texto(self.rotulos, chave)} {_numero(v)}" for chave, v in itens]
+
+    def como_dict(self):
+        with self._lock:
+            return [dict(zip(self.rotulos, chave), valor=v) for chave, v in sorted(self._valores.items())]
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, rotulos=(), baldes=BALDES_PADRAO):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.baldes = tuple(sorted(baldes))
+        self._series = {}  # chave -> [contagens por balde..., soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(str(rotulos.get(r, "")) for r in self.rotulos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * len(self.baldes) + [0.0, 0]
+            for i, limite in enumerate(self.baldes):
+                if valor <= limite: serie[i] += 1
+            serie[-2] += valor
+            serie[-1] += 1
+
+    @contextmanager
+    def cronometro(self, **rotulos):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def linhas(self):
+        with self._lock: itens = sorted((k, list(v)) for k, v in self._series.items())
+        saida = []
+        for chave, serie in itens:
+            for limite, contagem in zip(self.baldes + (float('inf'),), serie[:len(self.baldes)] + [serie[-1]]):
+                saida.append(f"{self.nome}_bucket{_rotulos_texto(self.rotulos, chave, ('le', _numero(limite)))} {contagem}")
+            saida.append(f"{self.nome}_sum{_rotulos_texto(self.rotulos, chave)} {_numero(serie[-2])}")
+            saida.append(f"{self.nome}_count{_rotulos_texto(self.rotulos, chave)} {serie[-1]}")
+        return saida
+
+    def como_dict(self):
+        with self._lock: itens = sorted((k, list(v)) for k, v in self._series.items())
+        return [dict(zip(self.rotulos, chave), total=serie[-1], soma_s=round(serie[-2], 4),
+                     media_s=round(serie[-2] / serie[-1], 4) if serie[-1] else 0.0)
+                for chave, serie in itens]
+
+class Medidor:
+    """Valor lido na hora da exportação (ex.: estatísticas do pool ou do cache)."""
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, ler):
+        self.nome, self.ajuda, self._ler = nome, ajuda, ler
+
+    def linhas(self):
+        try: valor = self._ler()
+        except Exception: return []
+        return [] if valor is None else [f"{self.nome} {_numero(valor)}"]
+
+    def como_dict(self):
+        linhas = self.linhas()
+        return [{"valor": float(linhas[0].split()[-1])}] if linhas else []
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.nome, metrica)
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador(nome, ajuda, rotulos))
+
+    def histograma(self, nome, ajuda, rotulos=(), baldes=BALDES_PADRAO):
+        return self._registrar(Histograma(nome, ajuda, rotulos, baldes))
+
+    def medidor(self, nome, ajuda, ler):
+        return self._registrar(Medidor(nome, ajuda, ler))
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        with self._lock: metricas = list(self._metricas.values())
+        saida = []
+        for m in metricas:
+            saida.append(f"# HELP {m.nome} {m.ajuda}")
+            saida.append(f"# TYPE {m.nome} {m.tipo}")
+            saida.extend(m.linhas())
+        return "\n".join(saida) + "\n"
+
+    def como_dict(self):
+        with self._lock: metricas = list(self._metricas.values())
+        return {m.nome: m.como_dict() for m in metricas}
+
+registro = Registro()
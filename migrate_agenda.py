@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from agenda import DDL_AGENDA, VOLATILIDADE_INICIAL
+from database import get_database_url
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Criando 'agenda_coleta'...")
+            for ddl in DDL_AGENDA:
+                conn.execute(text(ddl))
+
+            # Volatilidade inicial = fração das coletas dos últimos 30 dias em que o preço mudou.
+            # proxima_coleta fica NULL: tudo vence na primeira rodada e a agenda se ajusta a partir dela.
+            print("Semeando a agenda a partir de precos_atual e do histórico de 30 dias...")
+            resultado = conn.execute(text("""
+                WITH serie AS (
+                    SELECT produto_base, loja, timestamp,
+                           CASE WHEN LAG(preco) OVER w IS NULL THEN NULL
+                                WHEN ABS(preco - LAG(preco) OVER w) > 0.005 THEN 1.0 ELSE 0.0 END AS mudou
+                    FROM precos
+                    WHERE timestamp >= NOW() - INTERVAL '30 days'
+                    WINDOW w AS (PARTITION BY produto_base, loja ORDER BY timestamp)
+                ), volatilidade AS (
+                    SELECT produto_base, loja, AVG(mudou) AS volatilidade, COUNT(*) AS coletas,
+                           MAX(CASE WHEN mudou = 1 THEN timestamp END) AS ultima_mudanca
+                    FROM serie GROUP BY produto_base, loja
+                )
+                INSERT INTO agenda_coleta (produto_base, loja, ultimo_preco, volatilidade, coletas, ultima_coleta, ultima_mudanca)
+                SELECT a.produto_base, a.loja, a.preco, COALESCE(v.volatilidade, :inicial), COALESCE(v.coletas, 1),
+                       a.timestamp, v.ultima_mudanca
+                FROM precos_atual a
+                LEFT JOIN volatilidade v ON v.produto_base = a.produto_base AND v.loja = a.loja
+                ON CONFLICT (produto_base, loja) DO NOTHING
+            """), {"inicial": VOLATILIDADE_INICIAL})
+            print(f"  -> {resultado.rowcount} produtos/loja na agenda.")
+
+        print("Sucesso! Agenda pronta (SCRAPER_AGENDA=0 volta a coletar tudo a cada rodada).")
+
+    except Exception as e:
+        print(f"Erro: {e}")
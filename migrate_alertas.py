@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from alertas import DDL_ALERTAS
+from database import get_database_url
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Criando 'alertas_inscricoes' e a outbox 'alertas_saida'...")
+            for ddl in DDL_ALERTAS:
+                conn.execute(text(ddl))
+
+        print("Sucesso! Os alertas passam a ser avaliados a cada gravação do scraper.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
@@ -0,0 +1,35 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from cupons import DDL_CUPONS_UPSERT
+from database import get_database_url
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Removendo cupons duplicados (mantém o mais recente de cada loja/código)...")
+            conn.execute(text("""
+                DELETE FROM cupons c USING cupons d
+                WHERE c.loja IS NOT DISTINCT FROM d.loja AND c.codigo = d.codigo AND c.id < d.id;
+            """))
+
+            print("Adicionando 'ativo', 'visto_em' e o índice único (loja, codigo)...")
+            for ddl in DDL_CUPONS_UPSERT:
+                conn.execute(text(ddl))
+
+            # Cupons da Kabum vieram do scraper; passam a expirar quando sumirem do site
+            conn.execute(text("UPDATE cupons SET visto_em = timestamp WHERE loja = 'Kabum' AND visto_em IS NULL"))
+
+        print("Sucesso! Cupons prontos para o upsert do scraper.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from cupons import DDL_CUPONS_VALIDADE, interpretar_validade
+from database import get_database_url
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Adicionando 'valido_ate', 'alterado_em' e os índices...")
+            for ddl in DDL_CUPONS_VALIDADE:
+                conn.execute(text(ddl))
+
+            conn.execute(text("UPDATE cupons SET alterado_em = timestamp WHERE alterado_em IS NULL"))
+
+            # A validade é texto livre: interpreta cada cupom com a mesma regra da gravação
+            print("Interpretando 'validade' dos cupons existentes...")
+            cupons = conn.execute(text("SELECT id, validade, timestamp FROM cupons WHERE valido_ate IS NULL")).all()
+            # Datas sem ano contam a partir de quando o cupom foi gravado (SQLite devolve texto)
+            datados = [{"id": id_cupom, "valido_ate": interpretar_validade(
+                           validade, datetime.fromisoformat(momento) if isinstance(momento, str) else momento)}
+                       for id_cupom, validade, momento in cupons]
+            datados = [c for c in datados if c["valido_ate"] is not None]
+            if datados:
+                conn.execute(text("UPDATE cupons SET valido_ate = :valido_ate WHERE id = :id"), datados)
+
+        print(f"Sucesso! {len(datados)} de {len(cupons)} cupons com validade em data.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
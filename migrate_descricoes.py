@@ -0,0 +1,53 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+from descricoes import DDL_DESCRICOES, atualizar_descricoes_produtos
+
+# Roda depois de migrate_precos_atual.py. O hash é calculado no Postgres (sha256 do texto em
+# UTF-8), o mesmo valor que descricoes.hash_descricao gera no scraper.
+HASH_SQL = "encode(sha256(convert_to(descricao, 'UTF8')), 'hex')"
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Criando tabelas 'descricoes' e 'produtos_descricao'...")
+            for ddl in DDL_DESCRICOES:
+                conn.execute(text(ddl))
+            conn.execute(text("ALTER TABLE precos ADD COLUMN IF NOT EXISTS descricao_hash CHAR(64)"))
+            conn.execute(text("ALTER TABLE precos_atual ADD COLUMN IF NOT EXISTS descricao_hash CHAR(64)"))
+
+            print("Copiando cada descrição distinta de 'precos' para 'descricoes'...")
+            conn.execute(text(f"""
+                INSERT INTO descricoes (hash, conteudo, tamanho)
+                SELECT DISTINCT ON (h) h, descricao, LENGTH(BTRIM(descricao, E' \\t\\r\\n'))
+                FROM (SELECT {HASH_SQL} AS h, descricao FROM precos WHERE descricao IS NOT NULL AND descricao <> '') d
+                ON CONFLICT (hash) DO NOTHING;
+            """))
+
+            print("Trocando o HTML pelo hash em 'precos' e 'precos_atual'...")
+            for tabela in ("precos", "precos_atual"):
+                conn.execute(text(f"""
+                    UPDATE {tabela} SET descricao_hash = {HASH_SQL}, descricao = NULL
+                    WHERE descricao IS NOT NULL AND descricao <> '';
+                """))
+                conn.execute(text(f"UPDATE {tabela} SET descricao = NULL WHERE descricao = ''"))
+
+            print("Escolhendo a descrição exibida de cada produto...")
+            produtos = [r[0] for r in conn.execute(text("SELECT DISTINCT produto_base FROM precos_atual"))]
+            for i in range(0, len(produtos), 500):
+                atualizar_descricoes_produtos(conn, produtos[i:i + 500])
+
+        print("Sucesso! Descrições deduplicadas. Rode 'VACUUM FULL precos' para devolver o espaço ao disco.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
@@ -0,0 +1,26 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+from fila import DDL_FILA
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Criando 'fila_rodadas', 'fila_coleta' e os índices...")
+            for ddl in DDL_FILA:
+                conn.execute(text(ddl))
+
+        print("Sucesso! Rode `python worker.py --enfileirar` e depois quantos `python worker.py` quiser.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
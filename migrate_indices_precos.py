@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+# CREATE INDEX CONCURRENTLY não pode rodar dentro de transação: usa AUTOCOMMIT
+# para não travar as gravações do scraper enquanto o índice é construído.
+INDICES = [
+    ("idx_precos_produto_loja_ts",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_precos_produto_loja_ts ON precos (produto_base, loja, timestamp DESC)"),
+    ("idx_precos_categoria",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_precos_categoria ON precos (categoria)"),
+    ("idx_precos_atual_categoria",
+     "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_precos_atual_categoria ON precos_atual (categoria)"),
+]
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL, isolation_level="AUTOCOMMIT")
+
+        with engine.connect() as conn:
+            for nome, ddl in INDICES:
+                print(f"Criando índice '{nome}'...")
+                try:
+                    conn.execute(text(ddl))
+                except Exception as e:
+                    print(f"  -> Pulado: {e}")
+            print("Atualizando estatísticas do planejador...")
+            conn.execute(text("ANALYZE precos"))
+
+        print("Sucesso! Índices de 'precos' criados.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
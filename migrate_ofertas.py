@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+from ofertas import DDL_OFERTAS, atualizar_ofertas
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+LOTE = 500
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Criando 'precos_ofertas'...")
+            for ddl in DDL_OFERTAS:
+                conn.execute(text(ddl))
+
+        with engine.connect() as conn:
+            produtos = conn.execute(text("SELECT DISTINCT produto_base FROM precos_atual ORDER BY produto_base")).scalars().all()
+
+        # Cálculo inicial em lotes (cada lote na sua transação), com o mesmo código da gravação
+        agora = datetime.now()
+        total = 0
+        for i in range(0, len(produtos), LOTE):
+            with engine.begin() as conn:
+                total += atualizar_ofertas(conn, produtos[i:i + LOTE], agora)
+            print(f"  {min(i + LOTE, len(produtos))}/{len(produtos)} produtos")
+
+        print(f"Sucesso! {total} produtos com sinais de oferta; o scraper passa a recalcular a cada gravação.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
@@ -0,0 +1,80 @@
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+from particoes import DDL_PRECOS_DIARIO, MESES_A_FRENTE, criar_particao, inicio_mes
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+# Índices de migrate_indices_precos.py, recriados na tabela particionada (valem para cada partição)
+INDICES = [
+    ("idx_precos_produto_loja_ts", "CREATE INDEX idx_precos_produto_loja_ts ON precos (produto_base, loja, timestamp DESC)"),
+    ("idx_precos_categoria", "CREATE INDEX idx_precos_categoria ON precos (categoria)"),
+]
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        # Uma transação só: o scraper espera o fim da cópia e, se algo falhar, 'precos' fica como estava
+        with engine.begin() as conn:
+            print("Criando 'precos_diario'...")
+            for ddl in DDL_PRECOS_DIARIO:
+                conn.execute(text(ddl))
+
+            tipo = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'precos' AND relkind IN ('r', 'p')")).scalar()
+            if tipo == 'p':
+                print("'precos' já é particionada; nada a converter.")
+            else:
+                print("Renomeando 'precos' para 'precos_legado'...")
+                conn.execute(text("ALTER TABLE precos RENAME TO precos_legado"))
+                for nome, _ in INDICES:
+                    conn.execute(text(f"ALTER INDEX IF EXISTS {nome} RENAME TO {nome.replace('idx_precos_', 'idx_precos_legado_')}"))
+
+                print("Criando 'precos' particionada por mês...")
+                conn.execute(text("CREATE TABLE precos (LIKE precos_legado INCLUDING DEFAULTS) PARTITION BY RANGE (timestamp)"))
+                # Sequências (ex.: id SERIAL) passam a pertencer à tabela nova, senão sumiriam com a legada
+                sequencias = conn.execute(text("""
+                    SELECT s.relname, a.attname FROM pg_depend d
+                    JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+                    JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+                    WHERE d.refobjid = 'precos_legado'::regclass
+                """)).all()
+                for sequencia, coluna in sequencias:
+                    conn.execute(text(f'ALTER SEQUENCE "{sequencia}" OWNED BY precos."{coluna}"'))
+
+                primeiro = conn.execute(text("SELECT MIN(timestamp) FROM precos_legado")).scalar()
+                hoje = date.today()
+                mes = inicio_mes(primeiro.date() if primeiro else hoje)
+                while mes <= inicio_mes(hoje, MESES_A_FRENTE):
+                    criar_particao(conn, mes)
+                    mes = inicio_mes(mes, 1)
+                conn.execute(text("CREATE TABLE IF NOT EXISTS precos_padrao PARTITION OF precos DEFAULT"))
+
+                print("Copiando as linhas...")
+                copiadas = conn.execute(text("INSERT INTO precos SELECT * FROM precos_legado")).rowcount
+                originais = conn.execute(text("SELECT COUNT(*) FROM precos_legado")).scalar()
+                if copiadas != originais:
+                    raise RuntimeError(f"cópia incompleta ({copiadas} de {originais} linhas)")
+                print(f"  -> {copiadas} linhas.")
+
+                print("Recriando índices...")
+                for _, ddl in INDICES:
+                    conn.execute(text(ddl))
+                conn.execute(text("DROP TABLE precos_legado"))
+
+        with engine.connect() as conn:
+            conn.execute(text("ANALYZE precos"))
+            conn.commit()
+
+        print("Sucesso! Agende manutencao_precos.py (diário) para criar partições e aplicar a retenção.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
@@ -0,0 +1,54 @@
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from database import get_database_url
+from estado_atual import DDL_ESTADO_ATUAL
+
+print("Carregando .env...")
+load_dotenv()
+
+DATABASE_URL = get_database_url()
+
+if not DATABASE_URL:
+    print("ERRO: DATABASE_URL não encontrada.")
+else:
+    try:
+        engine = create_engine(DATABASE_URL)
+
+        with engine.begin() as conn:
+            print("Normalizando produto_base (espaços extras)...")
+            conn.execute(text("UPDATE precos SET produto_base = TRIM(produto_base) WHERE produto_base <> TRIM(produto_base)"))
+
+            print("Criando tabelas 'precos_atual' e 'precos_stats'...")
+            for ddl in DDL_ESTADO_ATUAL:
+                conn.execute(text(ddl))
+
+            print("Preenchendo 'precos_atual' com a última linha de cada produto/loja...")
+            conn.execute(text("DELETE FROM precos_atual"))
+            conn.execute(text("""
+                INSERT INTO precos_atual (produto_base, loja, timestamp, categoria, nome_completo_raspado, preco, imagem_url, url, descricao)
+                SELECT DISTINCT ON (produto_base, loja)
+                    produto_base, loja, timestamp, categoria, nome_completo_raspado, preco, imagem_url, url, descricao
+                FROM precos
+                WHERE produto_base IS NOT NULL AND loja IS NOT NULL
+                ORDER BY produto_base, loja, timestamp DESC;
+            """))
+
+            print("Calculando 'precos_stats' (mínimo e média histórica)...")
+            conn.execute(text("DELETE FROM precos_stats"))
+            conn.execute(text("""
+                INSERT INTO precos_stats (produto_base, preco_min, preco_soma, preco_qtd, atualizado_em)
+                SELECT produto_base,
+                       MIN(preco) FILTER (WHERE preco > 0),
+                       COALESCE(SUM(preco) FILTER (WHERE preco > 0), 0),
+                       COUNT(*) FILTER (WHERE preco > 0),
+                       MAX(timestamp)
+                FROM precos
+                WHERE produto_base IS NOT NULL
+                GROUP BY produto_base;
+            """))
+
+        print("Sucesso! Tabelas de estado atual criadas e preenchidas.")
+
+    except Exception as e:
+        print(f"Erro: {e}")
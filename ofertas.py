@@ -0,0 +1,167 @@
+# meu_comparador_backend/ofertas.py (v1.0 - Qualidade da Oferta Calculada na Gravação)
+#
+# `precos_ofertas` guarda, por produto, sinais de "boa oferta" calculados pelo scraper na
+# gravação (mesma transação do append em `precos`), para a API ler e ordenar sem tocar no
+# histórico. Todos partem da série diária do melhor preço válido do produto (mínimo entre
+# as lojas no dia) dos últimos 365 dias, bruto (`precos`) + consolidado (`precos_diario`):
+#   percentil_30/90/365  % dos dias da janela em que o melhor preço foi <= o preço atual
+#                        (perto de 0 = mais barato que quase todo o período)
+#   zscore               (preço atual - média de 90 dias) / desvio padrão de 90 dias
+#   dias_desde_menor     dias desde o último dia com preço menor que o atual; NULL se não
+#                        houve menor na janela (aí vale dias_observados: "menor em N dias")
+#   spread / spread_pct  maior - menor preço entre as lojas com estoque (absoluto e relativo)
+# Tudo é vetorizado (um groupby por sinal) sobre os produtos do lote.
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from carga import executar_em_lote
+
+JANELAS = (30, 90, 365)
+JANELA_ZSCORE = 90
+TOLERANCIA = 0.005
+
+DDL_OFERTAS = [
+    """
+    CREATE TABLE IF NOT EXISTS precos_ofertas (
+        produto_base VARCHAR(200) PRIMARY KEY,
+        preco_atual FLOAT,
+        percentil_30 FLOAT,
+        percentil_90 FLOAT,
+        percentil_365 FLOAT,
+        media_90 FLOAT,
+        desvio_90 FLOAT,
+        zscore FLOAT,
+        dias_desde_menor INTEGER,
+        dias_observados INTEGER,
+        lojas_em_estoque INTEGER NOT NULL DEFAULT 0,
+        spread FLOAT,
+        spread_pct FLOAT,
+        atualizado_em TIMESTAMP
+    )
+    """,
+]
+
+COLUNAS_OFERTAS = ["produto_base", "preco_atual", "percentil_30", "percentil_90", "percentil_365", "media_90",
+                   "desvio_90", "zscore", "dias_desde_menor", "dias_observados", "lojas_em_estoque", "spread",
+                   "spread_pct", "atualizado_em"]
+
+SQL_UPSERT_OFERTAS = f"""
+    INSERT INTO precos_ofertas ({", ".join(COLUNAS_OFERTAS)}) VALUES %s
+    ON CONFLICT (produto_base) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in COLUNAS_OFERTAS[1:])}
+"""
+
+SQL_ATUAIS = text("""
+    SELECT produto_base, loja, preco FROM precos_atual WHERE produto_base IN :produtos
+""").bindparams(bindparam('produtos', expanding=True))
+# DATE() existe no Postgres e no SQLite (lá devolve texto 'AAAA-MM-DD')
+SQL_MELHOR_DIA = text("""
+    SELECT produto_base, DATE(timestamp) AS dia, MIN(preco) AS preco FROM precos
+    WHERE produto_base IN :produtos AND preco > 0 AND timestamp >= :inicio
+    GROUP BY produto_base, DATE(timestamp)
+""").bindparams(bindparam('produtos', expanding=True))
+SQL_MELHOR_DIA_CONSOLIDADO = text("""
+    SELECT produto_base, dia, MIN(preco_min) AS preco FROM precos_diario
+    WHERE produto_base IN :produtos AND preco_min > 0 AND dia >= :inicio
+    GROUP BY produto_base, dia
+""").bindparams(bindparam('produtos', expanding=True))
+
+def ler_series(conn, produtos, hoje):
+    """(estado atual por loja, melhor preço por produto e dia nos últimos 365 dias)."""
+    inicio = hoje - timedelta(days=max(JANELAS) - 1)
+    atuais = pd.DataFrame(conn.execute(SQL_ATUAIS, {"produtos": produtos}).all(), columns=['produto_base', 'loja', 'preco'])
+    partes = [pd.DataFrame(conn.execute(SQL_MELHOR_DIA, {"produtos": produtos, "inicio": inicio}).all(),
+                           columns=['produto_base', 'dia', 'preco'])]
+    try:
+        # Savepoint: sem precos_diario (antes de migrate_particionar_precos.py) segue só com o bruto
+        with conn.begin_nested():
+            partes.append(pd.DataFrame(conn.execute(SQL_MELHOR_DIA_CONSOLIDADO, {"produtos": produtos, "inicio": inicio.date()}).all(),
+                                       columns=['produto_base', 'dia', 'preco']))
+    except Exception:
+        pass
+    diario = pd.concat(partes, ignore_index=True)
+    diario['dia'] = pd.to_datetime(diario['dia'])
+    diario['preco'] = pd.to_numeric(diario['preco'], errors='coerce')
+    diario = diario.groupby(['produto_base', 'dia'], as_index=False)['preco'].min()
+    atuais['preco'] = pd.to_numeric(atuais['preco'], errors='coerce').fillna(0.0)
+    return atuais, diario
+
+def calcular_ofertas(atuais, diario, hoje):
+    """DataFrame indexado por produto_base com as colunas de precos_ofertas (sem atualizado_em)."""
+    produtos = pd.Index(atuais['produto_base'].unique(), name='produto_base')
+    validos = atuais[atuais['preco'] > 0].groupby('produto_base')['preco']
+    res = pd.DataFrame(index=produtos)
+    res['preco_atual'] = validos.min()
+    res['lojas_em_estoque'] = validos.count().reindex(produtos).fillna(0).astype(int)
+    maior = validos.max()
+    res['spread'] = (maior - res['preco_atual']).where(res['lojas_em_estoque'] > 1)
+    res['spread_pct'] = res['spread'] / res['preco_atual']
+
+    d = diario.join(res['preco_atual'], on='produto_base', how='inner')
+    d = d[d['preco_atual'].notna()]
+    idade = (pd.Timestamp(hoje).normalize() - d['dia']).dt.days.to_numpy()
+    ate_atual = (d['preco'] <= d['preco_atual'] + TOLERANCIA).astype(float)
+    for n in JANELAS:
+        janela = idade < n
+        res[f'percentil_{n}'] = ate_atual[janela].groupby(d['produto_base'][janela]).mean() * 100
+
+    janela = idade < JANELA_ZSCORE
+    stats = d['preco'][janela].groupby(d['produto_base'][janela]).agg(['mean', 'std'])
+    res['media_90'] = stats['mean']
+    res['desvio_90'] = stats['std']
+    com_desvio = res['desvio_90'] > TOLERANCIA
+    res['zscore'] = ((res['preco_atual'] - res['media_90']) / res['desvio_90']).where(com_desvio)
+
+    dias = pd.Series(idade, index=d.index)
+    menores = d['preco'] < d['preco_atual'] - TOLERANCIA
+    res['dias_desde_menor'] = dias[menores].groupby(d['produto_base'][menores]).min()
+    res['dias_observados'] = dias.groupby(d['produto_base']).max() + 1
+    return res
+
+def atualizar_ofertas(conn, produtos, momento):
+    """Recalcula e grava precos_ofertas dos `produtos` (depois de atualizar precos_atual); retorna quantos."""
+    produtos = list(produtos)
+    if not produtos: return 0
+    if isinstance(momento, pd.Timestamp): momento = momento.to_pydatetime()
+    atuais, diario = ler_series(conn, produtos, momento)
+    res = calcular_ofertas(atuais, diario, momento)
+    if res.empty: return 0
+    res = res.reset_index()[COLUNAS_OFERTAS[:-1]]
+    registros = res.astype(object).where(res.notna(), None).to_dict(orient='records')
+    for r in registros:
+        r['atualizado_em'] = momento
+        for coluna in ('dias_desde_menor', 'dias_observados', 'lojas_em_estoque'):
+            if r[coluna] is not None: r[coluna] = int(r[coluna])
+    executar_em_lote(conn, SQL_UPSERT_OFERTAS, COLUNAS_OFERTAS, registros)
+    return len(registros)
+
+# Campos de precos_ofertas no payload da API ("oferta" em /api/products e nos detalhes)
+CAMPOS_PAYLOAD = {
+    "percentil_30": "percentil30d", "percentil_90": "percentil90d", "percentil_365": "percentil365d",
+    "zscore": "zScore", "dias_desde_menor": "diasDesdeMenorPreco", "dias_observados": "diasObservados",
+    "spread": "spreadLojas", "spread_pct": "spreadLojasPct",
+}
+
+def carregar_ofertas(conn, produtos=None):
+    """{produto_base: dict do payload "oferta"}; todos os produtos quando `produtos` é None."""
+    sql = f"SELECT produto_base, {', '.join(CAMPOS_PAYLOAD)} FROM precos_ofertas"
+    params = {}
+    if produtos is not None:
+        sql += " WHERE produto_base IN :produtos"
+        params['produtos'] = list(produtos)
+    consulta = text(sql)
+    if params: consulta = consulta.bindparams(bindparam('produtos', expanding=True))
+    ofertas = {}
+    for linha in conn.execute(consulta, params).all():
+        valores = {}
+        for coluna, chave in CAMPOS_PAYLOAD.items():
+            valor = getattr(linha, coluna)
+            if isinstance(valor, float) and np.isnan(valor): valor = None
+            if valor is not None and coluna not in ('dias_desde_menor', 'dias_observados'): valor = round(float(valor), 4)
+            valores[chave] = valor
+        ofertas[linha.produto_base] = valores
+    return ofertas
@@ -0,0 +1,251 @@
+# meu_comparador_backend/parsing.py (v1.1 - Parsing Parcial com lxml + Vitrines)
+#
+# Os parsers de scraper.py montam uma árvore BeautifulSoup completa da página e só usam
+# quatro nós: título, preço, descrição e imagem principal. Aqui a página é lida pelo
+# parser C do lxml, os nós são localizados por XPath e apenas o(s) container(s) da
+# descrição vira(m) BeautifulSoup, para que corrigir_html_descricao gere exatamente o
+# mesmo HTML. A saída é a mesma tupla (nome, preco, img, desc) dos parsers originais
+# (conferida byte a byte por benchmarks/bench_parsing.py).
+
+import re
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+from lxml import etree
+from lxml import html as lxml_html
+
+# --- FUNÇÕES COMPARTILHADAS COM OS PARSERS BEAUTIFULSOUP ---
+def corrigir_html_descricao(soup_element, url_base):
+    if not soup_element: return ""
+    for tag in soup_element.find_all(['script', 'iframe', 'link', 'button', 'input']):
+        tag.decompose()
+    for img in soup_element.find_all('img'):
+        new_src = img.get('data-src') or img.get('data-srcset') or img.get('src')
+        if new_src:
+            new_src = new_src.split(' ')[0]
+            if new_src.startswith('/'): new_src = url_base + new_src
+            img['src'] = new_src
+        for attr in ['loading', 'width', 'height', 'class']:
+            if img.has_attr(attr): del img[attr]
+        if img.get('src'):
+            img['style'] = "max-width: 100%; height: auto; display: block; margin: 10px auto;"
+    for tag in soup_element.find_all(style=True):
+        if tag.name == 'img' or 'url(' in tag['style']: continue
+        del tag['style']
+    return str(soup_element)
+
+def limpar_preco(texto_preco):
+    if not texto_preco: return None
+    preco_limpo = re.sub(r'[^\d,]', '', texto_preco)
+    preco_limpo = preco_limpo.replace(',', '.')
+    try: return float(preco_limpo)
+    except ValueError: return None
+
+# --- HELPERS LXML ---
+RE_PRECO_VISTA = re.compile(r'R\$\s*[\d\.,]+.*vista')
+RE_DECLARACAO_XML = re.compile(r'^\s*<\?xml[^>]*\?>', re.I)
+
+def _classe(nome):
+    """Predicado XPath equivalente a class_="nome" do BeautifulSoup (um dos tokens de class)."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {nome} ')"
+
+def _arvore(conteudo):
+    """Decodifica como o BeautifulSoup faria (UnicodeDammit) e monta a árvore lxml."""
+    if isinstance(conteudo, bytes):
+        conteudo = UnicodeDammit(conteudo, is_html=True).unicode_markup
+    conteudo = RE_DECLARACAO_XML.sub('', conteudo or '')
+    if not conteudo.strip(): return None
+    return lxml_html.document_fromstring(conteudo)
+
+def _primeiro(arvore, xpath):
+    nos = arvore.xpath(xpath)
+    return nos[0] if nos else None
+
+def _texto(no):
+    return no.text_content() if no is not None else None
+
+def _para_soup(no):
+    """Só este nó (sem o texto que vem depois dele) vira BeautifulSoup."""
+    fragmento = etree.tostring(no, method='html', encoding='unicode', with_tail=False)
+    soup = BeautifulSoup(fragmento, 'lxml')
+    return soup.find(no.tag) or soup
+
+def _dentro_de(no, containers):
+    pai = no.getparent()
+    while pai is not None:
+        if pai in containers: return True
+        pai = pai.getparent()
+    return False
+
+def _primeira_img(arvore, containers, descricoes_soup, condicao):
+    """Primeira <img> (em ordem de documento) cujo src atende `condicao`.
+
+    As imagens de dentro da descrição são avaliadas no HTML já corrigido (src reescrito),
+    como acontece no parser original, que procura a imagem depois de corrigir a descrição.
+    """
+    descricoes_vistas = set()
+    for img in arvore.iter('img'):
+        container = next((c for c in containers if img is c or _dentro_de(img, (c,))), None)
+        if container is None:
+            if condicao(img.get('src')): return img.get('src')
+            continue
+        if id(container) in descricoes_vistas: continue
+        descricoes_vistas.add(id(container))
+        soup = descricoes_soup.get(id(container))
+        if soup is None: continue
+        for img_soup in soup.find_all('img'):
+            if condicao(img_soup.get('src')): return img_soup.get('src')
+    return None
+
+# --- PARSERS RÁPIDOS (mesma saída dos buscar_dados_<loja> de scraper.py) ---
+def buscar_dados_kabum_rapido(url, conteudo):
+    nome, preco, img, desc = None, None, None, None
+    try:
+        arvore = _arvore(conteudo)
+        tag_nome = _primeiro(arvore, '//h1')
+        if tag_nome is not None: nome = _texto(tag_nome).strip()
+        tag_preco = _primeiro(arvore, f"//h4[{_classe('text-secondary-500')}]")
+        if tag_preco is None: tag_preco = _primeiro(arvore, f"//b[{_classe('text-secondary-500')}]")
+        if tag_preco is not None: preco = limpar_preco(_texto(tag_preco))
+        else: preco = 0.0
+        tag_desc = _primeiro(arvore, "//div[@id='description']")
+        descricoes = {}
+        if tag_desc is not None:
+            soup_desc = _para_soup(tag_desc)
+            desc = corrigir_html_descricao(soup_desc, "https://www.kabum.com.br")
+            descricoes[id(tag_desc)] = soup_desc
+        containers = [tag_desc] if tag_desc is not None else []
+        img = _primeira_img(arvore, containers, descricoes,
+                            lambda src: bool(src) and "/produtos/fotos/" in src and src.endswith("_gg.jpg"))
+        if not img:
+            img = _primeira_img(arvore, containers, descricoes,
+                                lambda src: bool(src) and "/produtos/fotos/sync_mirakl/" in src and "/xlarge/" in src)
+    except: pass
+    return nome, preco, img, desc
+
+def _pai_do_texto(texto):
+    """Pai no sentido do BeautifulSoup: para texto de 'tail' é o pai do elemento anterior."""
+    pai = texto.getparent()
+    if texto.is_tail and pai is not None: pai = pai.getparent()
+    return pai
+
+def buscar_dados_pichau_rapido(url, conteudo):
+    nome, preco, img, desc = None, None, None, ""
+    try:
+        arvore = _arvore(conteudo)
+        tag_nome = _primeiro(arvore, '//h1')
+        if tag_nome is not None: nome = _texto(tag_nome).strip()
+        tag_preco = next((t for t in arvore.xpath('//text()') if RE_PRECO_VISTA.search(t)), None)
+        if tag_preco is not None: preco = limpar_preco(_texto(_pai_do_texto(tag_preco)))
+        else:
+             tag_preco_class = _primeiro(arvore, "//div[contains(@class, 'price_vista')]")
+             if tag_preco_class is not None: preco = limpar_preco(_texto(tag_preco_class))
+             else: preco = 0.0
+
+        divs_desc = arvore.xpath(f"//div[{_classe('description-rich-text-product')}]")
+        html_sobre, html_specs = "", ""
+        for div in divs_desc:
+            soup_div = _para_soup(div)
+            if soup_div.find('table'): html_specs += corrigir_html_descricao(soup_div, "https://www.pichau.com.br")
+            else: html_sobre += corrigir_html_descricao(soup_div, "https://www.pichau.com.br")
+
+        if html_sobre: desc += f'<div class="mb-8 pichau-visual">{html_sobre}</div>'
+        if html_specs: desc += f'<div class="mt-8 border-t pt-4 pichau-specs"><h3 class="text-xl font-bold mb-4">Especificações Técnicas</h3>{html_specs}</div>'
+
+        # Imagens da descrição perdem o atributo class na correção, então nunca casam aqui
+        for tag_img in arvore.xpath(f"//img[{_classe('iiz__img')}]"):
+            if not _dentro_de(tag_img, divs_desc):
+                img = tag_img.get('src')
+                break
+    except: pass
+    if not desc: desc = None
+    return nome, preco, img, desc
+
+def buscar_dados_terabyte_rapido(url, conteudo):
+    nome, preco, img, desc = None, None, None, None
+    try:
+        arvore = _arvore(conteudo)
+        tag_nome = _primeiro(arvore, f"//h1[{_classe('tit-prod')}]")
+        if tag_nome is None: tag_nome = _primeiro(arvore, '//h1')
+        if tag_nome is not None: nome = _texto(tag_nome).strip()
+        tag_preco = _primeiro(arvore, "//p[@id='valVista']")
+        if tag_preco is None: tag_preco = _primeiro(arvore, f"//div[{_classe('part-price')}]")
+        if tag_preco is not None: preco = limpar_preco(_texto(tag_preco))
+        else: preco = 0.0
+        tag_desc = _primeiro(arvore, f"//div[{_classe('descricao')}]")
+        if tag_desc is not None:
+            soup_desc = _para_soup(tag_desc)
+            for clear in soup_desc.find_all('div', class_='clear'): clear.decompose()
+            desc = corrigir_html_descricao(soup_desc, "https://www.terabyteshop.com.br")
+        containers = [tag_desc] if tag_desc is not None else []
+        tag_img = next((i for i in arvore.xpath(f"//img[{_classe('zoomImg')}]") if not _dentro_de(i, containers)), None)
+        if tag_img is None: tag_img = _primeiro(arvore, "//*[@id='carousel-product-images']//img")
+        if tag_img is not None: img = tag_img.get('src')
+    except: pass
+    return nome, preco, img, desc
+
+PARSERS_RAPIDOS = {
+    "Kabum": buscar_dados_kabum_rapido,
+    "Pichau": buscar_dados_pichau_rapido,
+    "Terabyte": buscar_dados_terabyte_rapido,
+}
+
+# --- VITRINES (páginas de categoria/busca: um card por produto) ---
+RE_ESGOTADO = re.compile(r'esgotado|indispon[ií]vel', re.I)
+
+def _cards(conteudo, url_pagina, xp_card, xp_nome, achar_preco, xp_link=".//a[@href]"):
+    """[{"nome", "preco", "url", "img"}] para cada card da página (cards sem nome ou link ficam de fora)."""
+    arvore = _arvore(conteudo)
+    if arvore is None: return []
+    itens = []
+    for card in arvore.xpath(xp_card):
+        tag_nome = _primeiro(card, xp_nome)
+        nome = _texto(tag_nome).strip() if tag_nome is not None else ""
+        if not nome and tag_nome is not None: nome = (tag_nome.get('title') or "").strip()
+        if card.tag == 'a' and card.get('href'): link = card
+        elif tag_nome is not None and tag_nome.tag == 'a' and tag_nome.get('href'): link = tag_nome
+        else: link = _primeiro(card, xp_link)
+        if not nome or link is None: continue
+
+        preco = achar_preco(card)
+        if preco is None:
+            # Card sem preço: esgotado vira 0.0 (como nas páginas de produto); fora isso, ignora
+            if not RE_ESGOTADO.search(_texto(card) or ""): continue
+            preco = 0.0
+        tag_img = _primeiro(card, ".//img")
+        img = None
+        if tag_img is not None:
+            img = (tag_img.get('data-src') or tag_img.get('src') or "").split(' ')[0] or None
+            if img and img.startswith('data:'): img = None
+        itens.append({"nome": nome, "preco": preco, "url": urljoin(url_pagina, link.get('href')),
+                      "img": urljoin(url_pagina, img) if img else None})
+    return itens
+
+def _preco_no(card, xpath):
+    tag = _primeiro(card, xpath)
+    return limpar_preco(_texto(tag)) if tag is not None else None
+
+def buscar_vitrine_kabum(url, conteudo):
+    return _cards(conteudo, url, f"//article[{_classe('productCard')}]",
+                  f".//span[{_classe('nameCard')}]",
+                  lambda card: _preco_no(card, f".//span[{_classe('priceCard')}]"))
+
+def _preco_vista_pichau(card):
+    texto = next((t for t in card.xpath('.//text()') if RE_PRECO_VISTA.search(t)), None)
+    if texto is not None: return limpar_preco(RE_PRECO_VISTA.search(texto).group(0))
+    return _preco_no(card, ".//div[contains(@class, 'price_vista')]")
+
+def buscar_vitrine_pichau(url, conteudo):
+    return _cards(conteudo, url, "//a[@data-cy='list-product']", ".//h2", _preco_vista_pichau)
+
+def buscar_vitrine_terabyte(url, conteudo):
+    return _cards(conteudo, url, f"//div[{_classe('pbox')} or {_classe('product-item')}]",
+                  f".//*[{_classe('prod-name')} or {_classe('product-item__name')}]",
+                  lambda card: _preco_no(card, f".//*[{_classe('prod-new-price')} or {_classe('product-item__new-price')}]"))
+
+PARSERS_VITRINE = {
+    "Kabum": buscar_vitrine_kabum,
+    "Pichau": buscar_vitrine_pichau,
+    "Terabyte": buscar_vitrine_terabyte,
+}
@@ -0,0 +1,201 @@
+# meu_comparador_backend/particoes.py (v1.1 - Partição DEFAULT Coberta pela Manutenção)
+#
+# `precos` (Postgres) passa a ser particionada por mês em `timestamp` (precos_AAAAMM, mais
+# uma partição DEFAULT, precos_padrao, para o que não cair em nenhum mês criado). A manutenção
+# (manutencao_precos.py, diária):
+#   1. cria as partições dos próximos meses e as dos meses que já têm linhas na DEFAULT (a
+#      manutenção atrasou): essas linhas vão para a partição nova na mesma transação;
+#   2. para cada partição mais antiga que PRECOS_RETENCAO_MESES, consolida as linhas em
+#      `precos_diario` (min/max/último/soma/quantidade por produto, loja e dia) e apaga a
+#      partição, na mesma transação; as linhas da DEFAULT antes do corte têm o mesmo destino.
+# A consolidação soma ao que já existe no dia (nunca roda duas vezes sobre as mesmas linhas:
+# elas são apagadas na mesma transação).
+# A leitura do histórico (historico.carregar_historico) junta `precos_diario` (dias antes
+# da primeira linha bruta do produto) com `precos`. Mínimo e média históricos continuam em
+# `precos_stats`, que é incremental e não depende das linhas brutas; recalcular_stats
+# reconstrói a tabela a partir de bruto + consolidado.
+
+from datetime import date
+
+from sqlalchemy import text
+
+from config import env_int
+
+RETENCAO_MESES = env_int("PRECOS_RETENCAO_MESES", 6)
+MESES_A_FRENTE = 2
+
+DDL_PRECOS_DIARIO = [
+    """
+    CREATE TABLE IF NOT EXISTS precos_diario (
+        produto_base VARCHAR(200) NOT NULL,
+        loja VARCHAR(50) NOT NULL,
+        dia DATE NOT NULL,
+        categoria VARCHAR(100),
+        preco_min FLOAT,
+        preco_max FLOAT,
+        preco_ultimo FLOAT,
+        ts_ultimo TIMESTAMP,
+        preco_soma FLOAT NOT NULL DEFAULT 0,
+        preco_qtd INTEGER NOT NULL DEFAULT 0,
+        linhas INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (produto_base, loja, dia)
+    )
+    """,
+]
+
+# Só preços válidos (> 0) entram em min/max/soma/qtd, como em precos_stats
+SQL_CONSOLIDAR = """
+    INSERT INTO precos_diario (produto_base, loja, dia, categoria, preco_min, preco_max, preco_ultimo,
+                               ts_ultimo, preco_soma, preco_qtd, linhas)
+    SELECT produto_base, loja, timestamp::date,
+           (ARRAY_AGG(categoria ORDER BY timestamp DESC))[1],
+           MIN(preco) FILTER (WHERE preco > 0),
+           MAX(preco) FILTER (WHERE preco > 0),
+           (ARRAY_AGG(COALESCE(preco, 0) ORDER BY timestamp DESC))[1],
+           MAX(timestamp),
+           COALESCE(SUM(preco) FILTER (WHERE preco > 0), 0),
+           COUNT(*) FILTER (WHERE preco > 0),
+           COUNT(*)
+    FROM {tabela}
+    WHERE produto_base IS NOT NULL AND loja IS NOT NULL AND timestamp IS NOT NULL{filtro}
+    GROUP BY produto_base, loja, timestamp::date
+    ON CONFLICT (produto_base, loja, dia) DO UPDATE SET
+        categoria = CASE WHEN excluded.ts_ultimo >= precos_diario.ts_ultimo THEN excluded.categoria ELSE precos_diario.categoria END,
+        preco_min = LEAST(precos_diario.preco_min, excluded.preco_min),
+        preco_max = GREATEST(precos_diario.preco_max, excluded.preco_max),
+        preco_ultimo = CASE WHEN excluded.ts_ultimo >= precos_diario.ts_ultimo THEN excluded.preco_ultimo ELSE precos_diario.preco_ultimo END,
+        ts_ultimo = GREATEST(precos_diario.ts_ultimo, excluded.ts_ultimo),
+        preco_soma = precos_diario.preco_soma + excluded.preco_soma,
+        preco_qtd = precos_diario.preco_qtd + excluded.preco_qtd,
+        linhas = precos_diario.linhas + excluded.linhas
+"""
+
+PARTICAO_PADRAO = "precos_padrao"
+
+SQL_PARTICOES = """
+    SELECT c.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    JOIN pg_class p ON p.oid = i.inhparent
+    WHERE p.relname = 'precos'
+    ORDER BY c.relname
+"""
+
+def inicio_mes(dia, deslocamento=0):
+    """Primeiro dia do mês de `dia`, deslocado `deslocamento` meses."""
+    meses = dia.year * 12 + dia.month - 1 + deslocamento
+    return date(meses // 12, meses % 12 + 1, 1)
+
+def nome_particao(mes):
+    return f"precos_{mes:%Y%m}"
+
+def mes_da_particao(nome):
+    """date do primeiro dia do mês de precos_AAAAMM; None para a DEFAULT ou nomes estranhos."""
+    sufixo = nome.rsplit('_', 1)[-1]
+    if len(sufixo) != 6 or not sufixo.isdigit(): return None
+    return date(int(sufixo[:4]), int(sufixo[4:]), 1)
+
+def tem_padrao(conn):
+    return conn.execute(text(f"SELECT to_regclass('{PARTICAO_PADRAO}') IS NOT NULL")).scalar_one()
+
+def meses_na_padrao(conn):
+    """Meses (primeiro dia) com linhas na partição DEFAULT."""
+    if not tem_padrao(conn): return []
+    return conn.execute(text(f"""
+        SELECT DISTINCT date_trunc('month', timestamp)::date FROM {PARTICAO_PADRAO} WHERE timestamp IS NOT NULL
+    """)).scalars().all()
+
+def criar_particao(conn, mes):
+    """Cria a partição do mês; linhas desse mês que estejam na DEFAULT passam para ela.
+
+    Com linhas do mês na DEFAULT o Postgres recusa o CREATE ... PARTITION OF, então a DEFAULT
+    é desanexada, as linhas movidas e ela reanexada, tudo na transação de `conn`.
+    """
+    nome = nome_particao(mes)
+    limites = {"inicio": mes, "fim": inicio_mes(mes, 1)}
+    ddl = f"""
+        CREATE TABLE IF NOT EXISTS {nome} PARTITION OF precos
+        FOR VALUES FROM ('{mes:%Y-%m-%d}') TO ('{inicio_mes(mes, 1):%Y-%m-%d}')
+    """
+    existe = conn.execute(text(f"SELECT to_regclass('{nome}') IS NOT NULL")).scalar_one()
+    if existe or not tem_padrao(conn) or conn.execute(text(f"""
+        SELECT NOT EXISTS (SELECT 1 FROM {PARTICAO_PADRAO} WHERE timestamp >= :inicio AND timestamp < :fim)
+    """), limites).scalar_one():
+        conn.execute(text(ddl))
+        return nome
+    conn.execute(text(f"ALTER TABLE precos DETACH PARTITION {PARTICAO_PADRAO}"))
+    conn.execute(text(ddl))
+    movidas = conn.execute(text(f"""
+        WITH movidas AS (
+            DELETE FROM {PARTICAO_PADRAO} WHERE timestamp >= :inicio AND timestamp < :fim RETURNING *
+        )
+        INSERT INTO {nome} SELECT * FROM movidas
+    """), limites).rowcount
+    conn.execute(text(f"ALTER TABLE precos ATTACH PARTITION {PARTICAO_PADRAO} DEFAULT"))
+    print(f"  -> {movidas} linhas de {mes:%Y-%m} movidas de {PARTICAO_PADRAO} para {nome}")
+    return nome
+
+def garantir_particoes(conn, hoje, meses_a_frente=MESES_A_FRENTE):
+    """Cria as partições do mês de `hoje`, dos próximos `meses_a_frente` meses e dos meses presos na DEFAULT."""
+    meses = {inicio_mes(hoje, i) for i in range(meses_a_frente + 1)} | set(meses_na_padrao(conn))
+    return [criar_particao(conn, mes) for mes in sorted(meses)]
+
+def particoes_mensais(conn):
+    """[(mês, nome)] das partições mensais de `precos`, da mais antiga para a mais nova."""
+    nomes = conn.execute(text(SQL_PARTICOES)).scalars().all()
+    return sorted((mes_da_particao(n), n) for n in nomes if mes_da_particao(n) is not None)
+
+def consolidar(conn, tabela, ate=None):
+    """Grava em precos_diario os agregados diários de `tabela` (partição ou precos inteira); só antes de `ate` se informado."""
+    filtro = " AND timestamp < :ate" if ate is not None else ""
+    return conn.execute(text(SQL_CONSOLIDAR.format(tabela=tabela, filtro=filtro)), {"ate": ate} if ate is not None else {}).rowcount
+
+def aplicar_retencao(engine, hoje, meses=RETENCAO_MESES):
+    """Consolida e apaga as partições mensais que terminaram antes do corte; [(partição, dias consolidados)].
+
+    Cada partição vai numa transação própria: se algo falhar, as anteriores já ficaram
+    consolidadas e apagadas, e a que falhou continua intacta.
+    """
+    corte = inicio_mes(hoje, -meses)
+    with engine.connect() as conn:
+        antigas = [(mes, nome) for mes, nome in particoes_mensais(conn) if inicio_mes(mes, 1) <= corte]
+    removidas = []
+    for mes, nome in antigas:
+        with engine.begin() as conn:
+            dias = consolidar(conn, nome)
+            conn.execute(text(f"ALTER TABLE precos DETACH PARTITION {nome}"))
+            conn.execute(text(f"DROP TABLE {nome}"))
+        removidas.append((nome, dias))
+    # Linhas antigas que ficaram na DEFAULT (sem partição do mês) seguem a mesma retenção
+    with engine.begin() as conn:
+        if tem_padrao(conn):
+            dias = consolidar(conn, PARTICAO_PADRAO, corte)
+            apagadas = conn.execute(text(f"DELETE FROM {PARTICAO_PADRAO} WHERE timestamp < :corte"), {"corte": corte}).rowcount
+            if apagadas: removidas.append((f"{PARTICAO_PADRAO} (linhas antes de {corte:%Y-%m})", dias))
+    return removidas
+
+def recalcular_stats(conn):
+    """Reconstrói precos_stats a partir das linhas brutas + dias consolidados (sem contar dia nenhum duas vezes)."""
+    conn.execute(text("DELETE FROM precos_stats"))
+    conn.execute(text("""
+        INSERT INTO precos_stats (produto_base, preco_min, preco_soma, preco_qtd, atualizado_em)
+        -- Primeiro dia bruto de cada produto calculado uma vez (não uma subconsulta por linha de precos_diario)
+        WITH primeiros AS (
+            SELECT produto_base, MIN(timestamp)::date AS primeiro_dia FROM precos GROUP BY produto_base
+        )
+        SELECT produto_base, MIN(preco_min), SUM(preco_soma), SUM(preco_qtd), MAX(atualizado_em)
+        FROM (
+            SELECT produto_base,
+                   MIN(preco) FILTER (WHERE preco > 0) AS preco_min,
+                   COALESCE(SUM(preco) FILTER (WHERE preco > 0), 0) AS preco_soma,
+                   COUNT(*) FILTER (WHERE preco > 0) AS preco_qtd,
+                   MAX(timestamp) AS atualizado_em
+            FROM precos WHERE produto_base IS NOT NULL GROUP BY produto_base
+            UNION ALL
+            SELECT d.produto_base, MIN(d.preco_min), SUM(d.preco_soma), SUM(d.preco_qtd), MAX(d.ts_ultimo)
+            FROM precos_diario d
+            LEFT JOIN primeiros f ON f.produto_base = d.produto_base
+            WHERE d.dia < COALESCE(f.primeiro_dia, DATE '9999-12-31')
+            GROUP BY d.produto_base
+        ) partes
+        GROUP BY produto_base
+    """))
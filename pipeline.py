@@ -0,0 +1,248 @@
+# meu_comparador_backend/pipeline.py (v1.2 - Limites e Disjuntor Persistentes entre Chamadas)
+#
+# Cada loja tem seu próprio pool de threads (teto de concorrência) e um intervalo mínimo
+# entre o início de dois acessos (educação com o site). As lojas que precisam de Selenium
+# dividem um pool de navegadores headless; Kabum vai só por HTTP.
+# Os limites e o disjuntor valem por processo: quem chama `coletar` várias vezes (worker.py,
+# um lote por chamada) passa os mesmos `controles` para eles não recomeçarem a cada lote.
+#
+# Variáveis de ambiente:
+#   SCRAPER_<LOJA>_CONCORRENCIA   acessos simultâneos por loja (ex.: SCRAPER_KABUM_CONCORRENCIA=4)
+#   SCRAPER_<LOJA>_INTERVALO      segundos entre o início de dois acessos à mesma loja
+#   SCRAPER_NAVEGADORES           navegadores Chrome abertos ao mesmo tempo (padrão 2)
+#   SCRAPER_TENTATIVAS            tentativas por página na mesma rodada (padrão 2)
+#   SCRAPER_ESPERA_RETENTATIVA    segundos antes da 2ª tentativa; dobra a cada nova (padrão 5)
+#   SCRAPER_DISJUNTOR_FALHAS      falhas seguidas que "abrem" a loja (padrão 5)
+#   SCRAPER_DISJUNTOR_PAUSA       segundos sem acessar a loja aberta antes de testar de novo (padrão 600)
+
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from config import env_float, env_int
+
+LOJAS_SELENIUM = {"Pichau", "Terabyte"}
+
+# (concorrência, intervalo em segundos)
+LIMITES_PADRAO = {
+    "Kabum": (4, 0.5),
+    "Pichau": (2, 2.0),
+    "Terabyte": (2, 2.0),
+}
+
+def limites_loja(loja):
+    concorrencia, intervalo = LIMITES_PADRAO.get(loja, (1, 1.0))
+    chave = loja.upper()
+    return (max(1, env_int(f"SCRAPER_{chave}_CONCORRENCIA", concorrencia)),
+            max(0.0, env_float(f"SCRAPER_{chave}_INTERVALO", intervalo)))
+
+class LimitadorLoja:
+    """No máximo N acessos simultâneos e um intervalo mínimo entre o início de dois acessos."""
+
+    def __init__(self, concorrencia, intervalo):
+        self.concorrencia = concorrencia
+        self.intervalo = intervalo
+        self._sem = threading.BoundedSemaphore(concorrencia)
+        self._lock = threading.Lock()
+        self._proximo = 0.0
+
+    @contextmanager
+    def acesso(self):
+        with self._sem:
+            # Reserva o próximo horário livre e espera fora do lock
+            with self._lock:
+                agora = time.monotonic()
+                inicio = max(agora, self._proximo)
+                self._proximo = inicio + self.intervalo
+            if inicio > agora: time.sleep(inicio - agora)
+            yield
+
+class DisjuntorLoja:
+    """Circuit breaker: depois de `limite` falhas seguidas a loja fica fechada por `pausa` segundos.
+
+    Passada a pausa, uma única tentativa é liberada (meio-aberto): sucesso volta ao normal,
+    falha fecha de novo. Evita gastar a rodada inteira numa loja que está devolvendo 403.
+    """
+
+    def __init__(self, limite, pausa):
+        self.limite = max(1, limite)
+        self.pausa = pausa
+        self._lock = threading.Lock()
+        self._falhas = 0
+        self._aberto_ate = None
+        self._testando = False
+        self.aberturas = 0
+
+    def permitir(self):
+        with self._lock:
+            if self._aberto_ate is None: return True
+            if self._testando or time.monotonic() < self._aberto_ate: return False
+            self._testando = True
+            return True
+
+    def registrar(self, sucesso):
+        with self._lock:
+            self._testando = False
+            if sucesso:
+                self._falhas, self._aberto_ate = 0, None
+                return
+            self._falhas += 1
+            if self._aberto_ate is not None or self._falhas >= self.limite:
+                if self._aberto_ate is None: self.aberturas += 1
+                self._aberto_ate = time.monotonic() + self.pausa
+
+class PoolNavegadores:
+    """Navegadores headless criados sob demanda (até `tamanho`) e reaproveitados entre tarefas."""
+
+    def __init__(self, criar, tamanho=2):
+        self._criar = criar
+        self._sem = threading.BoundedSemaphore(max(1, tamanho))
+        self._livres = queue.Queue()
+        self._todos = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def driver(self):
+        with self._sem:
+            try:
+                driver = self._livres.get_nowait()
+            except queue.Empty:
+                driver = self._criar()
+                with self._lock: self._todos.append(driver)
+            try:
+                yield driver
+            finally:
+                self._livres.put(driver)
+
+    def fechar(self):
+        with self._lock:
+            drivers, self._todos = self._todos, []
+        for driver in drivers:
+            try: driver.quit()
+            except Exception: pass
+
+class ResumoColeta:
+    """Contagens e tempos por loja para o resumo de throughput da rodada."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.por_loja = {}
+        self.inicio = time.monotonic()
+        self.fim = None
+
+    def registrar(self, loja, sucesso, segundos):
+        with self._lock:
+            st = self._loja(loja)
+            st["tentativas"] += 1
+            st["sucessos" if sucesso else "falhas"] += 1
+            st["segundos"] += segundos
+
+    def registrar_pulo(self, loja):
+        """Página não acessada porque o disjuntor da loja estava aberto."""
+        with self._lock: self._loja(loja)["puladas"] += 1
+
+    def _loja(self, loja):
+        return self.por_loja.setdefault(loja, {"tentativas": 0, "sucessos": 0, "falhas": 0, "puladas": 0, "segundos": 0.0})
+
+    def finalizar(self):
+        self.fim = time.monotonic()
+
+    def como_dict(self):
+        parede = (self.fim or time.monotonic()) - self.inicio
+        total = sum(st["tentativas"] for st in self.por_loja.values())
+        soma = sum(st["segundos"] for st in self.por_loja.values())
+        return {
+            "paginas": total,
+            "sucessos": sum(st["sucessos"] for st in self.por_loja.values()),
+            "puladas": sum(st["puladas"] for st in self.por_loja.values()),
+            "tempo_parede_s": round(parede, 2),
+            "tempo_sequencial_s": round(soma, 2),
+            "paginas_por_minuto": round(total / parede * 60, 1) if parede > 0 else 0.0,
+            "lojas": {loja: dict(st, media_s=round(st["segundos"] / st["tentativas"], 2) if st["tentativas"] else 0.0)
+                      for loja, st in self.por_loja.items()},
+        }
+
+    def imprimir(self):
+        d = self.como_dict()
+        print(f"\n=== RESUMO DA COLETA: {d['sucessos']}/{d['paginas']} páginas em {d['tempo_parede_s']}s "
+              f"({d['paginas_por_minuto']} páginas/min, {d['tempo_sequencial_s']}s se fosse sequencial) ===")
+        for loja, st in sorted(d["lojas"].items()):
+            puladas = f"  ({st['puladas']} puladas: loja fora do ar)" if st["puladas"] else ""
+            print(f"  {loja:<10} {st['sucessos']:>3} ok / {st['falhas']:>3} falhas  média {st['media_s']}s por página{puladas}")
+
+def disjuntor_loja(loja):
+    return DisjuntorLoja(env_int("SCRAPER_DISJUNTOR_FALHAS", 5), env_float("SCRAPER_DISJUNTOR_PAUSA", 600.0))
+
+def controle_loja(loja):
+    """(limitador, disjuntor) de uma loja com os limites configurados."""
+    concorrencia, intervalo = limites_loja(loja)
+    return LimitadorLoja(concorrencia, intervalo), disjuntor_loja(loja)
+
+def coletar(tarefas, buscar, pool_navegadores, atalho=None, controles=None, resumo=None):
+    """Executa `buscar(driver, url, loja)` para cada tarefa respeitando os limites de cada loja.
+
+    `tarefas` é uma lista de dicts com pelo menos "loja" e "url". Retorna (resultados, resumo),
+    com `resultados[i]` = tupla devolvida por `buscar` para `tarefas[i]` (ordem preservada), ou
+    None se a página não foi acessada porque o disjuntor da loja estava aberto.
+    Se `atalho(url, loja)` for informado, ele é tentado antes, sem ocupar navegador; só quando
+    devolve None a tarefa segue para `buscar`. Uma página que falha é tentada de novo até
+    SCRAPER_TENTATIVAS vezes, com espera exponencial entre as tentativas.
+    `controles` ({loja: (limitador, disjuntor)}, completado aqui) e `resumo` podem vir de fora
+    para continuarem valendo entre chamadas; sem eles, cada chamada começa do zero.
+    """
+    resumo = ResumoColeta() if resumo is None else resumo
+    controles = {} if controles is None else controles
+    resultados = [None] * len(tarefas)
+    tentativas = max(1, env_int("SCRAPER_TENTATIVAS", 2))
+    espera = max(0.0, env_float("SCRAPER_ESPERA_RETENTATIVA", 5.0))
+    por_loja = {}
+    for i, tarefa in enumerate(tarefas):
+        por_loja.setdefault(tarefa["loja"], []).append(i)
+
+    def executar(limitador, disjuntor, i):
+        tarefa = tarefas[i]
+        loja, url = tarefa["loja"], tarefa["url"]
+        for tentativa in range(tentativas):
+            if not disjuntor.permitir():
+                resumo.registrar_pulo(loja)
+                return
+            with limitador.acesso():
+                inicio = time.monotonic()
+                try:
+                    resultado = atalho(url, loja) if atalho else None
+                    if resultado is None:
+                        if loja in LOJAS_SELENIUM:
+                            with pool_navegadores.driver() as driver:
+                                resultado = buscar(driver, url, loja)
+                        else:
+                            resultado = buscar(None, url, loja)
+                except Exception as e:
+                    print(f"  -> ERRO {loja} ({url}): {e}")
+                    resultado = (None, None, None, None)
+            sucesso = bool(resultado and resultado[0] and resultado[1] is not None)
+            resultados[i] = resultado
+            resumo.registrar(loja, sucesso, time.monotonic() - inicio)
+            disjuntor.registrar(sucesso)
+            if sucesso: return
+            if tentativa + 1 < tentativas:
+                time.sleep(espera * (2 ** tentativa) * random.uniform(0.8, 1.2))
+
+    executores = []
+    aberturas = {loja: disjuntor.aberturas for loja, (_, disjuntor) in controles.items()}
+    try:
+        for loja, indices in por_loja.items():
+            if loja not in controles: controles[loja] = controle_loja(loja)
+            limitador, disjuntor = controles[loja]
+            executor = ThreadPoolExecutor(max_workers=limitador.concorrencia, thread_name_prefix=f"coleta-{loja}")
+            executores.append(executor)
+            for i in indices: executor.submit(executar, limitador, disjuntor, i)
+    finally:
+        for executor in executores: executor.shutdown(wait=True)
+    for loja in por_loja:
+        novas = controles[loja][1].aberturas - aberturas.get(loja, 0)
+        if novas: print(f"  -> [Disjuntor] {loja}: {novas}x fora do ar nesta rodada")
+    resumo.finalizar()
+    return resultados, resumo
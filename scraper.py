@@ -1,12 +1,14 @@
-# meu_comparador_backend/scraper.py (v13.0 - Turbo Products + Cupons Kabum)
+# meu_comparador_backend/scraper.py (v14.3 - scraper.prom sem Temporário Compartilhado)
 
 import requests
 from bs4 import BeautifulSoup
 import re
-import pandas as pd
 from datetime import datetime
 import os 
-import time
+import json
+import sys
+import tempfile
+import threading
 import traceback
 
 # --- Imports do Selenium ---
@@ -19,9 +21,22 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 
+from agenda import Agenda
+from config import env_bool, env_int
+from cupons import interpretar_validade, salvar_cupons
+from database import get_database_url
+from estado_atual import preparar_lote, salvar_precos
+from extracao_estruturada import caminhos, extrair_dados_estruturados, extrair_itens_estruturados
+from imagens import atualizar_cache
+from metricas import registro
+from parsing import PARSERS_RAPIDOS, PARSERS_VITRINE, corrigir_html_descricao, limpar_preco
+from pipeline import LOJAS_SELENIUM, PoolNavegadores, coletar
+import snapshot
+from vitrines import MapaProdutos, coletar_vitrines, montar_linhas
+
 load_dotenv()
 
 # --- CONFIGURAÇÕES GERAIS ---
@@ -33,25 +48,31 @@ HEADERS = {
 s = requests.Session()
 s.headers.update(HEADERS)
 
+# Tenta JSON-LD / estado embutido via HTTP simples antes de abrir o Chrome
+EXTRACAO_ESTRUTURADA = env_bool("SCRAPER_EXTRACAO_ESTRUTURADA", True)
+# Parsers lxml (parsing.py) no lugar da árvore BeautifulSoup completa
+PARSER_RAPIDO = env_bool("SCRAPER_PARSER_RAPIDO", True)
+# "produto" (uma página por produto/loja) ou "vitrine" (páginas de categoria, ver vitrines.py);
+# também dá para usar `python scraper.py --vitrine`
+MODO = os.environ.get("SCRAPER_MODO", "produto").strip().lower()
+# No modo vitrine, visita a página do produto quando ele não apareceu em nenhuma categoria
+VITRINE_COMPLEMENTAR = env_bool("SCRAPER_VITRINE_COMPLEMENTAR", True)
+# Agenda adaptativa (agenda.py): só visita o que está vencido, até SCRAPER_ORCAMENTO páginas (0 = sem teto)
+AGENDA = env_bool("SCRAPER_AGENDA", True)
+ORCAMENTO = env_int("SCRAPER_ORCAMENTO", 0)
+# Baixa as imagem_url novas e grava as miniaturas WebP servidas por /api/image (imagens.py)
+IMAGENS = env_bool("SCRAPER_IMAGENS", True)
+# Depois de gravar, publica o snapshot pré-comprimido do catálogo que o app serve direto (snapshot.py)
+SNAPSHOT = env_bool("SCRAPER_SNAPSHOT", True)
+
+# --- MÉTRICAS (arquivo por rodada em SCRAPER_METRICAS_DIR) ---
+ETAPAS = registro.histograma("scraper_etapa_segundos", "Tempo de fetch, parse e gravação por loja", ("loja", "etapa"))
+PAGINAS = registro.contador("scraper_paginas_total", "Páginas coletadas por loja e resultado", ("loja", "resultado"))
+LINHAS = registro.contador("scraper_linhas_gravadas_total", "Linhas gravadas em precos por loja", ("loja",))
+ERROS_GRAVACAO = registro.contador("scraper_erros_gravacao_total", "Falhas ao gravar no banco", ("tabela",))
+
 # --- FUNÇÃO DE LIMPEZA DE HTML ---
-def corrigir_html_descricao(soup_element, url_base):
-    if not soup_element: return ""
-    for tag in soup_element.find_all(['script', 'iframe', 'link', 'button', 'input']):
-        tag.decompose()
-    for img in soup_element.find_all('img'):
-        new_src = img.get('data-src') or img.get('data-srcset') or img.get('src')
-        if new_src:
-            new_src = new_src.split(' ')[0]
-            if new_src.startswith('/'): new_src = url_base + new_src
-            img['src'] = new_src
-        for attr in ['loading', 'width', 'height', 'class']:
-            if img.has_attr(attr): del img[attr]
-        if img.get('src'):
-            img['style'] = "max-width: 100%; height: auto; display: block; margin: 10px auto;"
-    for tag in soup_element.find_all(style=True):
-        if tag.name == 'img' or 'url(' in tag['style']: continue
-        del tag['style'] 
-    return str(soup_element)
+# corrigir_html_descricao e limpar_preco ficam em parsing.py (usadas também pelos parsers rápidos)
 
 # --- LISTA DE ALVOS (PRODUTOS) ---
 LISTA_DE_PRODUTOS = [
@@ -136,12 +157,25 @@ LISTA_DE_PRODUTOS = [
     },
 ]
 
-def limpar_preco(texto_preco):
-    if not texto_preco: return None
-    preco_limpo = re.sub(r'[^\d,]', '', texto_preco)
-    preco_limpo = preco_limpo.replace(',', '.')
-    try: return float(preco_limpo)
-    except ValueError: return None
+# --- CATEGORIAS (MODO VITRINE) ---
+# Páginas de listagem percorridas com paginação; "paginas_max" opcional por categoria
+LISTA_DE_CATEGORIAS = [
+    {"loja": "Kabum", "categoria": "Placa de Vídeo", "url": "https://www.kabum.com.br/hardware/placa-de-video-vga"},
+    {"loja": "Kabum", "categoria": "Processador", "url": "https://www.kabum.com.br/hardware/processadores"},
+    {"loja": "Kabum", "categoria": "Placa-Mãe", "url": "https://www.kabum.com.br/hardware/placas-mae"},
+    {"loja": "Kabum", "categoria": "Monitor", "url": "https://www.kabum.com.br/computadores/monitores"},
+    {"loja": "Kabum", "categoria": "Fonte", "url": "https://www.kabum.com.br/hardware/fontes"},
+    {"loja": "Pichau", "categoria": "Placa de Vídeo", "url": "https://www.pichau.com.br/hardware/placa-de-video"},
+    {"loja": "Pichau", "categoria": "Processador", "url": "https://www.pichau.com.br/hardware/processadores"},
+    {"loja": "Pichau", "categoria": "Placa-Mãe", "url": "https://www.pichau.com.br/hardware/placa-m-e"},
+    {"loja": "Pichau", "categoria": "Monitor", "url": "https://www.pichau.com.br/monitores"},
+    {"loja": "Pichau", "categoria": "Fonte", "url": "https://www.pichau.com.br/hardware/fonte"},
+    {"loja": "Terabyte", "categoria": "Placa de Vídeo", "url": "https://www.terabyteshop.com.br/hardware/placas-de-video"},
+    {"loja": "Terabyte", "categoria": "Processador", "url": "https://www.terabyteshop.com.br/hardware/processadores"},
+    {"loja": "Terabyte", "categoria": "Placa-Mãe", "url": "https://www.terabyteshop.com.br/hardware/placas-mae"},
+    {"loja": "Terabyte", "categoria": "Monitor", "url": "https://www.terabyteshop.com.br/monitores"},
+    {"loja": "Terabyte", "categoria": "Fonte", "url": "https://www.terabyteshop.com.br/hardware/fontes"},
+]
 
 # --- DRIVER ---
 def init_driver():
@@ -225,6 +259,10 @@ def buscar_dados_terabyte(url, soup):
 
 # --- FETCH PRODUTOS ---
 def get_soup_via_selenium(driver, url, loja):
+    html = get_html_via_selenium(driver, url, loja)
+    return BeautifulSoup(html, 'lxml') if html else None
+
+def get_html_via_selenium(driver, url, loja):
     try:
         driver.get(url)
         wait_popup, wait_content = 1.5, 10
@@ -235,23 +273,127 @@ def get_soup_via_selenium(driver, url, loja):
             except: pass 
             if loja == "Terabyte": WebDriverWait(driver, wait_content).until(EC.presence_of_element_located((By.CSS_SELECTOR, "#valVista, .part-price, h1")))
             elif loja == "Pichau": WebDriverWait(driver, wait_content).until(EC.presence_of_element_located((By.CSS_SELECTOR, "h1")))
-        if "403 Forbidden" in driver.page_source: return None
-        return BeautifulSoup(driver.page_source, 'lxml')
+        page_source = driver.page_source
+        if "403 Forbidden" in page_source: return None
+        return page_source
     except: return None
 
+PARSERS = {
+    "Kabum": buscar_dados_kabum,
+    "Pichau": buscar_dados_pichau,
+    "Terabyte": buscar_dados_terabyte,
+}
+
+def extrair_da_pagina(url, loja, conteudo):
+    """Roda o parser da loja sobre o HTML (bytes ou str): lxml parcial ou BeautifulSoup completo."""
+    if PARSER_RAPIDO: return PARSERS_RAPIDOS[loja](url, conteudo)
+    return PARSERS[loja](url, BeautifulSoup(conteudo, 'lxml'))
+
 def buscar_dados_loja(driver, url, loja):
     print(f"  Acessando {loja}...")
+    dados = None, None, None, None
     if loja == "Kabum":
         try:
-            resp = s.get(url, timeout=10)
-            if resp.status_code == 200: return buscar_dados_kabum(url, BeautifulSoup(resp.content, 'lxml'))
+            with ETAPAS.cronometro(loja=loja, etapa='fetch_http'):
+                resp = s.get(url, timeout=10)
+            if resp.status_code == 200:
+                with ETAPAS.cronometro(loja=loja, etapa='parse_html'):
+                    dados = extrair_da_pagina(url, loja, resp.content)
         except: pass
+        caminhos.registrar(loja, 'html' if dados[0] else 'falha')
     elif loja in ["Pichau", "Terabyte"]:
-        soup = get_soup_via_selenium(driver, url, loja)
-        if soup:
-            if loja == "Pichau": return buscar_dados_pichau(url, soup)
-            if loja == "Terabyte": return buscar_dados_terabyte(url, soup)
-    return None, None, None, None
+        with ETAPAS.cronometro(loja=loja, etapa='fetch_selenium'):
+            html = get_html_via_selenium(driver, url, loja)
+        if html:
+            with ETAPAS.cronometro(loja=loja, etapa='parse_html'):
+                dados = extrair_da_pagina(url, loja, html)
+        caminhos.registrar(loja, 'selenium' if dados[0] else 'falha')
+    return dados
+
+_urls_com_descricao = None
+_urls_com_descricao_lock = threading.Lock()
+
+def tem_descricao_salva(url):
+    """True se a linha desta URL em precos_atual já tem descrição (lido uma vez por processo)."""
+    global _urls_com_descricao
+    if _urls_com_descricao is None:
+        with _urls_com_descricao_lock:
+            if _urls_com_descricao is None:
+                urls = set()
+                db_url = get_database_url()
+                try:
+                    if db_url:
+                        with create_engine(db_url).connect() as conn:
+                            urls = set(conn.execute(text("SELECT url FROM precos_atual WHERE descricao_hash IS NOT NULL")).scalars())
+                except Exception as e:
+                    # Sem precos_atual: toda página estruturada sem descrição passa pelo parser HTML
+                    print(f"  -> Descrições salvas indisponíveis ({type(e).__name__}); buscando no HTML")
+                _urls_com_descricao = urls
+    return url in _urls_com_descricao
+
+def buscar_dados_rapido(url, loja):
+    """Caminho rápido: HTTP simples + dados estruturados (JSON-LD / estado embutido).
+
+    Para a Kabum o mesmo HTML já vai para o parser da loja se não houver dados estruturados.
+    Retorna None quando a página precisa do caminho Selenium.
+    """
+    if not EXTRACAO_ESTRUTURADA and loja in LOJAS_SELENIUM: return None
+    print(f"  Acessando {loja} (HTTP)...")
+    try:
+        with ETAPAS.cronometro(loja=loja, etapa='fetch_http'):
+            resp = s.get(url, timeout=10)
+    except Exception:
+        return None
+    if resp.status_code != 200 or b"403 Forbidden" in resp.content[:2000]: return None
+
+    if EXTRACAO_ESTRUTURADA:
+        with ETAPAS.cronometro(loja=loja, etapa='parse_estruturado'):
+            dados = extrair_dados_estruturados(resp.text)
+        if dados:
+            caminhos.registrar(loja, 'estruturado')
+            # Bloco sem descrição: produto novo (ou ainda sem descrição) pega a do HTML da página
+            if dados[3] is None and not tem_descricao_salva(url):
+                with ETAPAS.cronometro(loja=loja, etapa='parse_html'):
+                    dados = dados[:3] + (extrair_da_pagina(url, loja, resp.content)[3],)
+            return dados
+    if loja == "Kabum":
+        with ETAPAS.cronometro(loja=loja, etapa='parse_html'):
+            dados = extrair_da_pagina(url, loja, resp.content)
+        caminhos.registrar(loja, 'html' if dados[0] else 'falha')
+        return dados
+    return None
+
+def buscar_pagina_vitrine(pool_navegadores, url, loja):
+    """Cards de uma página de categoria: HTTP (estruturado, depois cards no HTML) e Selenium se vier vazia."""
+    try:
+        with ETAPAS.cronometro(loja=loja, etapa='fetch_http'):
+            resp = s.get(url, timeout=15)
+        if resp.status_code == 200 and b"403 Forbidden" not in resp.content[:2000]:
+            if EXTRACAO_ESTRUTURADA:
+                with ETAPAS.cronometro(loja=loja, etapa='parse_estruturado'):
+                    itens = extrair_itens_estruturados(resp.text)
+                if itens:
+                    caminhos.registrar(loja, 'vitrine_estruturado')
+                    return itens
+            with ETAPAS.cronometro(loja=loja, etapa='parse_html'):
+                itens = PARSERS_VITRINE[loja](url, resp.content)
+            if itens:
+                caminhos.registrar(loja, 'vitrine_html')
+                return itens
+    except Exception: pass
+
+    if loja not in LOJAS_SELENIUM:
+        caminhos.registrar(loja, 'falha')
+        return None
+    with pool_navegadores.driver() as driver:
+        with ETAPAS.cronometro(loja=loja, etapa='fetch_selenium'):
+            html = get_html_via_selenium(driver, url, loja)
+    itens = None
+    if html:
+        with ETAPAS.cronometro(loja=loja, etapa='parse_html'):
+            itens = extrair_itens_estruturados(html) or PARSERS_VITRINE[loja](url, html)
+    caminhos.registrar(loja, 'vitrine_selenium' if itens else 'falha')
+    return itens
 
 # --- NOVO: SCRAPER DE CUPONS ---
 def buscar_cupons_kabum(driver):
@@ -288,10 +430,14 @@ def buscar_cupons_kabum(driver):
                 descricao = texto.replace(codigo, "").strip()
                 if len(descricao) > 100: descricao = descricao[:100] + "..."
 
+                # Data de validade do card, quando houver ("Válido até 31/12"), vira valido_ate
+                valido_ate = interpretar_validade(texto)
+
                 cupons.append({
                     "codigo": codigo,
                     "descricao": descricao,
-                    "validade": "Verificar no site",
+                    "validade": f"Válido até {valido_ate:%d/%m/%Y %H:%M}" if valido_ate else "Verificar no site",
+                    "valido_ate": valido_ate,
                     "loja": "Kabum",
                     "link": "https://www.kabum.com.br/cupons"
                 })
@@ -306,71 +452,206 @@ def buscar_cupons_kabum(driver):
         
     return cupons
 
-# --- MAIN EXECUTION ---
-print(f"--- MONITOR V13.0 (PRODUTOS + CUPONS) ---")
-global_driver = None
-resultados = []
-resultados_cupons = []
-now = datetime.now()
-
-try:
-    global_driver = init_driver()
-    
-    # 1. Busca Produtos
+# --- COLETA CONCORRENTE ---
+def montar_tarefas():
+    """Uma tarefa por (produto, loja) de LISTA_DE_PRODUTOS."""
+    tarefas = []
     for item in LISTA_DE_PRODUTOS:
         base = item["nome_base"].strip()
-        print(f"\n>>> Produto: {base}")
         for loja, url in item["urls"].items():
             if not url: continue
-            nome, preco, img, desc = buscar_dados_loja(global_driver, url, loja)
-            if nome and preco is not None:
-                resultados.append({
-                    "timestamp": now, "produto_base": base, "categoria": item["categoria"],
-                    "nome_completo_raspado": nome, "preco": preco, "imagem_url": img or "",
-                    "loja": loja, "url": url, "descricao": desc or ""
-                })
-                print(f"  -> SUCESSO: {loja}")
-            else: print(f"  -> FALHA: {loja}")
-        time.sleep(1)
+            tarefas.append({"produto_base": base, "categoria": item["categoria"], "loja": loja, "url": url})
+    return tarefas
+
+def carregar_agenda():
+    """Agenda de agenda_coleta; None (coleta tudo, como antes) se desligada ou sem a tabela."""
+    if not AGENDA: return None
+    db_url = get_database_url()
+    if not db_url: return None
+    try:
+        with create_engine(db_url).connect() as conn:
+            return Agenda.carregar(conn)
+    except Exception as e:
+        print(f"  -> [Agenda] Indisponível, coletando todos os produtos (rode migrate_agenda.py): {e}")
+        return None
+
+def coletar_produtos(pool_navegadores, now, tarefas=None, agenda=None):
+    if tarefas is None: tarefas = montar_tarefas()
+    if agenda is not None:
+        tarefas, adiadas = agenda.escolher(tarefas, now, ORCAMENTO)
+        print(f"  -> [Agenda] {len(tarefas)} páginas vencidas nesta rodada, {adiadas} adiadas")
+    print(f"\n>>> Coletando {len(tarefas)} páginas de {len(LISTA_DE_PRODUTOS)} produtos...")
+    brutos, resumo = coletar(tarefas, buscar_dados_loja, pool_navegadores, atalho=buscar_dados_rapido)
+
+    resultados = []
+    for tarefa, bruto in zip(tarefas, brutos):
+        if bruto is None:
+            # Disjuntor aberto: a página nem foi acessada e continua vencida na agenda
+            PAGINAS.inc(loja=tarefa["loja"], resultado='pulada')
+            continue
+        nome, preco, img, desc = bruto
+        sucesso = bool(nome and preco is not None)
+        if agenda is not None: agenda.observar(tarefa["produto_base"], tarefa["loja"], preco if sucesso else None, now)
+        if sucesso:
+            resultados.append({
+                "timestamp": now, "produto_base": tarefa["produto_base"], "categoria": tarefa["categoria"],
+                "nome_completo_raspado": nome, "preco": preco, "imagem_url": img or "",
+                "loja": tarefa["loja"], "url": tarefa["url"], "descricao": desc or ""
+            })
+            PAGINAS.inc(loja=tarefa["loja"], resultado='sucesso')
+            print(f"  -> SUCESSO: {tarefa['produto_base']} @ {tarefa['loja']}")
+        else:
+            PAGINAS.inc(loja=tarefa["loja"], resultado='falha')
+            print(f"  -> FALHA: {tarefa['produto_base']} @ {tarefa['loja']}")
+    return resultados, resumo
 
-    # 2. Busca Cupons (NOVO)
-    resultados_cupons = buscar_cupons_kabum(global_driver)
+def coletar_por_vitrine(pool_navegadores, now, agenda=None):
+    """Modo vitrine: páginas de categoria primeiro; a página do produto só para quem ficou de fora."""
+    tarefas = montar_tarefas()
+    mapa = MapaProdutos(tarefas)
+    print(f"\n>>> Percorrendo {len(LISTA_DE_CATEGORIAS)} categorias (vitrine) para {len(mapa)} produtos/loja...")
+    coletas, resumo_vitrine = coletar_vitrines(LISTA_DE_CATEGORIAS,
+                                               lambda url, loja: buscar_pagina_vitrine(pool_navegadores, url, loja))
+    resultados, cobertos, nao_associados = montar_linhas(LISTA_DE_CATEGORIAS, coletas, mapa, now)
+    for linha in resultados:
+        PAGINAS.inc(loja=linha["loja"], resultado='vitrine')
+        if agenda is not None: agenda.observar(linha["produto_base"], linha["loja"], linha["preco"], now)
+    cards = sum(len(itens) for itens in coletas)
+    print(f"\n=== VITRINE: {cards} cards, {len(resultados)} produtos/loja atualizados, "
+          f"{nao_associados} cards fora de LISTA_DE_PRODUTOS ===")
 
-finally:
-    if global_driver:
-        print("\nFechando navegador...")
-        global_driver.quit()
+    restantes = [t for t in tarefas if (t["produto_base"], t["loja"]) not in cobertos]
+    if not restantes or not VITRINE_COMPLEMENTAR:
+        return resultados, resumo_vitrine
+    resumo_vitrine.imprimir()
+    complemento, resumo = coletar_produtos(pool_navegadores, now, restantes, agenda)
+    return resultados + complemento, resumo
 
 # --- SALVAMENTO DB ---
-db_url = os.environ.get('DATABASE_URL')
-if db_url:
-    if db_url.startswith("postgres://"): db_url = db_url.replace("postgres://", "postgresql://", 1)
+def salvar_resultados(resultados, resultados_cupons, now, agenda=None):
+    db_url = get_database_url()
+    if not db_url:
+        print("ERRO: DATABASE_URL não configurada.")
+        return
     engine = create_engine(db_url)
+    produtos_salvos = False
 
     # Salva Produtos
     if resultados:
         try:
-            df = pd.DataFrame(resultados)
-            cols = ["timestamp", "produto_base", "categoria", "nome_completo_raspado", "preco", "imagem_url", "loja", "url", "descricao"]
-            for col in cols: 
-                if col not in df.columns: df[col] = ""
-            df = df[cols]
-            df.to_sql('precos', con=engine, if_exists='append', index=False)
+            # Append no histórico + estado atual (precos_atual/precos_stats) na mesma transação
+            df = preparar_lote(resultados)
+            with ETAPAS.cronometro(loja='todas', etapa='gravacao_precos'):
+                salvar_precos(engine, df)
+            produtos_salvos = True
+            for loja, linhas in df['loja'].value_counts().items(): LINHAS.inc(int(linhas), loja=loja)
             print(f"\n=== PRODUTOS ATUALIZADOS: {len(df)} registros ===")
-        except Exception as e: print(f"Erro SQL Produtos: {e}")
+        except Exception as e:
+            ERROS_GRAVACAO.inc(tabela='precos')
+            print(f"Erro SQL Produtos: {e}")
 
-    # Salva Cupons (Limpa anteriores da Kabum para não duplicar/acumular inválidos)
+    # Salva Cupons (upsert por loja/código + expira os que sumiram, numa transação só)
     if resultados_cupons:
         try:
-            from sqlalchemy import text
-            with engine.connect() as conn:
-                conn.execute(text("DELETE FROM cupons WHERE loja = 'Kabum'"))
-                conn.commit()
-            
-            df_cupons = pd.DataFrame(resultados_cupons)
-            df_cupons['timestamp'] = now
-            df_cupons.to_sql('cupons', con=engine, if_exists='append', index=False)
-            print(f"\n=== CUPONS ATUALIZADOS: {len(df_cupons)} registros ===")
-        except Exception as e: print(f"Erro SQL Cupons: {e}")
-else:
-    print("ERRO: DATABASE_URL não configurada.")
\ No newline at end of file
+            with ETAPAS.cronometro(loja='todas', etapa='gravacao_cupons'):
+                gravados, expirados = salvar_cupons(engine, resultados_cupons, now)
+            print(f"\n=== CUPONS ATUALIZADOS: {gravados} registros, {expirados} expirados ===")
+        except Exception as e:
+            ERROS_GRAVACAO.inc(tabela='cupons')
+            print(f"Erro SQL Cupons: {e}")
+
+    # Estado da agenda (preço, volatilidade, falhas e próxima coleta de cada produto/loja)
+    if agenda is not None:
+        try:
+            with engine.begin() as conn: gravados = agenda.salvar(conn)
+            print(f"=== AGENDA ATUALIZADA: {gravados} produtos/loja ===")
+        except Exception as e:
+            ERROS_GRAVACAO.inc(tabela='agenda_coleta')
+            print(f"Erro SQL Agenda: {e}")
+    return produtos_salvos
+
+def atualizar_imagens(resultados):
+    """Baixa uma vez cada imagem_url nova da rodada (antes da gravação, para o snapshot já referenciar)."""
+    try:
+        with ETAPAS.cronometro(loja='todas', etapa='imagens'):
+            novas, falhas, pendentes = atualizar_cache(s, [r.get("imagem_url") for r in resultados])
+        print(f"=== IMAGENS: {novas} novas, {falhas} falhas, {pendentes} para as próximas rodadas ===")
+    except Exception as e:
+        print(f"Erro no cache de imagens: {e}")
+
+def publicar_snapshot():
+    """Renderiza /api/products e os detalhes em arquivos pré-comprimidos para o app (snapshot.py)."""
+    try:
+        with ETAPAS.cronometro(loja='todas', etapa='snapshot'):
+            snapshot.publicar()
+    except Exception as e:
+        ERROS_GRAVACAO.inc(tabela='snapshot')
+        print(f"Erro ao publicar snapshot (app volta a ler do banco): {e}")
+
+# --- MÉTRICAS DA RODADA ---
+def salvar_metricas(now, resumo, sufixo=None):
+    """Grava <SCRAPER_METRICAS_DIR>/scraper_<data>.json e scraper.prom (formato Prometheus, última rodada).
+
+    `sufixo` (nome do worker da fila) entra no nome do JSON: vários workers no mesmo host não
+    se sobrescrevem; o scraper.prom fica com o último que terminou.
+    """
+    pasta = os.environ.get("SCRAPER_METRICAS_DIR", "metricas")
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        dados = {
+            "inicio": now.isoformat(timespec="seconds"),
+            "duracao_s": round((datetime.now() - now).total_seconds(), 2),
+            "coleta": resumo.como_dict() if resumo else None,
+            "caminhos": caminhos.como_dict(),
+            "metricas": registro.como_dict(),
+        }
+        arquivo = os.path.join(pasta, f"scraper_{now:%Y%m%d_%H%M%S}{f'_{sufixo}' if sufixo else ''}.json")
+        with open(arquivo, "w", encoding="utf-8") as f: json.dump(dados, f, indent=2, ensure_ascii=False)
+        # Troca atômica para o coletor de arquivos (node_exporter) nunca ler um arquivo pela metade;
+        # temporário próprio de cada processo (vários workers da fila podem gravar ao mesmo tempo)
+        fd, temporario = tempfile.mkstemp(prefix="scraper.prom.", suffix=".tmp", dir=pasta)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f: f.write(registro.exportar())
+            os.chmod(temporario, 0o644)
+            os.replace(temporario, os.path.join(pasta, "scraper.prom"))
+        except BaseException:
+            if os.path.exists(temporario): os.remove(temporario)
+            raise
+        print(f"Métricas da rodada salvas em {arquivo}")
+    except Exception as e: print(f"Erro ao salvar métricas: {e}")
+
+# --- MAIN EXECUTION ---
+def main():
+    modo = "vitrine" if "--vitrine" in sys.argv[1:] else MODO
+    print(f"--- MONITOR V13.1 (PRODUTOS + CUPONS, COLETA CONCORRENTE, MODO {modo.upper()}) ---")
+    resultados = []
+    resultados_cupons = []
+    resumo = None
+    now = datetime.now()
+    pool_navegadores = PoolNavegadores(init_driver, env_int("SCRAPER_NAVEGADORES", 2))
+    agenda = carregar_agenda()
+
+    try:
+        # 1. Busca Produtos (Kabum por HTTP, Pichau/Terabyte no pool de navegadores)
+        if modo == "vitrine": resultados, resumo = coletar_por_vitrine(pool_navegadores, now, agenda)
+        else: resultados, resumo = coletar_produtos(pool_navegadores, now, agenda=agenda)
+        resumo.imprimir()
+        caminhos.imprimir()
+
+        # 2. Busca Cupons
+        with pool_navegadores.driver() as driver:
+            resultados_cupons = buscar_cupons_kabum(driver)
+
+    finally:
+        print("\nFechando navegadores...")
+        pool_navegadores.fechar()
+
+    if IMAGENS and resultados: atualizar_imagens(resultados)
+    if salvar_resultados(resultados, resultados_cupons, now, agenda):
+        # Snapshot desligado: tira o ponteiro antigo para o app não servir dados de antes desta rodada
+        if SNAPSHOT: publicar_snapshot()
+        else: snapshot.invalidar()
+    salvar_metricas(now, resumo)
+
+if __name__ == "__main__":
+    main()
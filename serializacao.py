@@ -0,0 +1,110 @@
+# meu_comparador_backend/serializacao.py (v1.0 - JSON Rápido, Streaming e Compressão)
+#
+# As listagens grandes (/api/products sem filtros, /api/coupons) eram montadas inteiras
+# como lista de dicts, serializadas de uma vez pelo jsonify (json da stdlib, com um
+# `default` em Python para cada numpy/pandas escalar) e só então enviadas. Aqui:
+#   - `dumps` usa orjson quando instalado (numpy nativo, bytes direto) e cai para o json da
+#     stdlib com o mesmo formato; datas saem no formato HTTP, como no jsonify;
+#   - `gerar_lista_json` escreve os itens de um iterável à medida que são produzidos, em
+#     blocos de ~BLOCO_STREAM bytes, sem nunca ter a lista inteira nem o JSON inteiro na memória;
+#   - `escolher_codificacao`/`comprimir`/`comprimir_stream` negociam br (se o pacote
+#     brotli estiver instalado) ou gzip pelo Accept-Encoding.
+
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # opcional: sem ele, json da stdlib
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só gzip
+    brotli = None
+
+from config import env_int
+
+BLOCO_STREAM = env_int("API_BLOCO_STREAM", 64 * 1024)
+TAMANHO_MIN_COMPRESSAO = env_int("API_COMPRESSAO_MIN", 1024)
+NIVEL_GZIP = env_int("API_NIVEL_GZIP", 6)
+NIVEL_BROTLI = env_int("API_NIVEL_BROTLI", 5)
+
+def _padrao(obj):
+    """Tipos que nem o orjson nem o json da stdlib serializam sozinhos."""
+    if obj is None or obj is pd.NaT: return None
+    if isinstance(obj, datetime): return http_date(obj)  # inclui pd.Timestamp
+    if isinstance(obj, date): return http_date(obj)
+    if isinstance(obj, np.integer): return int(obj)
+    if isinstance(obj, np.floating): return None if np.isnan(obj) else float(obj)
+    if isinstance(obj, np.bool_): return bool(obj)
+    if isinstance(obj, np.ndarray): return obj.tolist()
+    if isinstance(obj, Decimal): return float(obj)
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+if orjson is not None:
+    _OPCOES = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS
+
+    def dumps(obj):
+        """JSON compacto em bytes (chaves ordenadas, como o jsonify)."""
+        return orjson.dumps(obj, default=_padrao, option=_OPCOES)
+else:
+    _codificador = json.JSONEncoder(default=_padrao, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+
+    def dumps(obj):
+        """JSON compacto em bytes (chaves ordenadas, como o jsonify)."""
+        # NaN/inf do Python viram null, como no orjson
+        return _codificador.encode(_sem_nan(obj)).encode('utf-8')
+
+    def _sem_nan(obj):
+        if isinstance(obj, float) and obj != obj: return None
+        if isinstance(obj, dict): return {k: _sem_nan(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)): return [_sem_nan(v) for v in obj]
+        return obj
+
+def gerar_lista_json(itens, bloco=BLOCO_STREAM):
+    """Gera o JSON de uma lista em pedaços de ~`bloco` bytes, serializando um item por vez."""
+    partes, tamanho, separador = [b'['], 1, b''
+    for item in itens:
+        parte = separador + dumps(item)
+        separador = b','
+        partes.append(parte)
+        tamanho += len(parte)
+        if tamanho >= bloco:
+            yield b''.join(partes)
+            partes, tamanho = [], 0
+    partes.append(b']')
+    yield b''.join(partes)
+
+# --- COMPRESSÃO ---
+def codificacoes_disponiveis():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def escolher_codificacao(aceitas):
+    """'br', 'gzip' ou None a partir do Accept-Encoding já interpretado (werkzeug `request.accept_encodings`)."""
+    for codificacao in codificacoes_disponiveis():
+        if aceitas.quality(codificacao) > 0: return codificacao
+    return None
+
+def _compressor(codificacao):
+    if codificacao == 'br': return brotli.Compressor(quality=NIVEL_BROTLI)
+    return zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 31)  # wbits 31 = cabeçalho gzip
+
+def comprimir(dados, codificacao):
+    if codificacao == 'br': return brotli.compress(dados, quality=NIVEL_BROTLI)
+    compressor = _compressor(codificacao)
+    return compressor.compress(dados) + compressor.flush()
+
+def comprimir_stream(pedacos, codificacao):
+    """Comprime um gerador de bytes pedaço a pedaço (nada é acumulado além do buffer do compressor)."""
+    compressor = _compressor(codificacao)
+    for pedaco in pedacos:
+        saida = compressor.process(pedaco) if codificacao == 'br' else compressor.compress(pedaco)
+        if saida: yield saida
+    yield compressor.finish() if codificacao == 'br' else compressor.flush()
@@ -0,0 +1,153 @@
+# meu_comparador_backend/snapshot.py (v1.0 - Snapshot Pré-Comprimido do Catálogo)
+#
+# O payload de /api/products e os detalhes de /api/product/<nome> só mudam quando o scraper
+# grava uma rodada nova, mas cada worker do gunicorn remontava tudo a partir do banco. Depois
+# de uma gravação bem-sucedida o scraper chama `publicar`, que:
+#   1. renderiza as respostas pelo próprio app (test client, sem snapshot e sem query string),
+#      então o conteúdo é exatamente o da rota ao vivo;
+#   2. grava cada uma como .json, .json.gz e .json.br (br se o pacote brotli estiver instalado)
+#      numa pasta de versão nova (SNAPSHOT_DIR/<versão>/);
+#   3. troca o ponteiro SNAPSHOT_DIR/ATUAL (arquivo com o nome da versão) com os.replace,
+#      que é atômico: um worker vê a versão antiga ou a nova, nunca uma pela metade;
+#   4. apaga as versões antigas, mantendo as SNAPSHOT_MANTER mais recentes.
+# O app serve esses arquivos com send_file (sendfile no gunicorn) e cai para o caminho ao
+# vivo quando não há ponteiro, arquivo ou quando a requisição tem query string. Se a
+# publicação falhar, o ponteiro é removido para o app não servir uma versão desatualizada.
+#
+# O scraper e o app precisam enxergar a mesma SNAPSHOT_DIR (mesma máquina ou disco
+# compartilhado). Em outra máquina, `python snapshot.py` publica a partir do banco.
+#
+# Variáveis de ambiente:
+#   SNAPSHOT_DIR (pasta "snapshots" ao lado deste arquivo), SNAPSHOT_MANTER (3)
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import brotli
+except ImportError:  # opcional: sem ele, só .gz
+    brotli = None
+
+from config import env_int
+
+DIRETORIO = os.environ.get("SNAPSHOT_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+MANTER = env_int("SNAPSHOT_MANTER", 3)
+PONTEIRO = "ATUAL"
+LISTAGEM = "produtos.json"
+# Chave do environ que o app lê para não servir o snapshot (usada ao renderizar um novo)
+IGNORAR = "comparador.snapshot.ignorar"
+# Extensão de cada Content-Encoding, na ordem de preferência
+EXTENSOES = (("br", ".br"), ("gzip", ".gz"))
+
+def arquivo_produto(produto_base):
+    """Caminho relativo do detalhe de um produto (hash do nome: nomes têm '/', acentos, espaços)."""
+    return f"produto/{hashlib.sha1(produto_base.encode('utf-8')).hexdigest()}.json"
+
+def versao_atual(diretorio=DIRETORIO):
+    try:
+        with open(os.path.join(diretorio, PONTEIRO), encoding="utf-8") as f:
+            versao = f.read().strip()
+    except OSError:
+        return None
+    return versao or None
+
+def localizar(relativo, aceitas, diretorio=DIRETORIO):
+    """(caminho, codificação ou None, versão) do arquivo da versão atual; None se não houver.
+
+    `aceitas` é o Accept-Encoding já interpretado (werkzeug `request.accept_encodings`).
+    """
+    versao = versao_atual(diretorio)
+    if versao is None: return None
+    caminho = os.path.join(diretorio, versao, relativo)
+    for codificacao, extensao in EXTENSOES:
+        if aceitas.quality(codificacao) > 0 and os.path.isfile(caminho + extensao):
+            return caminho + extensao, codificacao, versao
+    if os.path.isfile(caminho): return caminho, None, versao
+    return None
+
+def _gravar(pasta, relativo, dados):
+    caminho = os.path.join(pasta, relativo)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "wb") as f: f.write(dados)
+    # mtime=0: o mesmo conteúdo gera o mesmo .gz em todas as rodadas
+    with open(caminho + ".gz", "wb") as f: f.write(gzip.compress(dados, 9, mtime=0))
+    if brotli is not None:
+        with open(caminho + ".br", "wb") as f: f.write(brotli.compress(dados, quality=11))
+
+def renderizar(pasta):
+    """Grava em `pasta` a listagem e o detalhe de cada produto; retorna (produtos, detalhes gravados)."""
+    from app import app
+
+    cliente = app.test_client()
+    ambiente = {IGNORAR: True}
+    resp = cliente.get("/api/products", environ_base=ambiente)
+    if resp.status_code != 200: raise RuntimeError(f"/api/products respondeu {resp.status_code}")
+    listagem = resp.get_data()
+    _gravar(pasta, LISTAGEM, listagem)
+
+    produtos = [p["id"] for p in json.loads(listagem)]
+    detalhes = 0
+    for produto_base in produtos:
+        resp = cliente.get(f"/api/product/{quote(produto_base, safe='')}", environ_base=ambiente)
+        # Sem o arquivo, o app responde esse produto pelo caminho ao vivo
+        if resp.status_code != 200:
+            print(f"  -> snapshot: {produto_base} respondeu {resp.status_code}, fica fora")
+            continue
+        _gravar(pasta, arquivo_produto(produto_base), resp.get_data())
+        detalhes += 1
+    return len(produtos), detalhes
+
+def trocar_ponteiro(diretorio, versao):
+    fd, temporario = tempfile.mkstemp(prefix=".ATUAL-", dir=diretorio)
+    with os.fdopen(fd, "w", encoding="utf-8") as f: f.write(versao)
+    os.chmod(temporario, 0o644)
+    os.replace(temporario, os.path.join(diretorio, PONTEIRO))
+
+def limpar_antigas(diretorio, manter=MANTER):
+    """Apaga as versões mais antigas, nunca a atual. Worker no meio de um sendfile segue com o
+    arquivo aberto (POSIX); onde a remoção falhar, fica para a próxima rodada."""
+    atual = versao_atual(diretorio)
+    versoes = sorted(n for n in os.listdir(diretorio) if n.startswith("v") and os.path.isdir(os.path.join(diretorio, n)))
+    removidas = [v for v in (versoes[:-manter] if manter > 0 else versoes) if v != atual]
+    for versao in removidas: shutil.rmtree(os.path.join(diretorio, versao), ignore_errors=True)
+    return removidas
+
+def invalidar(diretorio=DIRETORIO):
+    """Remove o ponteiro: o app volta ao caminho ao vivo até a próxima publicação."""
+    try: os.remove(os.path.join(diretorio, PONTEIRO))
+    except FileNotFoundError: pass
+
+def publicar(diretorio=DIRETORIO):
+    """Renderiza uma versão nova, troca o ponteiro e limpa as antigas; retorna o nome da versão."""
+    inicio = time.monotonic()
+    os.makedirs(diretorio, exist_ok=True)
+    versao = datetime.now().strftime("v%Y%m%dT%H%M%S%f")
+    temporaria = tempfile.mkdtemp(prefix=f".{versao}-", dir=diretorio)
+    try:
+        produtos, detalhes = renderizar(temporaria)
+        manifesto = {"versao": versao, "gerado_em": datetime.now().isoformat(timespec="seconds"), "produtos": produtos,
+                     "detalhes": detalhes, "segundos": round(time.monotonic() - inicio, 2)}
+        with open(os.path.join(temporaria, "manifesto.json"), "w", encoding="utf-8") as f: json.dump(manifesto, f, indent=2)
+        os.chmod(temporaria, 0o755)  # mkdtemp cria 0700; o app pode rodar com outro usuário
+        os.rename(temporaria, os.path.join(diretorio, versao))
+    except Exception:
+        shutil.rmtree(temporaria, ignore_errors=True)
+        invalidar(diretorio)
+        raise
+    trocar_ponteiro(diretorio, versao)
+    removidas = limpar_antigas(diretorio)
+    print(f"=== SNAPSHOT {versao}: {produtos} produtos, {detalhes} detalhes em {manifesto['segundos']}s"
+          f" ({len(removidas)} versões antigas removidas) ===")
+    return versao
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    publicar(os.environ.get("SNAPSHOT_DIR") or DIRETORIO)
@@ -0,0 +1,143 @@
+# meu_comparador_backend/vitrines.py (v1.0 - Coleta por Páginas de Categoria)
+#
+# Uma página de categoria traz de 20 a 100 produtos com nome, preço, link e imagem. No modo
+# vitrine o scraper percorre as páginas de cada categoria (com paginação) em vez de abrir a
+# página de cada produto, e associa cada card a um produto_base de LISTA_DE_PRODUTOS pela
+# URL do produto (código /produto/<id> na Kabum e na Terabyte, caminho da URL na Pichau).
+# As linhas gravadas em `precos` são as mesmas do modo por produto, só sem descrição (a
+# descrição já guardada em precos_atual continua valendo).
+#
+# Variáveis de ambiente:
+#   SCRAPER_VITRINE_PAGINAS   páginas por categoria, no máximo (padrão 5; "paginas_max" na categoria)
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import env_int
+from pipeline import LimitadorLoja, ResumoColeta, limites_loja
+
+PAGINAS_MAX_PADRAO = env_int("SCRAPER_VITRINE_PAGINAS", 5)
+
+# Parâmetros de paginação de cada loja: (parâmetro da página, parâmetros fixos)
+PAGINACAO = {
+    "Kabum": ("page_number", {"page_size": "100"}),
+    "Pichau": ("page", {}),
+    "Terabyte": ("pagina", {}),
+}
+
+RE_CODIGO_PRODUTO = re.compile(r'/produto/(\d+)')
+
+def url_pagina(loja, url, pagina):
+    """URL da `pagina` (1, 2, ...) de uma categoria, preservando os filtros da URL original."""
+    parametro, fixos = PAGINACAO.get(loja, ("page", {}))
+    partes = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True) if k != parametro and k not in fixos]
+    query += list(fixos.items())
+    if pagina > 1 or fixos: query.append((parametro, str(pagina)))
+    return urlunsplit(partes._replace(query=urlencode(query)))
+
+def chave_produto(url=None, codigo=None):
+    """Identidade do produto na loja, igual para o link do card e a URL cadastrada."""
+    if url:
+        url = str(url).strip()
+        # Slug solto (estado embutido da Pichau) vira caminho
+        if not url.startswith(('http://', 'https://', '/')): url = '/' + url
+        caminho = urlsplit(url).path
+        achado = RE_CODIGO_PRODUTO.search(caminho)
+        if achado: return f"codigo:{achado.group(1)}"
+        caminho = caminho.rstrip('/').lower()
+        if caminho: return f"caminho:{caminho}"
+    if codigo: return f"codigo:{codigo}"
+    return None
+
+class MapaProdutos:
+    """(loja, chave do produto) -> tarefa de LISTA_DE_PRODUTOS, no formato de montar_tarefas."""
+
+    def __init__(self, tarefas):
+        self._por_chave = {}
+        for tarefa in tarefas:
+            chave = chave_produto(tarefa["url"])
+            if chave: self._por_chave[(tarefa["loja"], chave)] = tarefa
+
+    def __len__(self):
+        return len(self._por_chave)
+
+    def associar(self, loja, item):
+        for chave in (chave_produto(item.get("url")), chave_produto(codigo=item.get("codigo"))):
+            tarefa = self._por_chave.get((loja, chave)) if chave else None
+            if tarefa: return tarefa
+        return None
+
+def coletar_vitrines(categorias, buscar_pagina):
+    """Percorre as páginas de cada categoria respeitando os limites de cada loja.
+
+    `categorias` são dicts com "loja", "categoria", "url" e, opcionalmente, "paginas_max".
+    `buscar_pagina(url, loja)` devolve os itens da página ({"nome", "preco", "url", "img",
+    "codigo"}) ou None em caso de falha. As páginas de uma categoria são lidas em sequência
+    e a categoria termina na primeira página vazia, na que não traz nenhum item novo (loja
+    que repete a última página) ou em `paginas_max`. Retorna (itens por categoria, resumo).
+    """
+    resumo = ResumoColeta()
+    coletas = [[] for _ in categorias]
+    por_loja = {}
+    for i, categoria in enumerate(categorias):
+        por_loja.setdefault(categoria["loja"], []).append(i)
+
+    def percorrer(limitador, i):
+        categoria = categorias[i]
+        loja = categoria["loja"]
+        vistos = set()
+        for pagina in range(1, int(categoria.get("paginas_max") or PAGINAS_MAX_PADRAO) + 1):
+            url = url_pagina(loja, categoria["url"], pagina)
+            with limitador.acesso():
+                inicio = time.monotonic()
+                try:
+                    itens = buscar_pagina(url, loja)
+                except Exception as e:
+                    print(f"  -> ERRO vitrine {loja} ({url}): {e}")
+                    itens = None
+            resumo.registrar(loja, bool(itens), time.monotonic() - inicio)
+            novos = [item for item in itens or [] if (item.get("url"), item.get("codigo"), item["nome"]) not in vistos]
+            print(f"  -> {loja} {categoria['categoria']} p.{pagina}: {len(itens or [])} cards, {len(novos)} novos")
+            if not novos: break
+            vistos.update((item.get("url"), item.get("codigo"), item["nome"]) for item in novos)
+            coletas[i].extend(novos)
+
+    executores = []
+    try:
+        for loja, indices in por_loja.items():
+            concorrencia, intervalo = limites_loja(loja)
+            limitador = LimitadorLoja(concorrencia, intervalo)
+            executor = ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix=f"vitrine-{loja}")
+            executores.append(executor)
+            for i in indices: executor.submit(percorrer, limitador, i)
+    finally:
+        for executor in executores: executor.shutdown(wait=True)
+    resumo.finalizar()
+    return coletas, resumo
+
+def montar_linhas(categorias, coletas, mapa, now):
+    """Linhas de `precos` para os cards associados a um produto; (linhas, cobertos, não associados).
+
+    `cobertos` é o conjunto de (produto_base, loja) já atualizados pela vitrine, para que o
+    modo por produto só visite o resto. Um produto que aparece em mais de uma página ou
+    categoria gera uma linha só (a primeira).
+    """
+    linhas, cobertos, nao_associados = [], set(), 0
+    for categoria, itens in zip(categorias, coletas):
+        loja = categoria["loja"]
+        for item in itens:
+            tarefa = mapa.associar(loja, item)
+            if tarefa is None:
+                nao_associados += 1
+                continue
+            if (tarefa["produto_base"], loja) in cobertos: continue
+            cobertos.add((tarefa["produto_base"], loja))
+            linhas.append({
+                "timestamp": now, "produto_base": tarefa["produto_base"], "categoria": tarefa["categoria"],
+                "nome_completo_raspado": item["nome"], "preco": item["preco"], "imagem_url": item.get("img") or "",
+                "loja": loja, "url": tarefa["url"], "descricao": ""
+            })
+    return linhas, cobertos, nao_associados
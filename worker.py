@@ -0,0 +1,268 @@
+# meu_comparador_backend/worker.py (v1.2 - Página sem Dados Volta para a Fila)
+#
+# Coleta a partir da fila em Postgres (fila.py), em quantos processos/máquinas for preciso:
+#   python worker.py --enfileirar        cria uma rodada (LISTA_DE_PRODUTOS, filtrada pela agenda) e sai
+#   python worker.py                     consome a fila até ela esvaziar
+#   python worker.py --processos 4       4 workers neste host, um processo (e um pool de navegadores) cada
+#   python worker.py --continuo          não sai com a fila vazia: espera a próxima rodada
+#   python worker.py --resumo [ID]       resumo da rodada (padrão: a mais recente)
+# Cada lote reivindicado é coletado com os mesmos limites por loja, retentativas e disjuntor
+# do scraper (pipeline.coletar) e gravado numa transação: preços (estado_atual.gravar_precos),
+# agenda e o estado dos jobs. Uma queda no meio da rodada perde no máximo os lotes em
+# andamento, que voltam para a fila quando o lease vence. Página sem nome ou preço (bloqueio
+# passageiro, página pela metade) volta para a fila com espera (fila.devolver) e só fica
+# "falhou" em FILA_MAX_TENTATIVAS. Se o lote não grava, as linhas são gravadas uma a uma e
+# só as que quebram voltam para a fila. O worker que
+# fecha a rodada busca os cupons, publica o snapshot e imprime o resumo; cada worker grava o
+# arquivo de métricas (scraper.salvar_metricas) ao parar.
+#
+# Os limitadores e disjuntores por loja (pipeline.py) duram o processo inteiro, não um lote,
+# mas valem POR WORKER: com N workers cada loja recebe até N x SCRAPER_<LOJA>_CONCORRENCIA
+# acessos simultâneos e N vezes o ritmo de SCRAPER_<LOJA>_INTERVALO. Divida por N ao subir
+# mais workers.
+#
+# Variáveis de ambiente: as de fila.py, FILA_ESPERA (5 s entre consultas com a fila vazia)
+# e as do scraper (SCRAPER_NAVEGADORES, SCRAPER_AGENDA, SCRAPER_IMAGENS, SCRAPER_SNAPSHOT...).
+
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+from collections import Counter
+from datetime import datetime
+
+import fila
+import scraper
+import snapshot
+from agenda import Agenda
+from config import env_int
+from cupons import salvar_cupons
+from database import get_database_url, get_engine, reset_engine
+from estado_atual import gravar_precos, preparar_lote
+from pipeline import PoolNavegadores, ResumoColeta, coletar
+
+ESPERA = env_int("FILA_ESPERA", 5)
+
+def nome_worker():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def enfileirar(engine):
+    """Cria a rodada com as páginas vencidas na agenda; não cria outra enquanto houver rodada aberta."""
+    tarefas = scraper.montar_tarefas()
+    agenda = scraper.carregar_agenda()
+    if agenda is not None:
+        tarefas, adiadas = agenda.escolher(tarefas, datetime.now(), scraper.ORCAMENTO)
+        print(f"  -> [Agenda] {len(tarefas)} páginas vencidas, {adiadas} adiadas")
+    with engine.begin() as conn:
+        abertas = fila.rodadas_abertas(conn)
+        if abertas:
+            print(f"Rodada {abertas[0]} ainda aberta; nada enfileirado.")
+            return abertas[0]
+        rodada = fila.criar_rodada(conn, tarefas)
+    print(f"=== RODADA {rodada}: {len(tarefas)} jobs na fila ===")
+    return rodada
+
+ERRO_SEM_DADOS = "página sem nome ou preço"
+
+def observar_agenda(conn, linhas, falhas):
+    """Atualiza a agenda dos produtos/loja do lote (num savepoint: sem agenda_coleta grava os preços mesmo assim).
+
+    `falhas` são só os jobs que desistiram de vez (os devolvidos ainda vão ser tentados de novo).
+    """
+    try:
+        with conn.begin_nested():
+            agenda = Agenda.carregar(conn, {job["produto_base"] for job in linhas + falhas})
+            for linha in linhas: agenda.observar(linha["produto_base"], linha["loja"], linha["preco"], linha["timestamp"])
+            for job in falhas: agenda.observar(job["produto_base"], job["loja"], None, job["momento"])
+            agenda.salvar(conn)
+    except Exception as e:
+        print(f"  -> [Agenda] Atualização ignorada (rode migrate_agenda.py?): {str(e).splitlines()[0]}")
+
+def classificar(jobs, brutos, momento):
+    """(linhas para `precos`, jobs sem nome/preço, {id: estado final}) a partir do que a coleta devolveu.
+
+    Só concluídas e puladas têm estado final aqui; os jobs sem nome/preço voltam para a fila.
+    """
+    linhas, falhas, estados = [], [], {}
+    for job, bruto in zip(jobs, brutos):
+        if bruto is None:
+            estados[job["id"]] = {"id": job["id"], "estado": "pulada", "erro": "disjuntor da loja aberto"}
+            scraper.PAGINAS.inc(loja=job["loja"], resultado='pulada')
+            continue
+        nome, preco, img, desc = bruto
+        if nome and preco is not None:
+            linhas.append({
+                "timestamp": momento, "produto_base": job["produto_base"], "categoria": job["categoria"],
+                "nome_completo_raspado": nome, "preco": preco, "imagem_url": img or "",
+                "loja": job["loja"], "url": job["url"], "descricao": desc or "", "_job": job["id"]
+            })
+            estados[job["id"]] = {"id": job["id"], "estado": "concluida", "erro": None}
+            scraper.PAGINAS.inc(loja=job["loja"], resultado='sucesso')
+        else:
+            falhas.append(dict(job, momento=momento))
+            scraper.PAGINAS.inc(loja=job["loja"], resultado='falha')
+    return linhas, falhas, estados
+
+def _erro(e):
+    return f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"[:500]
+
+def gravar_linhas(conn, linhas):
+    """Grava as linhas do lote; se o lote não grava, tenta uma a uma. Retorna {job: erro} das que não gravaram."""
+    try:
+        with conn.begin_nested(): gravar_precos(conn, preparar_lote(linhas))
+        return {}
+    except Exception as e:
+        if len(linhas) == 1: return {linhas[0]["_job"]: _erro(e)}
+        print(f"  -> [Fila] Lote não gravou ({_erro(e)}); gravando linha a linha")
+    quebradas = {}
+    for linha in linhas:
+        try:
+            with conn.begin_nested(): gravar_precos(conn, preparar_lote([linha]))
+        except Exception as e:
+            quebradas[linha["_job"]] = _erro(e)
+    return quebradas
+
+def processar_lote(engine, worker, jobs, pool_navegadores, buscar, atalho, controles=None, resumo=None):
+    """Coleta os jobs e grava o que ainda é deste worker; retorna Counter de estados.
+
+    `controles`/`resumo` são os limites por loja e o resumo de coleta do worker (pipeline.coletar).
+    """
+    ids = [job["id"] for job in jobs]
+    renovador = fila.RenovadorLease(engine, worker, ids)
+    renovador.start()
+    try:
+        brutos, _ = coletar(jobs, buscar, pool_navegadores, atalho=atalho, controles=controles, resumo=resumo)
+        linhas, falhas, estados = classificar(jobs, brutos, datetime.now())
+        # Ainda com o lease renovado: os downloads de imagem podem levar vários TIMEOUTs
+        if scraper.IMAGENS and linhas: scraper.atualizar_imagens(linhas)
+    finally:
+        renovador.parar()
+
+    with engine.begin() as conn:
+        proprios = fila.meus(conn, worker, ids)
+        if len(proprios) < len(ids):
+            print(f"  -> [Fila] {len(ids) - len(proprios)} jobs assumidos por outro worker (lease vencido); descartados")
+        linhas = [linha for linha in linhas if linha["_job"] in proprios]
+        falhas = [job for job in falhas if job["id"] in proprios]
+        quebradas = gravar_linhas(conn, linhas) if linhas else {}
+        linhas = [linha for linha in linhas if linha["_job"] not in quebradas]
+        for linha in linhas: scraper.LINHAS.inc(loja=linha["loja"])
+        # Sem dados ou sem gravar: volta para a fila com espera (ou "falhou", no limite de tentativas)
+        devolver = {job["id"]: ERRO_SEM_DADOS for job in falhas}
+        devolver.update(quebradas)
+        if scraper.AGENDA:
+            observar_agenda(conn, linhas, [job for job in falhas if job["tentativas"] >= fila.MAX_TENTATIVAS])
+        fila.registrar_resultados(conn, [estados[i] for i in ids if i in proprios and i not in devolver])
+        contagem = Counter(estados[i]["estado"] for i in ids if i in proprios and i not in devolver)
+        por_erro = {}
+        for job, erro in devolver.items(): por_erro.setdefault(erro, []).append(job)
+        for erro, ids_erro in por_erro.items():
+            devolvidos, desistidos = fila.devolver(conn, worker, ids_erro, erro)
+            contagem["devolvida"] += devolvidos
+            contagem["falhou"] += desistidos
+    if quebradas: print(f"  -> [Fila] {len(quebradas)} jobs não gravaram; devolvidos à fila")
+    return contagem
+
+def finalizar_rodada(engine, rodada, pool_navegadores):
+    """Passos de fim de rodada do scraper.py: cupons e snapshot do catálogo."""
+    try:
+        with pool_navegadores.driver() as driver:
+            cupons = scraper.buscar_cupons_kabum(driver)
+        if cupons:
+            gravados, expirados = salvar_cupons(engine, cupons, datetime.now())
+            print(f"=== CUPONS ATUALIZADOS: {gravados} registros, {expirados} expirados ===")
+    except Exception as e:
+        print(f"Erro nos cupons da rodada {rodada}: {e}")
+    if scraper.SNAPSHOT: scraper.publicar_snapshot()
+    else: snapshot.invalidar()
+
+def fechar_rodadas(engine, worker, pool_navegadores, ao_fechar):
+    """Fecha as rodadas sem jobs abertos (só um worker consegue fechar cada uma) e imprime o resumo."""
+    with engine.connect() as conn: abertas = fila.rodadas_abertas(conn)
+    for rodada in abertas:
+        with engine.begin() as conn:
+            if not fila.fechar_rodada(conn, rodada, worker): continue
+        if ao_fechar is not None: ao_fechar(engine, rodada, pool_navegadores)
+        with engine.connect() as conn: fila.imprimir_resumo(fila.resumo_rodada(conn, rodada))
+
+def trabalhar(nome=None, continuo=False, lote=fila.LOTE, buscar=None, atalho=None, criar_driver=None,
+              ao_fechar=finalizar_rodada, espera=ESPERA):
+    """Loop de um worker: reivindica, coleta e grava lotes até a fila esvaziar (ou para sempre, se `continuo`).
+
+    `buscar`/`atalho`/`criar_driver` são os do scraper por padrão (benchmarks/bench_fila.py troca por falsos).
+    """
+    worker = nome or nome_worker()
+    buscar = buscar or scraper.buscar_dados_loja
+    if atalho is None and buscar is scraper.buscar_dados_loja: atalho = scraper.buscar_dados_rapido
+    engine = get_engine()
+    pool_navegadores = PoolNavegadores(criar_driver or scraper.init_driver, env_int("SCRAPER_NAVEGADORES", 2))
+    # Limites/disjuntor por loja e resumo da coleta valem para o worker inteiro, não por lote
+    controles, resumo = {}, ResumoColeta()
+    contagem, lotes, inicio, agora = Counter(), 0, time.monotonic(), datetime.now()
+    print(f"--- WORKER {worker} (lotes de {lote}, lease {fila.LEASE}s) ---")
+    try:
+        while True:
+            with engine.begin() as conn:
+                desistidos = fila.desistir_vencidos(conn)
+                jobs = fila.reivindicar(conn, worker, lote)
+            if desistidos: print(f"  -> [Fila] {desistidos} jobs desistidos (lease vencido {fila.MAX_TENTATIVAS}x)")
+            if jobs:
+                try:
+                    contagem += processar_lote(engine, worker, jobs, pool_navegadores, buscar, atalho, controles, resumo)
+                except Exception as e:
+                    print(f"  -> [Fila] Lote falhou ({_erro(e)}); devolvendo {len(jobs)} jobs")
+                    with engine.begin() as conn:
+                        _, desistidos = fila.devolver(conn, worker, [job["id"] for job in jobs], _erro(e))
+                    if desistidos: print(f"  -> [Fila] {desistidos} jobs desistidos ({fila.MAX_TENTATIVAS} tentativas)")
+                lotes += 1
+                continue
+            fechar_rodadas(engine, worker, pool_navegadores, ao_fechar)
+            # Com jobs em andamento em outro worker, espera: se ele morrer, o lease vence e sobra para este
+            with engine.connect() as conn: abertos = fila.jobs_abertos(conn)
+            if not abertos and not continuo: break
+            time.sleep(espera)
+    finally:
+        pool_navegadores.fechar()
+        reset_engine()
+        resumo.finalizar()
+        scraper.salvar_metricas(agora, resumo, sufixo=worker)
+        segundos = time.monotonic() - inicio
+        print(f"=== WORKER {worker}: {sum(contagem.values())} jobs em {lotes} lotes, {round(segundos, 1)}s "
+              f"({contagem['concluida']} ok, {contagem['falhou']} falhas, {contagem['pulada']} puladas, "
+              f"{contagem['devolvida']} devolvidas para nova tentativa) ===")
+    return contagem
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker da fila distribuída de coleta (Postgres)")
+    parser.add_argument("--enfileirar", action="store_true", help="cria uma rodada com as páginas vencidas e sai")
+    parser.add_argument("--processos", type=int, default=1, help="workers neste host (um processo cada)")
+    parser.add_argument("--lote", type=int, default=fila.LOTE, help="jobs por reivindicação")
+    parser.add_argument("--continuo", action="store_true", help="continua esperando novas rodadas com a fila vazia")
+    parser.add_argument("--resumo", nargs="?", type=int, const=0, default=None, metavar="RODADA",
+                        help="imprime o resumo da rodada (padrão: a mais recente) e sai")
+    args = parser.parse_args()
+
+    db_url = get_database_url()
+    if not db_url:
+        print("ERRO: DATABASE_URL não configurada.")
+        return
+    if args.enfileirar or args.resumo is not None:
+        engine = get_engine()
+        if args.enfileirar: enfileirar(engine)
+        else:
+            with engine.connect() as conn: fila.imprimir_resumo(fila.resumo_rodada(conn, args.resumo or None))
+        return
+
+    if args.processos <= 1:
+        trabalhar(continuo=args.continuo, lote=args.lote)
+        return
+    # spawn: cada processo abre os próprios navegadores e conexões
+    contexto = multiprocessing.get_context("spawn")
+    processos = [contexto.Process(target=trabalhar, kwargs={"continuo": args.continuo, "lote": args.lote})
+                 for _ in range(args.processos)]
+    for processo in processos: processo.start()
+    for processo in processos: processo.join()
+
+if __name__ == "__main__":
+    main()